@@ -1,47 +1,95 @@
 from __future__ import annotations
 
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator
 
 from flask import Flask
 
 from chat_hateoas import db
 from chat_hateoas.config import Config
+from chat_hateoas.routes.analytics import bp as analytics_bp
 from chat_hateoas.routes.stream import bp as stream_bp
 from chat_hateoas.routes.web import bp as web_bp
+from chat_hateoas.services import action_jobs, archive, assets, maintenance, message_html, profiling, render_pool
+
+
+class StartupProfile:
+    def __init__(self) -> None:
+        self.phases: list[tuple[str, float]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def report(self) -> str:
+        lines = [f"  {name:<12} {elapsed_ms:8.2f} ms" for name, elapsed_ms in self.phases]
+        lines.append(f"  {'total':<12} {self.total_ms:8.2f} ms")
+        return "startup profile:\n" + "\n".join(lines)
 
 
 def create_app(test_config: dict | None = None) -> Flask:
+    profile = StartupProfile()
+
     repo_root = Path(__file__).resolve().parent.parent
-    app = Flask(
-        __name__,
-        instance_relative_config=True,
-        template_folder=str(repo_root / "templates"),
-        static_folder=str(repo_root / "static"),
-        instance_path=str(repo_root / "instance"),
-    )
-    app.config.from_object(Config)
-
-    if test_config:
-        app.config.update(test_config)
-
-    db_path = Path(app.config["DATABASE"])
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    Path(app.instance_path).mkdir(parents=True, exist_ok=True)
-
-    db.init_app(app)
-    app.register_blueprint(web_bp)
-    app.register_blueprint(stream_bp)
-
-    @app.template_filter("fmt_ts")
-    def fmt_ts(value: str) -> str:
-        try:
-            parsed = datetime.fromisoformat(value)
-            return parsed.strftime("%Y-%m-%d %H:%M UTC")
-        except Exception:
-            return value
+    with profile.phase("flask"):
+        app = Flask(
+            __name__,
+            instance_relative_config=True,
+            template_folder=str(repo_root / "templates"),
+            static_folder=str(repo_root / "static"),
+            instance_path=str(repo_root / "instance"),
+        )
+        app.config.from_object(Config)
+
+        if test_config:
+            app.config.update(test_config)
+
+    with profile.phase("directories"):
+        db_path = Path(app.config["DATABASE"])
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        Path(app.instance_path).mkdir(parents=True, exist_ok=True)
+
+    with profile.phase("blueprints"):
+        db.init_app(app)
+        action_jobs.init_app(app)
+        archive.init_app(app)
+        assets.init_app(app)
+        maintenance.init_app(app)
+        message_html.init_app(app)
+        render_pool.init_app(app)
+        app.register_blueprint(web_bp)
+        app.register_blueprint(stream_bp)
+        app.register_blueprint(analytics_bp)
+
+        @app.template_filter("fmt_ts")
+        def fmt_ts(value: str) -> str:
+            try:
+                parsed = datetime.fromisoformat(value)
+                return parsed.strftime("%Y-%m-%d %H:%M UTC")
+            except Exception:
+                return value
+
+    with profile.phase("schema"):
+        with app.app_context():
+            db.init_db()
+
+    # Installed last so the profile spans the whole Flask request, including streamed bodies.
+    profiling.init_app(app)
 
-    with app.app_context():
-        db.init_db()
+    app.extensions["startup_profile"] = profile
+    if app.config.get("STARTUP_PROFILE"):
+        app.logger.warning(profile.report())
 
     return app
@@ -13,6 +13,9 @@ def _env_bool(name: str, default: bool = False) -> bool:
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     DATABASE = os.environ.get("DATABASE_PATH", os.path.join("instance", "chat.db"))
+    DB_JOURNAL_MODE = os.environ.get("DB_JOURNAL_MODE", "wal")
+    DB_READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", "4"))
+    DB_SNAPSHOT_REFRESH_S = float(os.environ.get("DB_SNAPSHOT_REFRESH_S", "0"))
     MODEL_ID = os.environ.get("MODEL_ID", "anthropic.claude-3-sonnet-mock")
     MOCK_SEED = int(os.environ.get("MOCK_SEED", "13"))
     MAX_TOKENS = int(os.environ.get("MAX_TOKENS", "1024"))
@@ -21,3 +24,49 @@ class Config:
     STREAM_DELAY_MAX_MS = int(os.environ.get("STREAM_DELAY_MAX_MS", "180"))
     TOOL_CALL_DELAY_MS = int(os.environ.get("TOOL_CALL_DELAY_MS", "5000"))
     DEBUG_SSE_STREAM = _env_bool("DEBUG_SSE_STREAM", default=False)
+    STARTUP_PROFILE = _env_bool("STARTUP_PROFILE", default=False)
+    PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+    PROFILE_INTERVAL_MS = int(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_FORMAT = os.environ.get("PROFILE_FORMAT", "collapsed")
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "")
+    MESSAGE_HTML_STORAGE = os.environ.get("MESSAGE_HTML_STORAGE", "eager")
+    RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "2048"))
+    RENDER_WARM_INTERVAL_S = float(os.environ.get("RENDER_WARM_INTERVAL_S", "0"))
+    RENDER_WARM_CONVERSATIONS = int(os.environ.get("RENDER_WARM_CONVERSATIONS", "5"))
+    RENDER_POOL_WORKERS = int(os.environ.get("RENDER_POOL_WORKERS", "2"))
+    RENDER_OFFLOAD_MIN_CHARS = int(os.environ.get("RENDER_OFFLOAD_MIN_CHARS", "20000"))
+    RENDER_MEMO_SIZE = int(os.environ.get("RENDER_MEMO_SIZE", "64"))
+    ACTION_WORKERS = int(os.environ.get("ACTION_WORKERS", "4"))
+    ACTION_DELAY_MS = int(os.environ.get("ACTION_DELAY_MS", "0"))
+    ACTION_POLL_MS = int(os.environ.get("ACTION_POLL_MS", "1000"))
+    ACTION_JOB_LEASE_S = float(os.environ.get("ACTION_JOB_LEASE_S", "300"))
+    ACTION_SWEEP_INTERVAL_S = float(os.environ.get("ACTION_SWEEP_INTERVAL_S", "30"))
+    ACTION_POLL_MAX_MS = int(os.environ.get("ACTION_POLL_MAX_MS", "10000"))
+    ACTION_POLL_MAX_ATTEMPTS = int(os.environ.get("ACTION_POLL_MAX_ATTEMPTS", "30"))
+    STREAM_LEASE_S = float(os.environ.get("STREAM_LEASE_S", "30"))
+    STREAM_SEND_BUFFER_EVENTS = int(os.environ.get("STREAM_SEND_BUFFER_EVENTS", "64"))
+    STREAM_SLOW_CLIENT_POLICY = os.environ.get("STREAM_SLOW_CLIENT_POLICY", "coalesce")
+    STREAM_SLOW_CLIENT_GRACE_MS = int(os.environ.get("STREAM_SLOW_CLIENT_GRACE_MS", "250"))
+    STREAM_MAX_CONCURRENT = int(os.environ.get("STREAM_MAX_CONCURRENT", "8"))
+    STREAM_QUEUE_MAX = int(os.environ.get("STREAM_QUEUE_MAX", "16"))
+    STREAM_QUEUE_TIMEOUT_S = float(os.environ.get("STREAM_QUEUE_TIMEOUT_S", "30"))
+    WORKER_THREADS = int(os.environ.get("WORKER_THREADS", "0"))
+    STREAM_RESERVED_WORKERS = int(os.environ.get("STREAM_RESERVED_WORKERS", "2"))
+    STREAM_HEARTBEAT_S = float(os.environ.get("STREAM_HEARTBEAT_S", "3"))
+    STREAM_MULTIPLEX = _env_bool("STREAM_MULTIPLEX", default=True)
+    STREAM_MAX_TABS = int(os.environ.get("STREAM_MAX_TABS", "32"))
+    PREFETCH_TTL_S = int(os.environ.get("PREFETCH_TTL_S", "10"))
+    PREFETCH_CACHE_SIZE = int(os.environ.get("PREFETCH_CACHE_SIZE", "64"))
+    ASSET_FINGERPRINTING = _env_bool("ASSET_FINGERPRINTING", default=True)
+    INDEX_STREAMING = _env_bool("INDEX_STREAMING", default=True)
+    INDEX_STREAM_CHUNK_SIZE = int(os.environ.get("INDEX_STREAM_CHUNK_SIZE", "4096"))
+    PROVIDER = os.environ.get("PROVIDER", "mock")
+    BEDROCK_REGION = os.environ.get("AWS_REGION", "us-east-1")
+    BEDROCK_ENDPOINT = os.environ.get("BEDROCK_ENDPOINT", "")
+    BEDROCK_POOL_SIZE = int(os.environ.get("BEDROCK_POOL_SIZE", "8"))
+    BEDROCK_TIMEOUT_S = float(os.environ.get("BEDROCK_TIMEOUT_S", "60"))
+    RESPONSE_CACHE = _env_bool("RESPONSE_CACHE", default=False)
+    RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    RESPONSE_CACHE_TTL_S = float(os.environ.get("RESPONSE_CACHE_TTL_S", "600"))
@@ -1,18 +1,44 @@
 from __future__ import annotations
 
+import functools
 import json
+import math
+import os
 import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
 from datetime import UTC, datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator, TypeVar
 
+import click
 from flask import current_app, g
+from flask.cli import with_appcontext
+
+from chat_hateoas.records import ActionJob, AssistantMetadata, Conversation, Message, record_factory
+
+R = TypeVar("R")
+
+_conversation = record_factory(Conversation)
+_message = record_factory(Message)
+_assistant_metadata = record_factory(AssistantMetadata)
+_action_job = record_factory(ActionJob)
 
 
 def utc_now_iso() -> str:
     return datetime.now(UTC).isoformat(timespec="seconds")
 
 
+JOURNAL_MODES = {"delete", "truncate", "persist", "wal"}
+
+ROUTE_REPLICA = "replica"
+ROUTE_SNAPSHOT = "snapshot"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
 def get_db() -> sqlite3.Connection:
     if "db" not in g:
         db_path = Path(current_app.config["DATABASE"])
@@ -25,29 +51,224 @@ def get_db() -> sqlite3.Connection:
     return g.db
 
 
+# Pooled `mode=ro` connections with query_only set. Connections are handed between worker
+# threads (one request at a time), hence check_same_thread=False.
+class ReadPool:
+    def __init__(self, path: Path, max_idle: int) -> None:
+        self.uri = f"{path.resolve().as_uri()}?mode=ro"
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+            self.created += 1
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {"idle": len(self._idle), "created": self.created, "reused": self.reused}
+
+
+def _read_pool() -> ReadPool | None:
+    size = int(current_app.config.get("DB_READ_POOL_SIZE", 4))
+    if size <= 0:
+        return None
+    pool = current_app.extensions.get("db_read_pool")
+    if pool is None:
+        pool = ReadPool(Path(current_app.config["DATABASE"]), size)
+        current_app.extensions["db_read_pool"] = pool
+    return pool
+
+
+class SnapshotReplica:
+    def __init__(self, source: Path, refresh_s: float, max_idle: int) -> None:
+        self.path = source.with_name(f"{source.stem}.snapshot{source.suffix}")
+        self.refresh_s = refresh_s
+        self.refreshes = 0
+        self.pool = ReadPool(self.path, max_idle)
+        self._refreshed_at: float | None = None
+        self._lock = threading.Lock()
+
+    def refresh_if_stale(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_s:
+                return
+            # Built beside the live file and swapped in atomically; connections still reading the
+            # previous snapshot keep their (unlinked) file until they are released.
+            staging = self.path.with_name(f"{self.path.name}.tmp")
+            target = sqlite3.connect(staging)
+            try:
+                conn.backup(target)
+                # A WAL-mode copy would need -wal/-shm files next to it to be opened read-only.
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+            os.replace(staging, self.path)
+            self.pool.clear()
+            self._refreshed_at = now
+            self.refreshes += 1
+
+    def snapshot(self) -> dict[str, int]:
+        return {**self.pool.snapshot(), "refreshes": self.refreshes}
+
+
+def _snapshot_replica() -> SnapshotReplica | None:
+    refresh_s = float(current_app.config.get("DB_SNAPSHOT_REFRESH_S", 0))
+    if refresh_s <= 0:
+        return None
+    replica = current_app.extensions.get("db_snapshot")
+    if replica is None:
+        replica = SnapshotReplica(
+            Path(current_app.config["DATABASE"]),
+            refresh_s,
+            int(current_app.config.get("DB_READ_POOL_SIZE", 4)) or 1,
+        )
+        current_app.extensions["db_snapshot"] = replica
+    return replica
+
+
+def get_read_db() -> sqlite3.Connection:
+    # Only views marked with read_only() are routed; everything else (and any write, which
+    # always goes through get_db) stays on the read/write connection.
+    route = g.get("db_route")
+    if route is None:
+        return get_db()
+    if "read_db" not in g:
+        pool: ReadPool | None = None
+        if route == ROUTE_SNAPSHOT:
+            replica = _snapshot_replica()
+            if replica is not None:
+                replica.refresh_if_stale(get_db())
+                pool = replica.pool
+        if pool is None:
+            pool = _read_pool()
+        if pool is None:
+            return get_db()
+        g.read_db = pool.acquire()
+        g.read_pool = pool
+    return g.read_db
+
+
+def read_only(route: str = ROUTE_REPLICA) -> Callable[[F], F]:
+    def decorator(view: F) -> F:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            g.db_route = route
+            return view(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+@contextmanager
+def reading(route: str = ROUTE_REPLICA) -> Iterator[None]:
+    previous = g.get("db_route")
+    held = "read_db" in g
+    g.db_route = route
+    try:
+        yield
+    finally:
+        g.db_route = previous
+        # A connection taken just for this block goes back now, not at the end of a long response.
+        if not held and "read_db" in g:
+            g.pop("read_pool").release(g.pop("read_db"))
+
+
 def close_db(_: BaseException | None = None) -> None:
     conn = g.pop("db", None)
     if conn is not None:
         conn.close()
+    read_conn = g.pop("read_db", None)
+    if read_conn is not None:
+        g.pop("read_pool").release(read_conn)
+
+
+def _schema_version(schema_sql: str) -> int:
+    return zlib.crc32(schema_sql.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, ddl: str) -> None:
+    existing = {str(row["name"]) for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
 
 
 def init_db() -> None:
     conn = get_db()
     schema_path = Path(__file__).with_name("schema.sql")
-    conn.executescript(schema_path.read_text(encoding="utf-8"))
-    conn.commit()
+    schema_sql = schema_path.read_text(encoding="utf-8")
+    version = _schema_version(schema_sql)
+    if int(conn.execute("PRAGMA user_version").fetchone()[0]) != version:
+        conn.executescript(schema_sql)
+        _ensure_column(conn, "messages", "renderer_version", "INTEGER NOT NULL DEFAULT 1")
+        _ensure_column(conn, "messages", "render_text", "TEXT")
+        _ensure_column(conn, "messages", "stream_owner", "TEXT")
+        _ensure_column(conn, "messages", "stream_lease_expires", "REAL")
+        _ensure_column(conn, "conversations", "revision", "INTEGER NOT NULL DEFAULT 0")
+        _ensure_column(conn, "action_jobs", "claim_owner", "TEXT")
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    # Set after the schema so auto_vacuum applies to new files. In WAL mode, readers on the
+    # read-only pool never block the streaming writers, and the writers never block them.
+    journal_mode = str(current_app.config.get("DB_JOURNAL_MODE", "wal")).lower()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"unsupported DB_JOURNAL_MODE {journal_mode!r}")
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
 
 
 def init_app(app) -> None:  # type: ignore[no-untyped-def]
     app.teardown_appcontext(close_db)
+    app.cli.add_command(backfill_tool_events_command)
+    app.cli.add_command(rebuild_rollups_command)
 
 
 def fetch_one(query: str, params: tuple[Any, ...] = ()) -> sqlite3.Row | None:
-    return get_db().execute(query, params).fetchone()
+    return get_read_db().execute(query, params).fetchone()
 
 
 def fetch_all(query: str, params: tuple[Any, ...] = ()) -> list[sqlite3.Row]:
-    return get_db().execute(query, params).fetchall()
+    return get_read_db().execute(query, params).fetchall()
+
+
+def _tuple_cursor(query: str, params: tuple[Any, ...] = ()) -> sqlite3.Cursor:
+    cur = get_read_db().cursor()
+    cur.row_factory = None
+    return cur.execute(query, params)
+
+
+def fetch_records(make: Callable[[Any], R], query: str, params: tuple[Any, ...] = ()) -> list[R]:
+    return list(map(make, _tuple_cursor(query, params)))
+
+
+def fetch_record(make: Callable[[Any], R], query: str, params: tuple[Any, ...] = ()) -> R | None:
+    row = _tuple_cursor(query, params).fetchone()
+    return None if row is None else make(row)
 
 
 def execute(query: str, params: tuple[Any, ...] = ()) -> int:
@@ -75,19 +296,31 @@ def update_conversation_timestamp(conversation_id: int) -> None:
     )
 
 
-def list_conversations() -> list[sqlite3.Row]:
-    return fetch_all(
-        """
-        SELECT id, title, created_at, updated_at
-        FROM conversations
-        ORDER BY updated_at DESC
-        """
-    )
+_CONVERSATIONS_SQL = """
+    SELECT id, title, created_at, updated_at, revision
+    FROM conversations
+    ORDER BY updated_at DESC
+"""
+
+
+def list_conversations(limit: int | None = None) -> list[Conversation]:
+    if limit is None:
+        return fetch_records(_conversation, _CONVERSATIONS_SQL)
+    return fetch_records(_conversation, f"{_CONVERSATIONS_SQL} LIMIT ?", (limit,))
+
+
+def iter_conversations() -> Iterator[Conversation]:
+    yield from map(_conversation, _tuple_cursor(_CONVERSATIONS_SQL))
+
 
+def latest_conversation() -> Conversation | None:
+    return fetch_record(_conversation, f"{_CONVERSATIONS_SQL} LIMIT 1")
 
-def get_conversation(conversation_id: int) -> sqlite3.Row | None:
-    return fetch_one(
-        "SELECT id, title, created_at, updated_at FROM conversations WHERE id = ?",
+
+def get_conversation(conversation_id: int) -> Conversation | None:
+    return fetch_record(
+        _conversation,
+        "SELECT id, title, created_at, updated_at, revision FROM conversations WHERE id = ?",
         (conversation_id,),
     )
 
@@ -102,13 +335,14 @@ def create_message(
     raw_text: str,
     rendered_html: str,
     status: str = "complete",
+    renderer_version: int = 1,
 ) -> int:
     return execute(
         """
-        INSERT INTO messages (conversation_id, role, raw_text, rendered_html, status, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
+        INSERT INTO messages (conversation_id, role, raw_text, rendered_html, status, created_at, renderer_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
         """,
-        (conversation_id, role, raw_text, rendered_html, status, utc_now_iso()),
+        (conversation_id, role, raw_text, rendered_html, status, utc_now_iso(), renderer_version),
     )
 
 
@@ -117,19 +351,68 @@ def update_message(
     raw_text: str,
     rendered_html: str,
     status: str,
-) -> None:
+    renderer_version: int = 1,
+    owner: str | None = None,
+    render_text: str | None = None,
+) -> bool:
+    # With an owner, the write only lands while that stream still holds the claim, so a runner
+    # that stalled past its lease cannot overwrite the result of the one that took over.
+    query = """
+        UPDATE messages
+        SET raw_text = ?, rendered_html = ?, status = ?, renderer_version = ?, render_text = ?
+        WHERE id = ?
+        """
+    params: tuple[Any, ...] = (raw_text, rendered_html, status, renderer_version, render_text, message_id)
+    if owner is not None:
+        query += " AND stream_owner = ?"
+        params += (owner,)
+    conn = get_db()
+    with conn:
+        cur = conn.execute(query, params)
+    return cur.rowcount == 1
+
+
+def claim_stream(message_id: int, owner: str, lease_s: float) -> bool:
+    now = time.time()
+    conn = get_db()
+    with conn:
+        cur = conn.execute(
+            """
+            UPDATE messages
+            SET stream_owner = ?, stream_lease_expires = ?
+            WHERE id = ?
+              AND status = 'streaming'
+              AND (stream_owner IS NULL OR stream_lease_expires < ?)
+            """,
+            (owner, now + lease_s, message_id, now),
+        )
+    return cur.rowcount == 1
+
+
+def renew_stream_claim(message_id: int, owner: str, lease_s: float) -> bool:
+    conn = get_db()
+    with conn:
+        cur = conn.execute(
+            "UPDATE messages SET stream_lease_expires = ? WHERE id = ? AND stream_owner = ?",
+            (time.time() + lease_s, message_id, owner),
+        )
+    return cur.rowcount == 1
+
+
+def release_stream_claim(message_id: int, owner: str) -> None:
     execute(
         """
         UPDATE messages
-        SET raw_text = ?, rendered_html = ?, status = ?
-        WHERE id = ?
+        SET stream_owner = NULL, stream_lease_expires = NULL
+        WHERE id = ? AND stream_owner = ?
         """,
-        (raw_text, rendered_html, status, message_id),
+        (message_id, owner),
     )
 
 
-def get_message(message_id: int) -> sqlite3.Row | None:
-    return fetch_one(
+def get_message(message_id: int) -> Message | None:
+    return fetch_record(
+        _message,
         """
         SELECT
           m.id,
@@ -139,6 +422,8 @@ def get_message(message_id: int) -> sqlite3.Row | None:
           m.rendered_html,
           m.status,
           m.created_at,
+          m.renderer_version,
+          m.render_text,
           mf.vote AS feedback_vote
         FROM messages m
         LEFT JOIN message_feedback mf ON mf.message_id = m.id
@@ -148,45 +433,199 @@ def get_message(message_id: int) -> sqlite3.Row | None:
     )
 
 
-def list_messages(conversation_id: int) -> list[sqlite3.Row]:
-    return fetch_all(
-        """
-        SELECT
-          m.id,
-          m.conversation_id,
-          m.role,
-          m.raw_text,
-          m.rendered_html,
-          m.status,
-          m.created_at,
-          mf.vote AS feedback_vote
-        FROM messages m
-        LEFT JOIN message_feedback mf ON mf.message_id = m.id
-        WHERE m.conversation_id = ?
-        ORDER BY m.created_at ASC, m.id ASC
-        """,
-        (conversation_id,),
-    )
+_MESSAGES_SQL = """
+    SELECT
+      m.id,
+      m.conversation_id,
+      m.role,
+      m.raw_text,
+      m.rendered_html,
+      m.status,
+      m.created_at,
+      m.renderer_version,
+      m.render_text,
+      mf.vote AS feedback_vote
+    FROM messages m
+    LEFT JOIN message_feedback mf ON mf.message_id = m.id
+    WHERE m.conversation_id = ?
+    ORDER BY m.created_at ASC, m.id ASC
+"""
+
+
+def list_messages(conversation_id: int) -> list[Message]:
+    return fetch_records(_message, _MESSAGES_SQL, (conversation_id,))
+
+
+def iter_messages(conversation_id: int) -> Iterator[Message]:
+    yield from map(_message, _tuple_cursor(_MESSAGES_SQL, (conversation_id,)))
 
 
 def list_history_for_conversation(
     conversation_id: int,
     up_to_message_id: int | None = None,
 ) -> list[dict[str, str]]:
+    return [
+        {"role": role, "content": content}
+        for role, content in history_turns(conversation_id, up_to_message_id)
+    ]
+
+
+def history_turns(
+    conversation_id: int,
+    up_to_message_id: int | None = None,
+) -> list[tuple[str, str]]:
     query = (
-        "SELECT id, role, raw_text FROM messages WHERE conversation_id = ?"
+        "SELECT role, raw_text FROM messages WHERE conversation_id = ?"
         " ORDER BY created_at ASC, id ASC"
     )
     params: tuple[Any, ...] = (conversation_id,)
     if up_to_message_id is not None:
         query = (
-            "SELECT id, role, raw_text FROM messages WHERE conversation_id = ? AND id < ?"
+            "SELECT role, raw_text FROM messages WHERE conversation_id = ? AND id < ?"
             " ORDER BY created_at ASC, id ASC"
         )
         params = (conversation_id, up_to_message_id)
+    return _tuple_cursor(query, params).fetchall()
 
-    rows = fetch_all(query, params)
-    return [{"role": row["role"], "content": row["raw_text"]} for row in rows]
+
+def tool_event_rows(
+    message_id: int,
+    tool_events: list[dict[str, Any]],
+    tool_timings: list[dict[str, Any]] | None = None,
+) -> list[tuple[Any, ...]]:
+    by_use_id: dict[str, dict[str, Any]] = {}
+    for index, event in enumerate(tool_events):
+        # Timings travel beside the raw deltas; older payloads carried them inline.
+        timing = tool_timings[index] if tool_timings is not None and index < len(tool_timings) else event
+        for key in ("toolUse", "toolResult"):
+            payload = event.get(key)
+            if not isinstance(payload, dict):
+                continue
+            tool_use_id = str(payload.get("toolUseId") or f"tool-{len(by_use_id) + 1}")
+            entry = by_use_id.setdefault(
+                tool_use_id,
+                {
+                    "name": None,
+                    "status": None,
+                    "used_at": None,
+                    "result_at": None,
+                    "use_ms": None,
+                    "result_ms": None,
+                },
+            )
+            entry["name"] = entry["name"] or payload.get("name") or payload.get("toolName")
+            offset_ms = timing.get("offsetMs")
+            if key == "toolUse":
+                entry["used_at"] = timing.get("receivedAt")
+                entry["use_ms"] = offset_ms
+            else:
+                entry["status"] = payload.get("status")
+                entry["result_at"] = timing.get("receivedAt")
+                entry["result_ms"] = offset_ms
+
+    rows: list[tuple[Any, ...]] = []
+    for tool_use_id, entry in by_use_id.items():
+        duration_ms = None
+        if entry["use_ms"] is not None and entry["result_ms"] is not None:
+            duration_ms = max(0, int(entry["result_ms"]) - int(entry["use_ms"]))
+        rows.append(
+            (
+                message_id,
+                tool_use_id,
+                str(entry["name"] or "tool"),
+                entry["status"],
+                entry["used_at"],
+                entry["result_at"],
+                duration_ms,
+            )
+        )
+    return rows
+
+
+def insert_tool_event_rows(conn: sqlite3.Connection, rows: list[tuple[Any, ...]]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO tool_events (
+          message_id,
+          tool_use_id,
+          tool_name,
+          status,
+          used_at,
+          result_at,
+          duration_ms
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+
+
+def _replace_tool_events(
+    conn: sqlite3.Connection,
+    message_id: int,
+    tool_events: list[dict[str, Any]],
+    tool_timings: list[dict[str, Any]] | None = None,
+) -> int:
+    conn.execute("DELETE FROM tool_events WHERE message_id = ?", (message_id,))
+    rows = tool_event_rows(message_id, tool_events, tool_timings)
+    insert_tool_event_rows(conn, rows)
+    return len(rows)
+
+
+UNKNOWN_MODEL_ID = "unknown"
+
+
+def _message_day(conn: sqlite3.Connection, message_id: int) -> str:
+    row = conn.execute(
+        "SELECT substr(created_at, 1, 10) AS day FROM messages WHERE id = ?",
+        (message_id,),
+    ).fetchone()
+    if row is None:
+        return utc_now_iso()[:10]
+    return str(row["day"])
+
+
+def _bump_usage_rollup(
+    conn: sqlite3.Connection,
+    day: str,
+    model_id: str,
+    sign: int,
+    input_tokens: int,
+    output_tokens: int,
+    latency_ms: int,
+) -> None:
+    conn.execute(
+        """
+        INSERT INTO usage_rollups (day, model_id, message_count, input_tokens, output_tokens, latency_ms_total)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, model_id) DO UPDATE SET
+          message_count = message_count + excluded.message_count,
+          input_tokens = input_tokens + excluded.input_tokens,
+          output_tokens = output_tokens + excluded.output_tokens,
+          latency_ms_total = latency_ms_total + excluded.latency_ms_total
+        """,
+        (day, model_id, sign, sign * input_tokens, sign * output_tokens, sign * latency_ms),
+    )
+
+
+def _bump_feedback_rollup(
+    conn: sqlite3.Connection,
+    day: str,
+    model_id: str,
+    vote: str,
+    sign: int,
+) -> None:
+    up_delta = sign if vote == "up" else 0
+    down_delta = sign if vote == "down" else 0
+    conn.execute(
+        """
+        INSERT INTO feedback_rollups (day, model_id, up_count, down_count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(day, model_id) DO UPDATE SET
+          up_count = up_count + excluded.up_count,
+          down_count = down_count + excluded.down_count
+        """,
+        (day, model_id, up_delta, down_delta),
+    )
 
 
 def save_assistant_metadata(
@@ -199,10 +638,86 @@ def save_assistant_metadata(
     latency_ms: int,
     tool_events: list[dict[str, Any]],
     raw_event_count: int,
+    tool_timings: list[dict[str, Any]] | None = None,
 ) -> None:
-    execute(
+    conn = get_db()
+    with conn:
+        previous = conn.execute(
+            """
+            SELECT model_id, input_tokens, output_tokens, latency_ms
+            FROM assistant_metadata
+            WHERE message_id = ?
+            """,
+            (message_id,),
+        ).fetchone()
+        conn.execute(
+            """
+            INSERT INTO assistant_metadata (
+              message_id,
+              provider,
+              model_id,
+              stop_reason,
+              input_tokens,
+              output_tokens,
+              latency_ms,
+              tool_events_json,
+              raw_event_count
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(message_id) DO UPDATE SET
+              provider = excluded.provider,
+              model_id = excluded.model_id,
+              stop_reason = excluded.stop_reason,
+              input_tokens = excluded.input_tokens,
+              output_tokens = excluded.output_tokens,
+              latency_ms = excluded.latency_ms,
+              tool_events_json = excluded.tool_events_json,
+              raw_event_count = excluded.raw_event_count
+            """,
+            (
+                message_id,
+                provider,
+                model_id,
+                stop_reason,
+                input_tokens,
+                output_tokens,
+                latency_ms,
+                json.dumps(tool_events),
+                raw_event_count,
+            ),
+        )
+        _replace_tool_events(conn, message_id, tool_events, tool_timings)
+
+        day = _message_day(conn, message_id)
+        if previous is not None:
+            _bump_usage_rollup(
+                conn,
+                day,
+                str(previous["model_id"]),
+                -1,
+                int(previous["input_tokens"]),
+                int(previous["output_tokens"]),
+                int(previous["latency_ms"]),
+            )
+        _bump_usage_rollup(conn, day, model_id, 1, input_tokens, output_tokens, latency_ms)
+
+        # A vote cast before the metadata existed was counted under UNKNOWN_MODEL_ID; move it to
+        # the model that actually answered (or to the new model on a re-save).
+        previous_model_id = str(previous["model_id"]) if previous is not None else UNKNOWN_MODEL_ID
+        if previous_model_id != model_id:
+            feedback = conn.execute(
+                "SELECT vote FROM message_feedback WHERE message_id = ?",
+                (message_id,),
+            ).fetchone()
+            if feedback is not None:
+                _bump_feedback_rollup(conn, day, previous_model_id, str(feedback["vote"]), -1)
+                _bump_feedback_rollup(conn, day, model_id, str(feedback["vote"]), 1)
+
+
+def get_assistant_metadata(message_id: int) -> AssistantMetadata | None:
+    return fetch_record(
+        _assistant_metadata,
         """
-        INSERT INTO assistant_metadata (
+        SELECT
           message_id,
           provider,
           model_id,
@@ -212,42 +727,118 @@ def save_assistant_metadata(
           latency_ms,
           tool_events_json,
           raw_event_count
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(message_id) DO UPDATE SET
-          provider = excluded.provider,
-          model_id = excluded.model_id,
-          stop_reason = excluded.stop_reason,
-          input_tokens = excluded.input_tokens,
-          output_tokens = excluded.output_tokens,
-          latency_ms = excluded.latency_ms,
-          tool_events_json = excluded.tool_events_json,
-          raw_event_count = excluded.raw_event_count
+        FROM assistant_metadata
+        WHERE message_id = ?
         """,
-        (
-            message_id,
-            provider,
-            model_id,
-            stop_reason,
-            input_tokens,
-            output_tokens,
-            latency_ms,
-            json.dumps(tool_events),
-            raw_event_count,
-        ),
+        (message_id,),
     )
 
 
-def upsert_feedback(message_id: int, vote: str) -> None:
-    execute(
+def create_action_job(message_id: int | None, action_id: str, lease_s: float = 300) -> int:
+    # A queued job leases too, so one whose process died before starting it is swept up again.
+    return execute(
         """
-        INSERT INTO message_feedback (message_id, vote, updated_at)
-        VALUES (?, ?, ?)
-        ON CONFLICT(message_id) DO UPDATE SET
-          vote = excluded.vote,
-          updated_at = excluded.updated_at
+        INSERT INTO action_jobs (message_id, action_id, status, created_at, lease_expires)
+        VALUES (?, ?, 'queued', ?, ?)
+        """,
+        (message_id, action_id, utc_now_iso(), time.time() + lease_s),
+    )
+
+
+def get_action_job(job_id: int) -> ActionJob | None:
+    return fetch_record(
+        _action_job,
+        """
+        SELECT id, message_id, action_id, status, result, created_at, started_at, finished_at
+        FROM action_jobs
+        WHERE id = ?
+        """,
+        (job_id,),
+    )
+
+
+def start_action_job(job_id: int, lease_s: float, owner: str | None = None) -> bool:
+    # Claims a queued job, or one whose runner stopped before finishing (expired lease).
+    now = time.time()
+    conn = get_db()
+    with conn:
+        cur = conn.execute(
+            """
+            UPDATE action_jobs
+            SET status = 'running', started_at = ?, lease_expires = ?, claim_owner = ?
+            WHERE id = ?
+              AND (status = 'queued' OR (status = 'running' AND lease_expires < ?))
+            """,
+            (utc_now_iso(), now + lease_s, owner, job_id, now),
+        )
+    return cur.rowcount == 1
+
+
+def finish_action_job(job_id: int, status: str, result: str, owner: str | None = None) -> bool:
+    # With an owner, a runner that stalled past its lease cannot overwrite a reclaimed job.
+    query = """
+        UPDATE action_jobs
+        SET status = ?, result = ?, finished_at = ?, lease_expires = NULL, claim_owner = NULL
+        WHERE id = ? AND status = 'running'
+        """
+    params: tuple[Any, ...] = (status, result, utc_now_iso(), job_id)
+    if owner is not None:
+        query += " AND claim_owner = ?"
+        params += (owner,)
+    conn = get_db()
+    with conn:
+        cur = conn.execute(query, params)
+    return cur.rowcount == 1
+
+
+def list_runnable_action_jobs(expired_only: bool = False) -> list[int]:
+    # A new queue takes every queued job; the periodic sweep only takes the ones whose lease
+    # ran out, since a live process may still hold the rest in its executor.
+    rows = get_db().execute(
+        """
+        SELECT id
+        FROM action_jobs
+        WHERE status IN ('queued', 'running')
+          AND ((status = 'queued' AND NOT ?) OR COALESCE(lease_expires, 0) < ?)
+        ORDER BY id
         """,
-        (message_id, vote, utc_now_iso()),
+        (expired_only, time.time()),
     )
+    return [int(row["id"]) for row in rows]
+
+
+def upsert_feedback(message_id: int, vote: str) -> None:
+    conn = get_db()
+    with conn:
+        previous = conn.execute(
+            """
+            SELECT mf.vote, am.model_id
+            FROM messages m
+            LEFT JOIN message_feedback mf ON mf.message_id = m.id
+            LEFT JOIN assistant_metadata am ON am.message_id = m.id
+            WHERE m.id = ?
+            """,
+            (message_id,),
+        ).fetchone()
+        conn.execute(
+            """
+            INSERT INTO message_feedback (message_id, vote, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(message_id) DO UPDATE SET
+              vote = excluded.vote,
+              updated_at = excluded.updated_at
+            """,
+            (message_id, vote, utc_now_iso()),
+        )
+
+        previous_vote = previous["vote"] if previous is not None else None
+        if previous_vote == vote:
+            return
+        day = _message_day(conn, message_id)
+        model_id = str((previous["model_id"] if previous is not None else None) or UNKNOWN_MODEL_ID)
+        if previous_vote is not None:
+            _bump_feedback_rollup(conn, day, model_id, str(previous_vote), -1)
+        _bump_feedback_rollup(conn, day, model_id, vote, 1)
 
 
 def get_feedback(message_id: int) -> str | None:
@@ -258,7 +849,176 @@ def get_feedback(message_id: int) -> str | None:
 
 
 def conversation_count() -> int:
-    row = fetch_one("SELECT COUNT(*) AS count FROM conversations")
+    # Maintained by triggers on conversations, so every insert/delete path keeps it exact.
+    row = fetch_one("SELECT value AS count FROM counters WHERE name = 'conversations'")
     if row is None:
         return 0
     return int(row["count"])
+
+
+def list_tool_events(message_id: int) -> list[sqlite3.Row]:
+    return fetch_all(
+        """
+        SELECT tool_use_id, tool_name, status, used_at, result_at, duration_ms
+        FROM tool_events
+        WHERE message_id = ?
+        ORDER BY id ASC
+        """,
+        (message_id,),
+    )
+
+
+def tool_duration_stats(percentile: float = 0.95) -> list[dict[str, Any]]:
+    conn = get_read_db()
+    summaries = conn.execute(
+        """
+        SELECT
+          tool_name,
+          COUNT(duration_ms) AS timed_count,
+          AVG(duration_ms) AS avg_ms,
+          MAX(duration_ms) AS max_ms
+        FROM tool_events
+        WHERE duration_ms IS NOT NULL
+        GROUP BY tool_name
+        ORDER BY tool_name
+        """
+    ).fetchall()
+
+    stats: list[dict[str, Any]] = []
+    for row in summaries:
+        timed_count = int(row["timed_count"])
+        offset = min(timed_count - 1, max(0, math.ceil(timed_count * percentile) - 1))
+        pct_row = conn.execute(
+            """
+            SELECT duration_ms FROM tool_events
+            WHERE tool_name = ? AND duration_ms IS NOT NULL
+            ORDER BY duration_ms
+            LIMIT 1 OFFSET ?
+            """,
+            (row["tool_name"], offset),
+        ).fetchone()
+        stats.append(
+            {
+                "tool_name": str(row["tool_name"]),
+                "count": timed_count,
+                "avg_ms": float(row["avg_ms"]),
+                "max_ms": int(row["max_ms"]),
+                "percentile_ms": int(pct_row["duration_ms"]),
+            }
+        )
+    return stats
+
+
+def backfill_tool_events(chunk_size: int = 500) -> int:
+    conn = get_db()
+    last_message_id = 0
+    migrated = 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT am.message_id, am.tool_events_json
+            FROM assistant_metadata am
+            WHERE am.message_id > ?
+              AND am.tool_events_json != '[]'
+              AND NOT EXISTS (SELECT 1 FROM tool_events te WHERE te.message_id = am.message_id)
+            ORDER BY am.message_id
+            LIMIT ?
+            """,
+            (last_message_id, chunk_size),
+        ).fetchall()
+        if not rows:
+            return migrated
+
+        with conn:
+            for row in rows:
+                try:
+                    tool_events = json.loads(row["tool_events_json"])
+                except json.JSONDecodeError:
+                    continue
+                # Only messages that actually gained rows count; payloads without any toolUse or
+                # toolResult entries have nothing to migrate.
+                if isinstance(tool_events, list) and _replace_tool_events(conn, int(row["message_id"]), tool_events):
+                    migrated += 1
+        last_message_id = int(rows[-1]["message_id"])
+
+
+@click.command("backfill-tool-events")
+@click.option("--chunk-size", default=500, show_default=True, type=click.IntRange(min=1))
+@with_appcontext
+def backfill_tool_events_command(chunk_size: int) -> None:
+    start = time.monotonic()
+    migrated = backfill_tool_events(chunk_size=chunk_size)
+    elapsed_ms = int((time.monotonic() - start) * 1000)
+    click.echo(f"Backfilled tool events for {migrated} messages in {elapsed_ms} ms.")
+
+
+def list_usage_rollups(since_day: str | None = None) -> list[sqlite3.Row]:
+    return fetch_all(
+        """
+        SELECT day, model_id, message_count, input_tokens, output_tokens, latency_ms_total
+        FROM usage_rollups
+        WHERE day >= ? AND message_count > 0
+        ORDER BY day ASC, model_id ASC
+        """,
+        (since_day or "",),
+    )
+
+
+def list_feedback_rollups(since_day: str | None = None) -> list[sqlite3.Row]:
+    return fetch_all(
+        """
+        SELECT day, model_id, up_count, down_count
+        FROM feedback_rollups
+        WHERE day >= ? AND (up_count > 0 OR down_count > 0)
+        ORDER BY day ASC, model_id ASC
+        """,
+        (since_day or "",),
+    )
+
+
+def rebuild_rollups() -> None:
+    # Derives both tables from live rows. The incremental path (metadata saves, votes, and the
+    # message delete trigger) keeps them equal to this, so a rebuild only repairs drift.
+    conn = get_db()
+    with conn:
+        conn.execute("DELETE FROM usage_rollups")
+        conn.execute("DELETE FROM feedback_rollups")
+        conn.execute(
+            """
+            INSERT INTO usage_rollups (day, model_id, message_count, input_tokens, output_tokens, latency_ms_total)
+            SELECT
+              substr(m.created_at, 1, 10),
+              am.model_id,
+              COUNT(*),
+              SUM(am.input_tokens),
+              SUM(am.output_tokens),
+              SUM(am.latency_ms)
+            FROM assistant_metadata am
+            JOIN messages m ON m.id = am.message_id
+            GROUP BY 1, 2
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO feedback_rollups (day, model_id, up_count, down_count)
+            SELECT
+              substr(m.created_at, 1, 10),
+              COALESCE(am.model_id, ?),
+              SUM(mf.vote = 'up'),
+              SUM(mf.vote = 'down')
+            FROM message_feedback mf
+            JOIN messages m ON m.id = mf.message_id
+            LEFT JOIN assistant_metadata am ON am.message_id = mf.message_id
+            GROUP BY 1, 2
+            """,
+            (UNKNOWN_MODEL_ID,),
+        )
+
+
+@click.command("rebuild-rollups")
+@with_appcontext
+def rebuild_rollups_command() -> None:
+    start = time.monotonic()
+    rebuild_rollups()
+    elapsed_ms = int((time.monotonic() - start) * 1000)
+    click.echo(f"Rebuilt analytics rollups in {elapsed_ms} ms.")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from functools import partial
+from typing import Any, Callable, NamedTuple, TypeVar
+
+R = TypeVar("R", bound=tuple)
+
+
+# Hot-path rows are immutable tuple records (`__slots__ = ()`, fields read through C-level
+# descriptors) instead of sqlite3.Row, whose string-keyed lookups go through a name scan and,
+# from Jinja, a failed getattr first. Subscript and dict() access still work for older callers.
+def _row_compatible(cls: type[R]) -> type[R]:
+    fields = cls._fields  # type: ignore[attr-defined]
+    positions = {name: index for index, name in enumerate(fields)}
+
+    def __getitem__(self, key):  # type: ignore[no-untyped-def]
+        if isinstance(key, str):
+            return tuple.__getitem__(self, positions[key])
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> tuple[str, ...]:
+        return fields
+
+    cls.__getitem__ = __getitem__  # type: ignore[method-assign]
+    cls.keys = keys  # type: ignore[attr-defined]
+    return cls
+
+
+def record_factory(cls: type[R]) -> Callable[[Any], R]:
+    # Skips NamedTuple._make's Python-level length check; the SELECT lists match the fields.
+    return partial(tuple.__new__, cls)
+
+
+@_row_compatible
+class Conversation(NamedTuple):
+    id: int
+    title: str
+    created_at: str
+    updated_at: str
+    revision: int
+
+
+@_row_compatible
+class Message(NamedTuple):
+    id: int
+    conversation_id: int
+    role: str
+    raw_text: str
+    rendered_html: str
+    status: str
+    created_at: str
+    renderer_version: int
+    # The text the HTML is rendered from when it differs from raw_text (tool-status markers
+    # are kept out of raw_text, which is also the model's history); NULL means raw_text.
+    render_text: str | None
+    feedback_vote: str | None
+
+
+@_row_compatible
+class AssistantMetadata(NamedTuple):
+    message_id: int
+    provider: str
+    model_id: str
+    stop_reason: str
+    input_tokens: int
+    output_tokens: int
+    latency_ms: int
+    tool_events_json: str
+    raw_event_count: int
+
+
+@_row_compatible
+class ActionJob(NamedTuple):
+    id: int
+    message_id: int | None
+    action_id: str
+    status: str
+    result: str | None
+    created_at: str
+    started_at: str | None
+    finished_at: str | None
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from flask import Blueprint, abort, jsonify, request
+
+from chat_hateoas import db
+
+bp = Blueprint("analytics", __name__, url_prefix="/analytics")
+
+
+def _since_day() -> str | None:
+    days = request.args.get("days", type=int)
+    if days is None:
+        return None
+    if days <= 0:
+        abort(400, description="days must be positive")
+    return (datetime.now(UTC).date() - timedelta(days=days - 1)).isoformat()
+
+
+@bp.get("/feedback")
+@db.read_only(db.ROUTE_SNAPSHOT)
+def feedback_rates() -> Any:
+    items = []
+    for row in db.list_feedback_rollups(_since_day()):
+        up_count = int(row["up_count"])
+        down_count = int(row["down_count"])
+        total = up_count + down_count
+        items.append(
+            {
+                "day": row["day"],
+                "model_id": row["model_id"],
+                "up": up_count,
+                "down": down_count,
+                "up_rate": round(up_count / total, 4) if total else None,
+            }
+        )
+    return jsonify({"items": items})
+
+
+@bp.get("/usage")
+@db.read_only(db.ROUTE_SNAPSHOT)
+def usage() -> Any:
+    items = []
+    for row in db.list_usage_rollups(_since_day()):
+        message_count = int(row["message_count"])
+        items.append(
+            {
+                "day": row["day"],
+                "model_id": row["model_id"],
+                "messages": message_count,
+                "input_tokens": int(row["input_tokens"]),
+                "output_tokens": int(row["output_tokens"]),
+                "avg_latency_ms": round(int(row["latency_ms_total"]) / message_count, 1),
+            }
+        )
+    return jsonify({"items": items})
@@ -2,30 +2,149 @@ from __future__ import annotations
 
 import json
 import random
+import threading
 import time
+import uuid
+from dataclasses import dataclass
 from html import escape
-from typing import Any, Iterator
-
-from flask import Blueprint, Response, abort, current_app, stream_with_context, url_for
+from typing import Any, Callable, ContextManager, Iterator
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    copy_current_request_context,
+    current_app,
+    jsonify,
+    render_template,
+    stream_with_context,
+    url_for,
+)
 
 from chat_hateoas import db
-from chat_hateoas.services.mock_bedrock import MockBedrockClient
+from chat_hateoas.records import Message
+from chat_hateoas.services import profiling
+from chat_hateoas.services.admission import (
+    AdmissionController,
+    AdmissionTicket,
+    stream_limits,
+    tab_stream_limit,
+)
+from chat_hateoas.services.message_html import html_for_storage
+from chat_hateoas.services.providers import PROVIDER_MOCK, StreamProvider, get_provider, provider_kind
 from chat_hateoas.services.render import render_stream_delta, render_stream_done
-from chat_hateoas.services.transform import render_assistant_html
+from chat_hateoas.services.render_pool import render_assistant
+from chat_hateoas.services.response_cache import (
+    RecordingProvider,
+    ReplayProvider,
+    ResponseCache,
+    response_cache_key,
+)
+from chat_hateoas.services.send_buffer import SendBuffer, StreamMetrics, sse_event
+from chat_hateoas.services.tab_streams import TabStreams, valid_tab_id
+from chat_hateoas.services.transform import RENDERER_VERSION
 
 bp = Blueprint("stream", __name__)
 
 
-def _sse_event(event_name: str, data: str) -> str:
-    lines = data.splitlines() or [""]
-    payload = [f"event: {event_name}"]
-    payload.extend(f"data: {line}" for line in lines)
-    payload.append("")
-    return "\n".join(payload) + "\n"
+class StreamClaimLost(RuntimeError):
+    pass
+
+
+class StreamCancelled(RuntimeError):
+    pass
+
+
+def _stream_metrics() -> StreamMetrics:
+    metrics = current_app.extensions.get("stream_metrics")
+    if metrics is None:
+        metrics = StreamMetrics()
+        current_app.extensions["stream_metrics"] = metrics
+    return metrics
+
+
+def _admission() -> AdmissionController:
+    controller = current_app.extensions.get("stream_admission")
+    if controller is None:
+        max_active, max_queued = stream_limits(current_app.config)
+        controller = AdmissionController(max_active=max_active, max_queued=max_queued)
+        current_app.extensions["stream_admission"] = controller
+    return controller
+
+
+def _tab_streams() -> TabStreams:
+    tabs = current_app.extensions.get("tab_streams")
+    if tabs is None:
+        tabs = TabStreams(max_open=tab_stream_limit(current_app.config))
+        current_app.extensions["tab_streams"] = tabs
+    return tabs
+
+
+def _send_buffer() -> SendBuffer:
+    return SendBuffer(
+        max_events=int(current_app.config.get("STREAM_SEND_BUFFER_EVENTS", 64)),
+        policy=str(current_app.config.get("STREAM_SLOW_CLIENT_POLICY", "coalesce")),
+        metrics=_stream_metrics(),
+        grace_s=int(current_app.config.get("STREAM_SLOW_CLIENT_GRACE_MS", 250)) / 1000.0,
+    )
+
+
+def _response_cache() -> ResponseCache | None:
+    if not current_app.config.get("RESPONSE_CACHE", False):
+        return None
+    cache = current_app.extensions.get("response_cache")
+    if cache is None:
+        cache = ResponseCache(
+            max_entries=int(current_app.config.get("RESPONSE_CACHE_SIZE", 256)),
+            max_bytes=int(current_app.config.get("RESPONSE_CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+            ttl_s=float(current_app.config.get("RESPONSE_CACHE_TTL_S", 600)),
+        )
+        current_app.extensions["response_cache"] = cache
+    return cache
+
+
+def _stream_provider(
+    seed: int,
+    history: list[dict[str, str]],
+    model_id: str,
+    max_tokens: int,
+    temperature: float,
+) -> tuple[StreamProvider, bool]:
+    cache = _response_cache()
+    if cache is None:
+        return get_provider(seed), False
+    key = response_cache_key(provider_kind(), history, model_id, max_tokens, temperature)
+    cached = cache.get(key)
+    if cached is not None:
+        return ReplayProvider(cached), True
+    return RecordingProvider(get_provider(seed), cache, key), False
+
+
+def _queued_html(position: int) -> str:
+    return (
+        f"<span class=\"thinking\" data-queue-position=\"{position}\">"
+        f"<span class=\"spinner-dot\"></span>Queued (position {position})...</span>"
+    )
 
 
 def _sse_json(event_name: str, payload: dict[str, Any]) -> str:
-    return _sse_event(event_name, json.dumps(payload))
+    return sse_event(event_name, json.dumps(payload))
+
+
+def _mux_emit(message_id: int) -> Callable[[str, str], str]:
+    # On the shared tab stream, fragments that the per-message stream swaps into its own
+    # element are addressed to their stream target out of band instead.
+    target = f"#stream-target-{message_id}"
+
+    def emit(event_name: str, data: str) -> str:
+        if event_name in {"queued", "ui_delta"}:
+            return sse_event(event_name, f"<div hx-swap-oob=\"innerHTML:{target}\">{data}</div>")
+        if event_name in {"ui_done", "debug_event"}:
+            return sse_event(event_name, data)
+        # Raw provider events are never swapped by the page; only the debug lines are shown.
+        return ""
+
+    return emit
 
 
 def _tool_status_marker(tool_id: str, state: str, label: str) -> str:
@@ -46,27 +165,27 @@ def _debug_line_oob(message_id: int, event_type: str, payload: dict[str, Any]) -
     )
 
 
-@bp.get("/responses/<int:assistant_message_id>/stream")
-def stream_response(assistant_message_id: int) -> Response:
-    message = db.get_message(assistant_message_id)
-    if message is None or message["role"] != "assistant":
-        abort(404)
-
-    if message["status"] == "complete":
-        done_html = render_stream_done(message)
-
-        def complete_once() -> Iterator[str]:
-            yield _sse_event("ui_done", done_html)
-
-        response = Response(stream_with_context(complete_once()), mimetype="text/event-stream")
-        response.headers["Cache-Control"] = "no-cache"
-        response.headers["X-Accel-Buffering"] = "no"
-        return response
-
-    if message["status"] != "streaming":
-        abort(409, description="message not streamable")
-
-    conversation_id = int(message["conversation_id"])
+@dataclass(slots=True)
+class _StreamJob:
+    message_id: int
+    conversation_id: int
+    claim_owner: str
+    lease_s: float
+    history: list[dict[str, str]]
+    model_id: str
+    max_tokens: int
+    temperature: float
+    client: StreamProvider
+    delay_min_ms: int
+    delay_max_ms: int
+    tool_call_delay_ms: int
+    delay_rng: random.Random
+    action_url: str
+
+
+def _prepare_job(message: Message, claim_owner: str, lease_s: float) -> _StreamJob:
+    assistant_message_id = message.id
+    conversation_id = message.conversation_id
     history = db.list_history_for_conversation(conversation_id, up_to_message_id=assistant_message_id)
 
     model_id = str(current_app.config["MODEL_ID"])
@@ -80,165 +199,461 @@ def stream_response(assistant_message_id: int) -> Response:
         delay_min_ms = 0
     if delay_max_ms < delay_min_ms:
         delay_max_ms = delay_min_ms
-
-    client = MockBedrockClient(seed=seed)
+    client, replayed = _stream_provider(seed, history, model_id, max_tokens, temperature)
+    if replayed or provider_kind() != PROVIDER_MOCK:
+        # Simulated pacing is for the mock only; real providers and cache replays bring their own.
+        delay_min_ms = delay_max_ms = tool_call_delay_ms = 0
     delay_rng = random.Random(seed + 1000)
     action_url = url_for("web.fake_action")
+    return _StreamJob(
+        message_id=assistant_message_id,
+        conversation_id=conversation_id,
+        claim_owner=claim_owner,
+        lease_s=lease_s,
+        history=history,
+        model_id=model_id,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        client=client,
+        delay_min_ms=delay_min_ms,
+        delay_max_ms=delay_max_ms,
+        tool_call_delay_ms=tool_call_delay_ms,
+        delay_rng=delay_rng,
+        action_url=action_url,
+    )
 
-    @stream_with_context
-    def generate() -> Iterator[str]:
-        assembled_text = ""
-        render_text = ""
-        raw_event_count = 0
-        tool_events: list[dict[str, Any]] = []
-        tool_markers: dict[str, str] = {}
-        stop_reason = "end_turn"
-        input_tokens = 0
-        output_tokens = 0
-        start = time.monotonic()
 
-        try:
-            for event in client.converse_stream(
-                messages=history,
-                model_id=model_id,
-                max_tokens=max_tokens,
-                temperature=temperature,
-            ):
-                raw_event_count += 1
-                event_type = str(event.get("type", "unknown"))
-                yield _sse_json(event_type, event)
-                yield _sse_event("debug_event", _debug_line_oob(assistant_message_id, event_type, event))
-
-                if event_type == "messageStop":
-                    stop_reason = str(event.get("stopReason", stop_reason))
-
-                if event_type == "metadata":
-                    metadata = event.get("metadata", {})
-                    usage = metadata.get("usage", {})
-                    input_tokens = int(usage.get("inputTokens", 0))
-                    output_tokens = int(usage.get("outputTokens", 0))
-
-                if event_type == "contentBlockDelta":
-                    delta = event.get("delta", {})
-                    if isinstance(delta, dict) and "text" in delta:
-                        text_delta = str(delta["text"])
-                        assembled_text += text_delta
-                        render_text += text_delta
-
-                        rendered = render_assistant_html(
-                            raw_text=render_text,
-                            message_id=assistant_message_id,
-                            action_url=action_url,
+def _generate(
+    job: _StreamJob,
+    send_buffer: SendBuffer,
+    emit: Callable[[str, str], str] = sse_event,
+) -> Iterator[str]:
+    assembled_text = ""
+    render_text = ""
+    raw_event_count = 0
+    tool_events: list[dict[str, Any]] = []
+    tool_timings: list[dict[str, Any]] = []
+    tool_markers: dict[str, str] = {}
+    stop_reason = "end_turn"
+    input_tokens = 0
+    output_tokens = 0
+    start = time.monotonic()
+    lease_renew_at = start + job.lease_s / 2
+
+    try:
+        for event in job.client.converse_stream(
+            messages=job.history,
+            model_id=job.model_id,
+            max_tokens=job.max_tokens,
+            temperature=job.temperature,
+        ):
+            raw_event_count += 1
+            if send_buffer.cancelled.is_set():
+                raise StreamCancelled
+            if time.monotonic() >= lease_renew_at:
+                if not db.renew_stream_claim(job.message_id, job.claim_owner, job.lease_s):
+                    raise StreamClaimLost(f"stream claim for message {job.message_id} lost")
+                lease_renew_at = time.monotonic() + job.lease_s / 2
+            event_type = str(event.get("type", "unknown"))
+            yield emit(event_type, json.dumps(event))
+            yield emit("debug_event", _debug_line_oob(job.message_id, event_type, event))
+
+            if event_type == "messageStop":
+                stop_reason = str(event.get("stopReason", stop_reason))
+
+            if event_type == "metadata":
+                metadata = event.get("metadata", {})
+                usage = metadata.get("usage", {})
+                input_tokens = int(usage.get("inputTokens", 0))
+                output_tokens = int(usage.get("outputTokens", 0))
+
+            if event_type == "contentBlockDelta":
+                delta = event.get("delta", {})
+                if isinstance(delta, dict) and "text" in delta:
+                    text_delta = str(delta["text"])
+                    assembled_text += text_delta
+                    render_text += text_delta
+
+                    rendered = render_assistant(
+                        raw_text=render_text,
+                        message_id=job.message_id,
+                        action_url=job.action_url,
+                    )
+                    yield emit("ui_delta", render_stream_delta(rendered))
+                    if job.delay_max_ms > 0:
+                        sleep_ms = (
+                            job.delay_rng.randint(job.delay_min_ms, job.delay_max_ms)
+                            if job.delay_max_ms > job.delay_min_ms
+                            else job.delay_max_ms
                         )
-                        yield _sse_event("ui_delta", render_stream_delta(rendered))
-                        if delay_max_ms > 0:
-                            sleep_ms = (
-                                delay_rng.randint(delay_min_ms, delay_max_ms)
-                                if delay_max_ms > delay_min_ms
-                                else delay_max_ms
-                            )
-                            if sleep_ms > 0:
-                                time.sleep(sleep_ms / 1000.0)
-
-                    if isinstance(delta, dict) and "toolUse" in delta:
-                        tool_use = delta.get("toolUse", {})
-                        tool_name = str(tool_use.get("name") or tool_use.get("toolName") or "tool")
-                        tool_use_id = str(tool_use.get("toolUseId") or f"tool-{len(tool_markers) + 1}")
-                        running_marker = _tool_status_marker(
-                            tool_use_id,
-                            "running",
-                            f"Running {tool_name}...",
-                        )
-                        tool_markers[tool_use_id] = running_marker
+                        if sleep_ms > 0 and send_buffer.cancelled.wait(sleep_ms / 1000.0):
+                            raise StreamCancelled
+
+                if isinstance(delta, dict) and "toolUse" in delta:
+                    tool_use = delta.get("toolUse", {})
+                    tool_name = str(tool_use.get("name") or tool_use.get("toolName") or "tool")
+                    tool_use_id = str(tool_use.get("toolUseId") or f"tool-{len(tool_markers) + 1}")
+                    running_marker = _tool_status_marker(
+                        tool_use_id,
+                        "running",
+                        f"Running {tool_name}...",
+                    )
+                    tool_markers[tool_use_id] = running_marker
+                    if render_text and not render_text.endswith("\n"):
+                        render_text += "\n"
+                    render_text += f"{running_marker}\n"
+
+                    rendered = render_assistant(
+                        raw_text=render_text,
+                        message_id=job.message_id,
+                        action_url=job.action_url,
+                    )
+                    yield emit("ui_delta", render_stream_delta(rendered))
+                    tool_events.append(delta)
+                    tool_timings.append(
+                        {"receivedAt": db.utc_now_iso(), "offsetMs": int((time.monotonic() - start) * 1000)}
+                    )
+                    tool_call_delay_s = job.tool_call_delay_ms / 1000.0
+                    if tool_call_delay_s > 0 and send_buffer.cancelled.wait(tool_call_delay_s):
+                        raise StreamCancelled
+
+                if isinstance(delta, dict) and "toolResult" in delta:
+                    tool_result = delta.get("toolResult", {})
+                    status = str(tool_result.get("status", "ok"))
+                    tool_use_id = str(tool_result.get("toolUseId", ""))
+                    tool_name = str(tool_result.get("name") or tool_result.get("toolName") or "tool")
+                    done_marker = _tool_status_marker(
+                        tool_use_id or f"tool-{len(tool_markers) + 1}",
+                        "done",
+                        f"Tool completed: {tool_name} ({status})",
+                    )
+                    if tool_use_id and tool_use_id in tool_markers:
+                        old_marker = tool_markers[tool_use_id]
+                        render_text = render_text.replace(old_marker, done_marker, 1)
+                        tool_markers[tool_use_id] = done_marker
+                    else:
                         if render_text and not render_text.endswith("\n"):
                             render_text += "\n"
-                        render_text += f"{running_marker}\n"
-
-                        rendered = render_assistant_html(
-                            raw_text=render_text,
-                            message_id=assistant_message_id,
-                            action_url=action_url,
-                        )
-                        yield _sse_event("ui_delta", render_stream_delta(rendered))
-                        tool_events.append(delta)
-                        if tool_call_delay_ms > 0:
-                            time.sleep(tool_call_delay_ms / 1000.0)
-
-                    if isinstance(delta, dict) and "toolResult" in delta:
-                        tool_result = delta.get("toolResult", {})
-                        status = str(tool_result.get("status", "ok"))
-                        tool_use_id = str(tool_result.get("toolUseId", ""))
-                        tool_name = str(tool_result.get("name") or tool_result.get("toolName") or "tool")
-                        done_marker = _tool_status_marker(
-                            tool_use_id or f"tool-{len(tool_markers) + 1}",
-                            "done",
-                            f"Tool completed: {tool_name} ({status})",
-                        )
-                        if tool_use_id and tool_use_id in tool_markers:
-                            old_marker = tool_markers[tool_use_id]
-                            render_text = render_text.replace(old_marker, done_marker, 1)
+                        render_text += f"{done_marker}\n"
+                        if tool_use_id:
                             tool_markers[tool_use_id] = done_marker
-                        else:
-                            if render_text and not render_text.endswith("\n"):
-                                render_text += "\n"
-                            render_text += f"{done_marker}\n"
-                            if tool_use_id:
-                                tool_markers[tool_use_id] = done_marker
-
-                        rendered = render_assistant_html(
-                            raw_text=render_text,
-                            message_id=assistant_message_id,
-                            action_url=action_url,
-                        )
-                        yield _sse_event("ui_delta", render_stream_delta(rendered))
-                        tool_events.append(delta)
-
-            final_html = render_assistant_html(
-                render_text,
-                assistant_message_id,
-                action_url=action_url,
-            )
-            db.update_message(
-                message_id=assistant_message_id,
-                raw_text=assembled_text,
-                rendered_html=final_html,
-                status="complete",
-            )
-            db.update_conversation_timestamp(conversation_id)
-
-            latency_ms = int((time.monotonic() - start) * 1000)
-            db.save_assistant_metadata(
-                message_id=assistant_message_id,
-                provider="mock-bedrock",
-                model_id=model_id,
-                stop_reason=stop_reason,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                latency_ms=latency_ms,
-                tool_events=tool_events,
-                raw_event_count=raw_event_count,
-            )
-
-            completed_message = db.get_message(assistant_message_id)
-            if completed_message is None:
-                abort(404)
-
-            done_html = render_stream_done(completed_message)
-            yield _sse_event("ui_done", done_html)
-        except Exception:
-            db.update_message(
-                message_id=assistant_message_id,
-                raw_text=assembled_text,
-                rendered_html=render_assistant_html(
+
+                    rendered = render_assistant(
+                        raw_text=render_text,
+                        message_id=job.message_id,
+                        action_url=job.action_url,
+                    )
+                    yield emit("ui_delta", render_stream_delta(rendered))
+                    tool_events.append(delta)
+                    tool_timings.append(
+                        {"receivedAt": db.utc_now_iso(), "offsetMs": int((time.monotonic() - start) * 1000)}
+                    )
+
+        final_html = render_assistant(
+            render_text,
+            job.message_id,
+            action_url=job.action_url,
+        )
+        if not db.update_message(
+            message_id=job.message_id,
+            raw_text=assembled_text,
+            rendered_html=html_for_storage(final_html),
+            status="complete",
+            renderer_version=RENDERER_VERSION,
+            owner=job.claim_owner,
+            render_text=render_text if render_text != assembled_text else None,
+        ):
+            raise StreamClaimLost(f"stream claim for message {job.message_id} lost")
+        db.update_conversation_timestamp(job.conversation_id)
+
+        latency_ms = int((time.monotonic() - start) * 1000)
+        db.save_assistant_metadata(
+            message_id=job.message_id,
+            provider=job.client.provider_name,
+            model_id=job.model_id,
+            stop_reason=stop_reason,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency_ms=latency_ms,
+            tool_events=tool_events,
+            raw_event_count=raw_event_count,
+            tool_timings=tool_timings,
+        )
+
+        completed_message = db.get_message(job.message_id)
+        if completed_message is None:
+            abort(404)
+
+        done_html = render_stream_done(completed_message)
+        yield emit("ui_done", done_html)
+    except StreamClaimLost:
+        # The lease expired and another request took over; leave the message to the new owner.
+        return
+    except StreamCancelled:
+        # Client went away mid-generation: keep the partial text and stop paying for the rest.
+        db.update_message(
+            message_id=job.message_id,
+            raw_text=assembled_text,
+            rendered_html=html_for_storage(
+                render_assistant(
+                    render_text,
+                    job.message_id,
+                    action_url=job.action_url,
+                )
+            ),
+            status="error",
+            renderer_version=RENDERER_VERSION,
+            owner=job.claim_owner,
+            render_text=render_text if render_text != assembled_text else None,
+        )
+        send_buffer.metrics.add(streams_cancelled=1)
+        return
+    except Exception:
+        db.update_message(
+            message_id=job.message_id,
+            raw_text=assembled_text,
+            rendered_html=html_for_storage(
+                render_assistant(
                     render_text,
-                    assistant_message_id,
-                    action_url=action_url,
-                ),
-                status="error",
-            )
-            raise
-
-    response = Response(generate(), mimetype="text/event-stream")
+                    job.message_id,
+                    action_url=job.action_url,
+                )
+            ),
+            status="error",
+            renderer_version=RENDERER_VERSION,
+            owner=job.claim_owner,
+            render_text=render_text if render_text != assembled_text else None,
+        )
+        raise
+    finally:
+        db.release_stream_claim(job.message_id, job.claim_owner)
+
+
+def _give_back(
+    admission: AdmissionController,
+    ticket: AdmissionTicket,
+    assistant_message_id: int,
+    claim_owner: str,
+) -> None:
+    # abandon() is a no-op once admitted and release() one until then, so calling both in this
+    # order frees the ticket whichever state it is in, even if it is admitted in between.
+    admission.abandon(ticket)
+    admission.release(ticket)
+    db.release_stream_claim(assistant_message_id, claim_owner)
+
+
+@bp.get("/responses/<int:assistant_message_id>/stream")
+def stream_response(assistant_message_id: int) -> Response:
+    # Reconnects for finished messages are served entirely from the read-only pool.
+    with db.reading():
+        message = db.get_message(assistant_message_id)
+    if message is None or message.role != "assistant":
+        abort(404)
+
+    if message.status == "complete":
+        done_html = render_stream_done(message)
+
+        def complete_once() -> Iterator[str]:
+            yield sse_event("ui_done", done_html)
+
+        response = Response(stream_with_context(complete_once()), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    if message.status != "streaming":
+        abort(409, description="message not streamable")
+
+    lease_s = float(current_app.config.get("STREAM_LEASE_S", 30))
+    claim_owner = uuid.uuid4().hex
+    if not db.claim_stream(assistant_message_id, claim_owner, lease_s):
+        # Another request is generating this message; the SSE client reconnects and gets ui_done once it completes.
+        response = Response("message is already streaming", status=409, mimetype="text/plain")
+        response.headers["Retry-After"] = "1"
+        return response
+
+    admission = _admission()
+    ticket = admission.enqueue()
+    if ticket is None:
+        db.release_stream_claim(assistant_message_id, claim_owner)
+        response = Response("stream capacity exhausted", status=503, mimetype="text/plain")
+        response.headers["Retry-After"] = "2"
+        return response
+    queue_timeout_s = float(current_app.config.get("STREAM_QUEUE_TIMEOUT_S", 30))
+    heartbeat_s = float(current_app.config.get("STREAM_HEARTBEAT_S", 3)) or None
+
+    try:
+        job = _prepare_job(message, claim_owner, lease_s)
+    except BaseException:
+        # Nothing owns the slot or the claim yet, so a failed setup must hand both back.
+        _give_back(admission, ticket, assistant_message_id, claim_owner)
+        raise
+
+    send_buffer = _send_buffer()
+
+    # Generation runs on its own thread so a slow reader never stalls the model stream or
+    # the final persistence; the reader only ever sees the bounded send buffer.
+    @copy_current_request_context
+    def produce(handoff: ContextManager[None]) -> None:
+        try:
+            with handoff:
+                for frame in _generate(job, send_buffer):
+                    send_buffer.put(frame)
+        except Exception:
+            current_app.logger.exception("stream generation failed for message %s", assistant_message_id)
+        finally:
+            admission.release(ticket)
+            send_buffer.close()
+
+    producer_started = threading.Event()
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+    @stream_with_context
+    def relay() -> Iterator[str]:
+        queue_deadline = time.monotonic() + queue_timeout_s
+        while not ticket.admitted:
+            yield sse_event("queued", _queued_html(admission.position(ticket)))
+            remaining = queue_deadline - time.monotonic()
+            if remaining <= 0:
+                admission.abandon(ticket, timed_out=True)
+                return
+            if not admission.wait(ticket, timeout=min(1.0, remaining)):
+                db.renew_stream_claim(assistant_message_id, claim_owner, lease_s)
+
+        producer_started.set()
+        threading.Thread(
+            target=produce, args=(profiling.handoff(),), name=f"stream-{assistant_message_id}", daemon=True
+        ).start()
+        yield from send_buffer.drain(heartbeat_s=heartbeat_s)
+
+    def release_unstarted() -> None:
+        # Covers clients that leave (or time out) while queued, before a producer owns the slot.
+        if producer_started.is_set():
+            return
+        with app.app_context():
+            _give_back(admission, ticket, assistant_message_id, claim_owner)
+
+    response = Response(relay(), mimetype="text/event-stream")
+    response.call_on_close(release_unstarted)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@bp.get("/streams/tabs/<tab_id>")
+def tab_stream(tab_id: str) -> Response:
+    if not valid_tab_id(tab_id):
+        abort(404)
+    heartbeat_s = float(current_app.config.get("STREAM_HEARTBEAT_S", 3)) or None
+    tabs = _tab_streams()
+    tab_buffer = _send_buffer()
+    if not tabs.connect(tab_id, tab_buffer):
+        # Every tab connection holds a worker for the tab's lifetime. Without one, the tab's
+        # messages subscribe to no live stream and fall back to their own admitted EventSource.
+        response = Response("Too many open tabs", status=503, mimetype="text/plain")
+        response.headers["Retry-After"] = "30"
+        return response
+
+    def relay() -> Iterator[str]:
+        # Flushes the headers so the EventSource opens before the tab subscribes anything.
+        yield ": connected\n\n"
+        yield from tab_buffer.drain(heartbeat_s=heartbeat_s)
+
+    def close_tab() -> None:
+        # The tab buffer is never closed by a producer, so the response only ends when the tab
+        # goes away: stop every generation still feeding it.
+        tabs.disconnect(tab_id, tab_buffer)
+        tab_buffer.cancelled.set()
+        tab_buffer.disconnect()
+
+    response = Response(relay(), mimetype="text/event-stream")
+    response.call_on_close(close_tab)
     response.headers["Cache-Control"] = "no-cache"
     response.headers["X-Accel-Buffering"] = "no"
     return response
+
+
+@bp.post("/streams/tabs/<tab_id>/messages/<int:assistant_message_id>")
+def subscribe_tab_message(tab_id: str, assistant_message_id: int) -> Any:
+    message = db.get_message(assistant_message_id)
+    if message is None or message.role != "assistant":
+        abort(404)
+
+    tab_buffer = _tab_streams().get(tab_id) if valid_tab_id(tab_id) else None
+    if tab_buffer is None or message.status != "streaming":
+        # No live tab stream (or nothing left to generate): hand back a bubble with its own
+        # EventSource, which also covers completed messages and claim conflicts.
+        return render_template("chat/_stream_target.html", message=message)
+
+    lease_s = float(current_app.config.get("STREAM_LEASE_S", 30))
+    claim_owner = uuid.uuid4().hex
+    if not db.claim_stream(assistant_message_id, claim_owner, lease_s):
+        return render_template("chat/_stream_target.html", message=message)
+
+    admission = _admission()
+    ticket = admission.enqueue()
+    if ticket is None:
+        db.release_stream_claim(assistant_message_id, claim_owner)
+        return render_template("chat/_stream_target.html", message=message)
+
+    try:
+        job = _prepare_job(message, claim_owner, lease_s)
+    except BaseException:
+        # The producer thread (and its cleanup) never starts, so hand the slot and claim back here.
+        _give_back(admission, ticket, assistant_message_id, claim_owner)
+        raise
+    channel = str(assistant_message_id)
+    emit = _mux_emit(assistant_message_id)
+
+    # No queue timeout here: the message waits for a slot as long as its tab stays connected.
+    @copy_current_request_context
+    def produce(handoff: ContextManager[None]) -> None:
+        started = False
+        try:
+            with handoff:
+                while not ticket.admitted:
+                    if not tab_buffer.put(emit("queued", _queued_html(admission.position(ticket))), channel):
+                        return
+                    if not admission.wait(ticket, timeout=1.0):
+                        db.renew_stream_claim(assistant_message_id, claim_owner, lease_s)
+                started = True
+                for frame in _generate(job, tab_buffer, emit=emit):
+                    if frame:
+                        tab_buffer.put(frame, channel)
+        except Exception:
+            current_app.logger.exception("stream generation failed for message %s", assistant_message_id)
+        finally:
+            if ticket.admitted:
+                admission.release(ticket)
+            else:
+                admission.abandon(ticket)
+            if not started:
+                db.release_stream_claim(assistant_message_id, claim_owner)
+
+    # The handoff keeps a profiled subscribe request's profile open until generation ends.
+    threading.Thread(
+        target=produce, args=(profiling.handoff(),), name=f"stream-{assistant_message_id}", daemon=True
+    ).start()
+    _tab_streams().subscribed()
+    return Response(status=204)
+
+
+@bp.get("/streams/metrics")
+def stream_metrics() -> Response:
+    payload = {**_stream_metrics().snapshot(), "admission": _admission().snapshot()}
+    pool = current_app.extensions.get("bedrock_pool")
+    if pool is not None:
+        payload["provider_pool"] = pool.snapshot()
+    cache = current_app.extensions.get("response_cache")
+    if cache is not None:
+        payload["response_cache"] = cache.snapshot()
+    tabs = current_app.extensions.get("tab_streams")
+    if tabs is not None:
+        payload["tabs"] = tabs.snapshot()
+    renders = current_app.extensions.get("render_pool")
+    if renders is not None:
+        payload["render_pool"] = renders.snapshot()
+    actions = current_app.extensions.get("action_queue")
+    if actions is not None:
+        payload["actions"] = actions.snapshot()
+    return jsonify(payload)
@@ -1,11 +1,33 @@
 from __future__ import annotations
 
-from typing import Any
-
-from flask import Blueprint, abort, redirect, render_template, request, url_for
+import uuid
+from typing import Any, Iterable, Iterator
+
+from flask import (
+    Blueprint,
+    Response,
+    abort,
+    current_app,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    stream_template,
+    url_for,
+)
 
 from chat_hateoas import db
-from chat_hateoas.services.transform import render_user_html
+from chat_hateoas.records import Conversation
+from chat_hateoas.services.action_jobs import enqueue
+from chat_hateoas.services.fragment_cache import FragmentCache
+from chat_hateoas.services.message_html import (
+    html_for_storage,
+    hydrate_message,
+    hydrate_messages,
+    iter_hydrated_messages,
+)
+from chat_hateoas.services.tab_streams import valid_tab_id
+from chat_hateoas.services.transform import RENDERER_VERSION, render_user_html
 
 bp = Blueprint("web", __name__)
 
@@ -15,16 +37,16 @@ def _is_htmx() -> bool:
 
 
 def _normalize_active_conversation(
-    conversations: list[Any],
+    conversations: list[Conversation],
     requested_id: int | None,
 ) -> int | None:
     if not conversations:
         return None
 
-    available_ids = {int(item["id"]) for item in conversations}
+    available_ids = {item.id for item in conversations}
     if requested_id is not None and requested_id in available_ids:
         return requested_id
-    return int(conversations[0]["id"])
+    return conversations[0].id
 
 
 def _ensure_seed_conversation() -> None:
@@ -37,37 +59,122 @@ def _new_conversation_title() -> str:
     return f"Conversation {db.conversation_count() + 1}"
 
 
-def _render_thread_and_sidebar(active_id: int) -> str:
-    conversations = db.list_conversations()
-    conversation = db.get_conversation(active_id)
-    if conversation is None:
-        abort(404)
-    messages = db.list_messages(active_id)
+def _new_tab_id() -> str | None:
+    # Each page load is one tab; its id keys the single multiplexed stream for that tab.
+    return uuid.uuid4().hex if current_app.config.get("STREAM_MULTIPLEX", True) else None
+
 
+def _request_tab_id() -> str | None:
+    if not current_app.config.get("STREAM_MULTIPLEX", True):
+        return None
+    tab_id = request.headers.get("X-Chat-Tab")
+    return tab_id if valid_tab_id(tab_id) else None
+
+
+def _thread_cache() -> FragmentCache:
+    cache = current_app.extensions.get("thread_fragment_cache")
+    if cache is None:
+        cache = FragmentCache(
+            ttl_s=float(current_app.config.get("PREFETCH_TTL_S", 10)),
+            max_entries=int(current_app.config.get("PREFETCH_CACHE_SIZE", 64)),
+        )
+        current_app.extensions["thread_fragment_cache"] = cache
+    return cache
+
+
+def _render_thread(conversation: Any) -> tuple[str, bool]:
+    # revision moves on every message, feedback and title write, so it versions the cached thread.
+    # Also returns whether the thread is settled (nothing streaming), i.e. safe to cache at all.
+    cache_key = (conversation.id, conversation.revision)
+    cache = _thread_cache()
+    thread_html = cache.get(cache_key)
+    if thread_html is not None:
+        return thread_html, True
+
+    messages = hydrate_messages(db.list_messages(conversation.id))
     thread_html = render_template(
         "chat/_thread.html",
         conversation=conversation,
         messages=messages,
     )
+    settled = not any(message.status == "streaming" for message in messages)
+    if settled:
+        cache.put(cache_key, thread_html)
+    return thread_html, settled
+
+
+def _render_thread_and_sidebar(active_id: int) -> tuple[str, bool]:
+    conversations = db.list_conversations()
+    conversation = db.get_conversation(active_id)
+    if conversation is None:
+        abort(404)
+
+    thread_html, settled = _render_thread(conversation)
     sidebar_html = render_template(
         "chat/_conversation_list.html",
         conversations=conversations,
         active_id=active_id,
         oob=True,
     )
-    return f"{thread_html}{sidebar_html}"
+    return f"{thread_html}{sidebar_html}", settled
+
+
+def _coalesce(pieces: Iterable[str], chunk_size: int) -> Iterator[str]:
+    # Jinja yields one piece per template node; group them so each write carries real payload.
+    buffer: list[str] = []
+    buffered = 0
+    try:
+        for piece in pieces:
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= chunk_size:
+                yield "".join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # Close the template stream here, inside the request, rather than whenever (and on
+        # whichever thread) its last reference happens to drop.
+        close = getattr(pieces, "close", None)
+        if close is not None:
+            close()
+
+
+def _stream_index(requested_id: int | None) -> Response:
+    conversation = db.get_conversation(requested_id) if requested_id is not None else None
+    if conversation is None:
+        conversation = db.latest_conversation()
+    active_id = conversation.id if conversation is not None else None
+
+    # Rows are pulled from open cursors while the page renders, so neither the sidebar nor the
+    # thread is materialized before the head goes out.
+    pieces = stream_template(
+        "chat/index.html",
+        conversations=db.iter_conversations(),
+        conversation=conversation,
+        active_id=active_id,
+        messages=iter_hydrated_messages(db.iter_messages(active_id)) if active_id is not None else [],
+        tab_id=_new_tab_id(),
+    )
+    chunk_size = int(current_app.config.get("INDEX_STREAM_CHUNK_SIZE", 4096))
+    return Response(_coalesce(pieces, chunk_size), mimetype="text/html")
 
 
 @bp.get("/")
-def index() -> str:
+@db.read_only()
+def index() -> Any:
     _ensure_seed_conversation()
 
     requested_id = request.args.get("conversation_id", type=int)
+    if current_app.config.get("INDEX_STREAMING", True):
+        return _stream_index(requested_id)
+
     conversations = db.list_conversations()
     active_id = _normalize_active_conversation(conversations, requested_id)
 
     conversation = db.get_conversation(active_id) if active_id is not None else None
-    messages = db.list_messages(active_id) if active_id is not None else []
+    messages = hydrate_messages(db.list_messages(active_id)) if active_id is not None else []
 
     return render_template(
         "chat/index.html",
@@ -75,6 +182,7 @@ def index() -> str:
         conversation=conversation,
         active_id=active_id,
         messages=messages,
+        tab_id=_new_tab_id(),
     )
 
 
@@ -83,7 +191,7 @@ def create_conversation() -> Any:
     conversation_id = db.create_conversation(_new_conversation_title())
 
     if _is_htmx():
-        return _render_thread_and_sidebar(conversation_id)
+        return _render_thread_and_sidebar(conversation_id)[0]
 
     return redirect(url_for("web.index", conversation_id=conversation_id))
 
@@ -99,26 +207,42 @@ def delete_conversation(conversation_id: int) -> Any:
         db.create_conversation("Conversation 1")
 
     conversations = db.list_conversations()
-    next_active_id = int(conversations[0]["id"])
+    next_active_id = conversations[0].id
 
     if _is_htmx():
-        return _render_thread_and_sidebar(next_active_id)
+        return _render_thread_and_sidebar(next_active_id)[0]
 
     return redirect(url_for("web.index", conversation_id=next_active_id))
 
 
 @bp.get("/conversations/<int:conversation_id>")
+@db.read_only()
 def get_conversation(conversation_id: int) -> Any:
     conversation = db.get_conversation(conversation_id)
     if conversation is None:
         abort(404)
 
     if _is_htmx():
-        return _render_thread_and_sidebar(conversation_id)
+        body, settled = _render_thread_and_sidebar(conversation_id)
+        response = current_app.make_response(body)
+        response.vary.add("HX-Request")
+        ttl_s = int(current_app.config.get("PREFETCH_TTL_S", 10))
+        if request.args.get("v") == str(conversation.revision) and ttl_s > 0 and settled:
+            # Versioned sidebar URLs may be reused by the browser for a few seconds, so a
+            # prefetched fragment answers the click without a round trip.
+            response.headers["Cache-Control"] = f"private, max-age={ttl_s}"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
 
     return redirect(url_for("web.index", conversation_id=conversation_id))
 
 
+@bp.get("/conversations/metrics")
+def conversation_metrics() -> Any:
+    return jsonify({"thread_fragment_cache": _thread_cache().snapshot()})
+
+
 @bp.post("/conversations/<int:conversation_id>/messages")
 def post_message(conversation_id: int) -> Any:
     conversation = db.get_conversation(conversation_id)
@@ -133,8 +257,9 @@ def post_message(conversation_id: int) -> Any:
         conversation_id=conversation_id,
         role="user",
         raw_text=text,
-        rendered_html=render_user_html(text),
+        rendered_html=html_for_storage(render_user_html(text)),
         status="complete",
+        renderer_version=RENDERER_VERSION,
     )
     assistant_id = db.create_message(
         conversation_id=conversation_id,
@@ -142,6 +267,7 @@ def post_message(conversation_id: int) -> Any:
         raw_text="",
         rendered_html="",
         status="streaming",
+        renderer_version=RENDERER_VERSION,
     )
     db.update_conversation_timestamp(conversation_id)
 
@@ -151,9 +277,21 @@ def post_message(conversation_id: int) -> Any:
     if user_message is None or assistant_message is None:
         abort(500)
 
-    user_html = render_template("chat/_message.html", message=user_message)
-    assistant_shell = render_template("chat/_assistant_stream_shell.html", message=assistant_message)
-    return f"{user_html}{assistant_shell}"
+    user_html = render_template("chat/_message.html", message=hydrate_message(user_message))
+    assistant_shell = render_template(
+        "chat/_assistant_stream_shell.html",
+        message=assistant_message,
+        tab_id=_request_tab_id(),
+    )
+    # The sidebar links carry the conversation's revision; refresh them so a click back into this
+    # thread cannot be answered by a browser-cached copy from before the post.
+    sidebar_html = render_template(
+        "chat/_conversation_list.html",
+        conversations=db.list_conversations(),
+        active_id=conversation_id,
+        oob=True,
+    )
+    return f"{user_html}{assistant_shell}{sidebar_html}"
 
 
 @bp.post("/messages/<int:message_id>/feedback")
@@ -163,28 +301,43 @@ def message_feedback(message_id: int) -> Any:
         abort(400, description="vote must be up or down")
 
     message = db.get_message(message_id)
-    if message is None or message["role"] != "assistant":
+    if message is None or message.role != "assistant":
         abort(404)
 
     db.upsert_feedback(message_id, vote)
+    _thread_cache().invalidate(message.conversation_id)
     new_vote = db.get_feedback(message_id)
     return render_template("chat/_feedback.html", message_id=message_id, vote=new_vote)
 
 
 @bp.post("/actions/fake")
-def fake_action() -> str:
+def fake_action() -> Any:
     action_id = (request.form.get("action_id") or "unknown").strip()
     message_id = request.form.get("message_id", type=int)
 
-    action_map = {
-        "summarize": "Generated summary placeholder returned.",
-        "retry": "Retry queued in mock mode.",
-        "cite_sources": "Mock citations: [source-1, source-2].",
-    }
-    result = action_map.get(action_id, f"Action '{action_id}' completed in mock mode.")
+    job_id = enqueue(message_id, action_id, tab_id=_request_tab_id())
+    return _render_action_job(job_id), 202
 
+
+@bp.get("/actions/jobs/<int:job_id>")
+@db.read_only()
+def action_job(job_id: int) -> Any:
+    return _render_action_job(job_id, attempt=max(0, request.args.get("attempt", 0, type=int)))
+
+
+def _render_action_job(job_id: int, attempt: int = 0) -> str:
+    job = db.get_action_job(job_id)
+    if job is None:
+        abort(404)
+    # Polls back off to ACTION_POLL_MAX_MS and stop after ACTION_POLL_MAX_ATTEMPTS, leaving a
+    # manual check, so a job nobody finishes does not keep the tab polling forever.
+    poll_ms: int | None = None
+    if attempt < int(current_app.config.get("ACTION_POLL_MAX_ATTEMPTS", 30)):
+        base_ms = int(current_app.config.get("ACTION_POLL_MS", 1000))
+        poll_ms = min(base_ms << min(attempt, 16), int(current_app.config.get("ACTION_POLL_MAX_MS", 10000)))
     return render_template(
         "chat/_fake_action_result.html",
-        message_id=message_id,
-        result=result,
+        job=job,
+        poll_ms=poll_ms,
+        next_attempt=attempt + 1,
     )
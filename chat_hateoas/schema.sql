@@ -1,10 +1,12 @@
 PRAGMA foreign_keys = ON;
+PRAGMA auto_vacuum = INCREMENTAL;
 
 CREATE TABLE IF NOT EXISTS conversations (
   id INTEGER PRIMARY KEY,
   title TEXT NOT NULL,
   created_at TEXT NOT NULL,
-  updated_at TEXT NOT NULL
+  updated_at TEXT NOT NULL,
+  revision INTEGER NOT NULL DEFAULT 0
 );
 
 CREATE TABLE IF NOT EXISTS messages (
@@ -15,6 +17,10 @@ CREATE TABLE IF NOT EXISTS messages (
   rendered_html TEXT NOT NULL,
   status TEXT NOT NULL CHECK (status IN ('streaming', 'complete', 'error')),
   created_at TEXT NOT NULL,
+  renderer_version INTEGER NOT NULL DEFAULT 1,
+  render_text TEXT,
+  stream_owner TEXT,
+  stream_lease_expires REAL,
   FOREIGN KEY (conversation_id) REFERENCES conversations (id) ON DELETE CASCADE
 );
 
@@ -31,6 +37,18 @@ CREATE TABLE IF NOT EXISTS assistant_metadata (
   FOREIGN KEY (message_id) REFERENCES messages (id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS tool_events (
+  id INTEGER PRIMARY KEY,
+  message_id INTEGER NOT NULL,
+  tool_use_id TEXT NOT NULL,
+  tool_name TEXT NOT NULL,
+  status TEXT,
+  used_at TEXT,
+  result_at TEXT,
+  duration_ms INTEGER,
+  FOREIGN KEY (message_id) REFERENCES messages (id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS message_feedback (
   message_id INTEGER PRIMARY KEY,
   vote TEXT NOT NULL CHECK (vote IN ('up', 'down')),
@@ -38,5 +56,125 @@ CREATE TABLE IF NOT EXISTS message_feedback (
   FOREIGN KEY (message_id) REFERENCES messages (id) ON DELETE CASCADE
 );
 
+CREATE TABLE IF NOT EXISTS usage_rollups (
+  day TEXT NOT NULL,
+  model_id TEXT NOT NULL,
+  message_count INTEGER NOT NULL DEFAULT 0,
+  input_tokens INTEGER NOT NULL DEFAULT 0,
+  output_tokens INTEGER NOT NULL DEFAULT 0,
+  latency_ms_total INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, model_id)
+);
+
+CREATE TABLE IF NOT EXISTS feedback_rollups (
+  day TEXT NOT NULL,
+  model_id TEXT NOT NULL,
+  up_count INTEGER NOT NULL DEFAULT 0,
+  down_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, model_id)
+);
+
+CREATE TABLE IF NOT EXISTS action_jobs (
+  id INTEGER PRIMARY KEY,
+  message_id INTEGER,
+  action_id TEXT NOT NULL,
+  status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'done', 'error')),
+  result TEXT,
+  created_at TEXT NOT NULL,
+  started_at TEXT,
+  finished_at TEXT,
+  lease_expires REAL,
+  claim_owner TEXT
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+  name TEXT PRIMARY KEY,
+  value INTEGER NOT NULL
+);
+
+-- Seeds the counter once for databases created before it existed; triggers keep it current.
+INSERT OR IGNORE INTO counters (name, value)
+  SELECT 'conversations', COUNT(*) FROM conversations;
+
+CREATE TRIGGER IF NOT EXISTS trg_conversations_count_insert
+  AFTER INSERT ON conversations
+BEGIN
+  UPDATE counters SET value = value + 1 WHERE name = 'conversations';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_conversations_count_delete
+  AFTER DELETE ON conversations
+BEGIN
+  UPDATE counters SET value = value - 1 WHERE name = 'conversations';
+END;
+
+-- conversations.revision moves on every write that changes what the thread shows, so it can
+-- version cached fragments (updated_at only has one-second resolution).
+CREATE TRIGGER IF NOT EXISTS trg_conversations_revision_update
+  AFTER UPDATE OF title, updated_at ON conversations
+BEGIN
+  UPDATE conversations SET revision = revision + 1 WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_revision_insert
+  AFTER INSERT ON messages
+BEGIN
+  UPDATE conversations SET revision = revision + 1 WHERE id = NEW.conversation_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_messages_revision_update
+  AFTER UPDATE OF raw_text, rendered_html, status, renderer_version ON messages
+BEGIN
+  UPDATE conversations SET revision = revision + 1 WHERE id = NEW.conversation_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feedback_revision_insert
+  AFTER INSERT ON message_feedback
+BEGIN
+  UPDATE conversations SET revision = revision + 1
+  WHERE id = (SELECT conversation_id FROM messages WHERE id = NEW.message_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_feedback_revision_update
+  AFTER UPDATE ON message_feedback
+BEGIN
+  UPDATE conversations SET revision = revision + 1
+  WHERE id = (SELECT conversation_id FROM messages WHERE id = NEW.message_id);
+END;
+
+-- Deleting a message (directly or by cascade from its conversation) takes it back out of the
+-- rollups, so the incremental counts always equal what rebuild-rollups derives from live rows.
+CREATE TRIGGER IF NOT EXISTS trg_messages_rollups_delete
+  BEFORE DELETE ON messages
+BEGIN
+  UPDATE usage_rollups
+  SET
+    message_count = message_count - 1,
+    input_tokens = input_tokens - (SELECT input_tokens FROM assistant_metadata WHERE message_id = OLD.id),
+    output_tokens = output_tokens - (SELECT output_tokens FROM assistant_metadata WHERE message_id = OLD.id),
+    latency_ms_total = latency_ms_total - (SELECT latency_ms FROM assistant_metadata WHERE message_id = OLD.id)
+  WHERE day = substr(OLD.created_at, 1, 10)
+    AND model_id = (SELECT model_id FROM assistant_metadata WHERE message_id = OLD.id);
+  UPDATE feedback_rollups
+  SET
+    up_count = up_count - (SELECT vote = 'up' FROM message_feedback WHERE message_id = OLD.id),
+    down_count = down_count - (SELECT vote = 'down' FROM message_feedback WHERE message_id = OLD.id)
+  WHERE day = substr(OLD.created_at, 1, 10)
+    AND model_id = COALESCE((SELECT model_id FROM assistant_metadata WHERE message_id = OLD.id), 'unknown')
+    AND EXISTS (SELECT 1 FROM message_feedback WHERE message_id = OLD.id);
+END;
+
 CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
   ON messages (conversation_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_updated
+  ON conversations (updated_at);
+
+CREATE INDEX IF NOT EXISTS idx_tool_events_message
+  ON tool_events (message_id);
+
+CREATE INDEX IF NOT EXISTS idx_tool_events_name_duration
+  ON tool_events (tool_name, duration_ms);
+
+CREATE INDEX IF NOT EXISTS idx_action_jobs_pending
+  ON action_jobs (status, id) WHERE status IN ('queued', 'running');
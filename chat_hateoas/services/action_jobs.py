@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, render_template
+
+from chat_hateoas import db
+from chat_hateoas.services.send_buffer import sse_event
+
+ACTION_RESULTS = {
+    "summarize": "Generated summary placeholder returned.",
+    "retry": "Retry queued in mock mode.",
+    "cite_sources": "Mock citations: [source-1, source-2].",
+}
+
+
+def run_action(action_id: str, delay_s: float) -> str:
+    if delay_s > 0:
+        # Stands in for the real (slow) summarize / retry / cite work.
+        time.sleep(delay_s)
+    return ACTION_RESULTS.get(action_id, f"Action '{action_id}' completed in mock mode.")
+
+
+# Jobs are rows in action_jobs first and executor work second: the button is answered with a
+# pending fragment as soon as the row exists, and rows a stopped process never finished are
+# picked up again by the next queue or by any live queue's periodic sweep once their lease
+# expires (start_action_job's lease makes that claim atomic).
+class ActionQueue:
+    def __init__(  # type: ignore[no-untyped-def]
+        self,
+        app,
+        workers: int,
+        delay_s: float,
+        lease_s: float,
+        sweep_interval_s: float,
+    ) -> None:
+        self.app = app
+        self.workers = workers
+        self.delay_s = delay_s
+        self.lease_s = lease_s
+        self.sweep_interval_s = sweep_interval_s
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.pushed = 0
+        self.recovered = 0
+        self.stale = 0
+        self.running = 0
+        self.max_running = 0
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="action-job")
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval_s
+
+    def submit(self, job_id: int, tab_id: str | None = None) -> None:
+        with self._lock:
+            self.submitted += 1
+        self._executor.submit(self._run, job_id, tab_id)
+
+    def _run(self, job_id: int, tab_id: str | None) -> None:
+        # A request context, like the render warmer, so templates can build URLs.
+        with self.app.test_request_context():
+            try:
+                self._run_job(job_id, tab_id)
+            except Exception:
+                current_app.logger.exception("action job %s failed", job_id)
+
+    def _run_job(self, job_id: int, tab_id: str | None) -> None:
+        owner = uuid.uuid4().hex
+        if not db.start_action_job(job_id, self.lease_s, owner):
+            return
+        job = db.get_action_job(job_id)
+        if job is None:
+            return
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            status, result = "done", run_action(job.action_id, self.delay_s)
+        except Exception:
+            current_app.logger.exception("action %s failed for job %s", job.action_id, job_id)
+            status, result = "error", "Action failed."
+        finally:
+            with self._lock:
+                self.running -= 1
+        if not db.finish_action_job(job_id, status, result, owner):
+            # The lease ran out and another runner reclaimed the job; its result stands.
+            with self._lock:
+                self.stale += 1
+            return
+        with self._lock:
+            if status == "done":
+                self.completed += 1
+            else:
+                self.failed += 1
+        if tab_id is not None:
+            self._push(job_id, tab_id)
+
+    def _push(self, job_id: int, tab_id: str) -> None:
+        tabs = current_app.extensions.get("tab_streams")
+        tab_buffer = tabs.get(tab_id) if tabs is not None else None
+        if tab_buffer is None:
+            # No live tab stream: the pending fragment's polling picks the result up.
+            return
+        html = render_template("chat/_fake_action_result.html", job=db.get_action_job(job_id), oob=True)
+        if tab_buffer.put(sse_event("action_done", html), channel=f"action-{job_id}"):
+            with self._lock:
+                self.pushed += 1
+
+    def recover(self, expired_only: bool = False) -> int:
+        job_ids = db.list_runnable_action_jobs(expired_only=expired_only)
+        for job_id in job_ids:
+            self.submit(job_id)
+        with self._lock:
+            self.recovered += len(job_ids)
+        return len(job_ids)
+
+    def maybe_sweep(self) -> int:
+        # Runs from request hooks, so a job orphaned by a crashed process is retried while the
+        # other processes keep serving, not only when one of them restarts.
+        with self._lock:
+            now = time.monotonic()
+            if self.sweep_interval_s <= 0 or now < self._next_sweep:
+                return 0
+            self._next_sweep = now + self.sweep_interval_s
+        return self.recover(expired_only=True)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "pushed": self.pushed,
+                "recovered": self.recovered,
+                "stale": self.stale,
+                "running": self.running,
+                "max_running": self.max_running,
+            }
+
+
+_queue_lock = threading.Lock()
+
+
+def action_queue() -> ActionQueue:
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+    queue = app.extensions.get("action_queue")
+    if queue is None or queue.pid != os.getpid():
+        with _queue_lock:
+            queue = app.extensions.get("action_queue")
+            if queue is None or queue.pid != os.getpid():
+                queue = ActionQueue(
+                    app,
+                    workers=max(1, int(app.config.get("ACTION_WORKERS", 4))),
+                    delay_s=int(app.config.get("ACTION_DELAY_MS", 0)) / 1000.0,
+                    lease_s=float(app.config.get("ACTION_JOB_LEASE_S", 300)),
+                    sweep_interval_s=float(app.config.get("ACTION_SWEEP_INTERVAL_S", 30)),
+                )
+                app.extensions["action_queue"] = queue
+                queue.recover()
+    return queue
+
+
+def enqueue(message_id: int | None, action_id: str, tab_id: str | None = None) -> int:
+    queue = action_queue()
+    job_id = db.create_action_job(message_id, action_id, lease_s=queue.lease_s)
+    queue.submit(job_id, tab_id)
+    return job_id
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    @app.before_request
+    def _start_action_queue() -> None:
+        # One queue per process, started on its first request (after any pre-fork), which also
+        # resubmits durable jobs left unfinished by a previous process.
+        action_queue().maybe_sweep()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+
+
+class AdmissionTicket:
+    __slots__ = ("enqueued_at", "admitted", "done")
+
+    def __init__(self) -> None:
+        self.enqueued_at = time.monotonic()
+        self.admitted = False
+        self.done = False
+
+
+# FIFO admission for stream generations: at most `max_active` run at once and at most
+# `max_queued` wait; anything beyond that is rejected so plain page routes keep workers.
+class AdmissionController:
+    def __init__(self, max_active: int, max_queued: int) -> None:
+        self.max_active = max(1, max_active)
+        self.max_queued = max(0, max_queued)
+        self.active = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.timeouts_total = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self._queue: deque[AdmissionTicket] = deque()
+        self._cond = threading.Condition()
+
+    def enqueue(self) -> AdmissionTicket | None:
+        ticket = AdmissionTicket()
+        with self._cond:
+            if not self._queue and self.active < self.max_active:
+                self._admit(ticket)
+                return ticket
+            if len(self._queue) >= self.max_queued:
+                self.rejected_total += 1
+                return None
+            self._queue.append(ticket)
+            return ticket
+
+    def position(self, ticket: AdmissionTicket) -> int:
+        with self._cond:
+            if ticket.admitted:
+                return 0
+            try:
+                return self._queue.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def wait(self, ticket: AdmissionTicket, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not ticket.admitted:
+                if self._queue and self._queue[0] is ticket and self.active < self.max_active:
+                    self._queue.popleft()
+                    self._admit(ticket)
+                    self._cond.notify_all()
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def abandon(self, ticket: AdmissionTicket, timed_out: bool = False) -> None:
+        with self._cond:
+            if ticket.admitted or ticket.done:
+                return
+            ticket.done = True
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+            if timed_out:
+                self.timeouts_total += 1
+            self._cond.notify_all()
+
+    def release(self, ticket: AdmissionTicket) -> None:
+        with self._cond:
+            if not ticket.admitted or ticket.done:
+                return
+            ticket.done = True
+            self.active -= 1
+            self._cond.notify_all()
+
+    def _admit(self, ticket: AdmissionTicket) -> None:
+        ticket.admitted = True
+        self.active += 1
+        self.admitted_total += 1
+        waited_ms = (time.monotonic() - ticket.enqueued_at) * 1000
+        self.wait_ms_total += waited_ms
+        self.wait_ms_max = max(self.wait_ms_max, waited_ms)
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._cond:
+            return {
+                "max_active": self.max_active,
+                "max_queued": self.max_queued,
+                "active": self.active,
+                "queue_depth": len(self._queue),
+                "admitted_total": self.admitted_total,
+                "rejected_total": self.rejected_total,
+                "timeouts_total": self.timeouts_total,
+                "wait_ms_avg": round(self.wait_ms_total / self.admitted_total, 2) if self.admitted_total else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 2),
+            }
+
+
+def _stream_workers(config) -> int:  # type: ignore[no-untyped-def]
+    return max(1, int(config.get("WORKER_THREADS", 0)) - int(config.get("STREAM_RESERVED_WORKERS", 2)))
+
+
+def tab_stream_limit(config) -> int:  # type: ignore[no-untyped-def]
+    max_tabs = max(0, int(config.get("STREAM_MAX_TABS", 32)))
+    if int(config.get("WORKER_THREADS", 0)) > 0:
+        # An open tab connection holds a worker thread for the tab's whole lifetime, even while
+        # nothing streams, so tabs get at most half of the stream workers.
+        max_tabs = min(max_tabs, _stream_workers(config) // 2)
+    return max_tabs
+
+
+def stream_limits(config) -> tuple[int, int]:  # type: ignore[no-untyped-def]
+    max_active = int(config.get("STREAM_MAX_CONCURRENT", 8))
+    max_queued = int(config.get("STREAM_QUEUE_MAX", 16))
+    if int(config.get("WORKER_THREADS", 0)) > 0:
+        # Queued and active streams both hold a worker thread while their SSE response is open;
+        # they share the stream workers with the tab connections.
+        stream_workers = max(1, _stream_workers(config) - tab_stream_limit(config))
+        max_active = min(max_active, stream_workers)
+        max_queued = min(max_queued, stream_workers - max_active)
+    return max_active, max_queued
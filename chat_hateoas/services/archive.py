@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from typing import Any, Iterable, Iterator, TextIO
+
+import click
+from flask.cli import with_appcontext
+
+from chat_hateoas import db
+
+ARCHIVE_VERSION = 1
+
+TOOL_CALL_FIELDS = ("tool_use_id", "tool_name", "status", "used_at", "result_at", "duration_ms")
+
+
+def iter_export_records() -> Iterator[dict[str, Any]]:
+    conn = db.get_db()
+    yield {"type": "archive", "version": ARCHIVE_VERSION, "exported_at": db.utc_now_iso()}
+
+    conversations = conn.execute(
+        "SELECT id, title, created_at, updated_at FROM conversations ORDER BY id ASC"
+    )
+    for conversation in conversations:
+        yield {
+            "type": "conversation",
+            "id": conversation["id"],
+            "title": conversation["title"],
+            "created_at": conversation["created_at"],
+            "updated_at": conversation["updated_at"],
+        }
+
+        tool_calls: dict[int, list[dict[str, Any]]] = {}
+        for row in conn.execute(
+            """
+            SELECT te.message_id, te.tool_use_id, te.tool_name, te.status, te.used_at, te.result_at, te.duration_ms
+            FROM tool_events te
+            JOIN messages m ON m.id = te.message_id
+            WHERE m.conversation_id = ?
+            ORDER BY te.id ASC
+            """,
+            (conversation["id"],),
+        ):
+            tool_calls.setdefault(row["message_id"], []).append({key: row[key] for key in TOOL_CALL_FIELDS})
+
+        messages = conn.execute(
+            """
+            SELECT
+              m.id,
+              m.role,
+              m.raw_text,
+              m.rendered_html,
+              m.status,
+              m.created_at,
+              m.renderer_version,
+              m.render_text,
+              mf.vote AS feedback_vote,
+              mf.updated_at AS feedback_updated_at,
+              am.provider,
+              am.model_id,
+              am.stop_reason,
+              am.input_tokens,
+              am.output_tokens,
+              am.latency_ms,
+              am.tool_events_json,
+              am.raw_event_count
+            FROM messages m
+            LEFT JOIN message_feedback mf ON mf.message_id = m.id
+            LEFT JOIN assistant_metadata am ON am.message_id = m.id
+            WHERE m.conversation_id = ?
+            ORDER BY m.id ASC
+            """,
+            (conversation["id"],),
+        )
+        for message in messages:
+            record: dict[str, Any] = {
+                "type": "message",
+                "id": message["id"],
+                "conversation_id": conversation["id"],
+                "role": message["role"],
+                "raw_text": message["raw_text"],
+                "rendered_html": message["rendered_html"],
+                "status": message["status"],
+                "created_at": message["created_at"],
+                "renderer_version": message["renderer_version"],
+            }
+            if message["render_text"] is not None:
+                record["render_text"] = message["render_text"]
+            if message["feedback_vote"] is not None:
+                record["feedback"] = {
+                    "vote": message["feedback_vote"],
+                    "updated_at": message["feedback_updated_at"],
+                }
+            if message["provider"] is not None:
+                record["metadata"] = {
+                    "provider": message["provider"],
+                    "model_id": message["model_id"],
+                    "stop_reason": message["stop_reason"],
+                    "input_tokens": message["input_tokens"],
+                    "output_tokens": message["output_tokens"],
+                    "latency_ms": message["latency_ms"],
+                    "tool_events": json.loads(message["tool_events_json"]),
+                    "tool_calls": tool_calls.get(message["id"], []),
+                    "raw_event_count": message["raw_event_count"],
+                }
+            yield record
+
+
+def export_ndjson(out: TextIO) -> dict[str, int]:
+    counts = {"conversation": 0, "message": 0}
+    for record in iter_export_records():
+        out.write(json.dumps(record, separators=(",", ":")))
+        out.write("\n")
+        if record["type"] in counts:
+            counts[record["type"]] += 1
+    return counts
+
+
+class _ImportBatch:
+    def __init__(self, conversation_offset: int, message_offset: int) -> None:
+        self.conversation_offset = conversation_offset
+        self.message_offset = message_offset
+        self.conversations: list[tuple[Any, ...]] = []
+        self.messages: list[tuple[Any, ...]] = []
+        self.metadata: list[tuple[Any, ...]] = []
+        self.tool_events: list[tuple[Any, ...]] = []
+        self.feedback: list[tuple[Any, ...]] = []
+
+    def __len__(self) -> int:
+        return len(self.conversations) + len(self.messages)
+
+    def add(self, record: dict[str, Any]) -> str | None:
+        kind = record.get("type")
+        if kind == "conversation":
+            self.conversations.append(
+                (
+                    int(record["id"]) + self.conversation_offset,
+                    record["title"],
+                    record["created_at"],
+                    record["updated_at"],
+                )
+            )
+            return kind
+
+        if kind != "message":
+            return None
+
+        message_id = int(record["id"]) + self.message_offset
+        self.messages.append(
+            (
+                message_id,
+                int(record["conversation_id"]) + self.conversation_offset,
+                record["role"],
+                record["raw_text"],
+                record["rendered_html"],
+                record["status"],
+                record["created_at"],
+                int(record.get("renderer_version", 1)),
+                record.get("render_text"),
+            )
+        )
+        feedback = record.get("feedback")
+        if feedback:
+            self.feedback.append((message_id, feedback["vote"], feedback["updated_at"]))
+        metadata = record.get("metadata")
+        if metadata:
+            tool_events = metadata.get("tool_events") or []
+            self.metadata.append(
+                (
+                    message_id,
+                    metadata["provider"],
+                    metadata["model_id"],
+                    metadata["stop_reason"],
+                    metadata["input_tokens"],
+                    metadata["output_tokens"],
+                    metadata["latency_ms"],
+                    json.dumps(tool_events),
+                    metadata["raw_event_count"],
+                )
+            )
+            tool_calls = metadata.get("tool_calls")
+            if tool_calls is None:
+                # Archives written before tool_calls existed: derive the rows from the raw payloads.
+                self.tool_events.extend(db.tool_event_rows(message_id, tool_events))
+            else:
+                self.tool_events.extend(
+                    (message_id, *(call.get(key) for key in TOOL_CALL_FIELDS)) for call in tool_calls
+                )
+        return kind
+
+    def flush(self) -> None:
+        conn = db.get_db()
+        with conn:
+            conn.executemany(
+                "INSERT INTO conversations (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                self.conversations,
+            )
+            conn.executemany(
+                """
+                INSERT INTO messages (
+                  id,
+                  conversation_id,
+                  role,
+                  raw_text,
+                  rendered_html,
+                  status,
+                  created_at,
+                  renderer_version,
+                  render_text
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                self.messages,
+            )
+            conn.executemany(
+                """
+                INSERT INTO assistant_metadata (
+                  message_id,
+                  provider,
+                  model_id,
+                  stop_reason,
+                  input_tokens,
+                  output_tokens,
+                  latency_ms,
+                  tool_events_json,
+                  raw_event_count
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                self.metadata,
+            )
+            db.insert_tool_event_rows(conn, self.tool_events)
+            conn.executemany(
+                "INSERT INTO message_feedback (message_id, vote, updated_at) VALUES (?, ?, ?)",
+                self.feedback,
+            )
+        self.conversations.clear()
+        self.messages.clear()
+        self.metadata.clear()
+        self.tool_events.clear()
+        self.feedback.clear()
+
+
+def import_ndjson(lines: Iterable[str], chunk_size: int = 1000) -> dict[str, int]:
+    offsets = db.fetch_one(
+        """
+        SELECT
+          (SELECT COALESCE(MAX(id), 0) FROM conversations) AS conversation_offset,
+          (SELECT COALESCE(MAX(id), 0) FROM messages) AS message_offset
+        """
+    )
+    conversation_offset = int(offsets["conversation_offset"]) if offsets is not None else 0
+    message_offset = int(offsets["message_offset"]) if offsets is not None else 0
+    batch = _ImportBatch(conversation_offset, message_offset)
+    counts = {"conversation": 0, "message": 0}
+
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            kind = batch.add(json.loads(line))
+            if kind in counts:
+                counts[kind] += 1
+            if len(batch) >= chunk_size:
+                batch.flush()
+        batch.flush()
+    finally:
+        # Chunks committed before a failure stay, and the delete triggers later subtract them
+        # from the rollups, so they must be counted even when the import stops part way.
+        db.rebuild_rollups()
+    return counts
+
+
+@click.command("export-ndjson")
+@click.argument("path", type=click.Path(dir_okay=False, allow_dash=True), default="-")
+@with_appcontext
+def export_ndjson_command(path: str) -> None:
+    start = time.monotonic()
+    if path == "-":
+        counts = export_ndjson(sys.stdout)
+    else:
+        with open(path, "w", encoding="utf-8") as out:
+            counts = export_ndjson(out)
+    elapsed = time.monotonic() - start
+    click.echo(
+        f"Exported {counts['conversation']} conversations and {counts['message']} messages "
+        f"in {elapsed:.2f} s ({counts['message'] / max(elapsed, 1e-9):.0f} messages/s).",
+        err=True,
+    )
+
+
+@click.command("import-ndjson")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--chunk-size", default=1000, show_default=True, type=click.IntRange(min=1))
+@with_appcontext
+def import_ndjson_command(path: str, chunk_size: int) -> None:
+    start = time.monotonic()
+    with click.open_file(path, "r", encoding="utf-8") as lines:
+        counts = import_ndjson(lines, chunk_size=chunk_size)
+    elapsed = time.monotonic() - start
+    click.echo(
+        f"Imported {counts['conversation']} conversations and {counts['message']} messages "
+        f"in {elapsed:.2f} s ({counts['message'] / max(elapsed, 1e-9):.0f} messages/s)."
+    )
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    app.cli.add_command(export_ndjson_command)
+    app.cli.add_command(import_ndjson_command)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import urllib.request
+from dataclasses import dataclass
+from pathlib import Path
+
+import click
+from flask import Response, abort, current_app, request, url_for
+from flask.cli import with_appcontext
+from werkzeug.datastructures import Accept
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are produced
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+BUNDLED_ASSETS = ("app.css", "app.js")
+
+# Pinned upstream copies; `flask vendor-assets` downloads them into static/vendor/. Until then
+# asset_url() falls back to the same pinned CDN URL.
+VENDOR_ASSETS = {
+    "vendor/htmx.min.js": "https://unpkg.com/htmx.org@1.9.12/dist/htmx.min.js",
+    "vendor/sse.js": "https://unpkg.com/htmx.org@1.9.12/dist/ext/sse.js",
+    "vendor/alpine.min.js": "https://unpkg.com/alpinejs@3.14.8/dist/cdn.min.js",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Asset:
+    name: str
+    fingerprinted: str
+    content_type: str
+    body: bytes
+    gzip: bytes
+    brotli: bytes | None
+
+    def variant(self, accepts: Accept) -> tuple[bytes, str | None]:
+        if self.brotli is not None and accepts["br"]:
+            return self.brotli, "br"
+        if accepts["gzip"]:
+            return self.gzip, "gzip"
+        return self.body, None
+
+
+def fingerprint(name: str, body: bytes) -> str:
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    stem, dot, suffix = name.rpartition(".")
+    return f"{stem}.{digest}.{suffix}" if dot else f"{name}.{digest}"
+
+
+def build_asset(name: str, body: bytes) -> Asset:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type.endswith("javascript"):
+        content_type = f"{content_type}; charset=utf-8"
+    return Asset(
+        name=name,
+        fingerprinted=fingerprint(name, body),
+        content_type=content_type,
+        body=body,
+        # mtime=0 keeps the compressed bytes identical across builds.
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        brotli=brotli.compress(body, quality=11) if brotli is not None else None,
+    )
+
+
+class AssetManifest:
+    def __init__(self, assets: list[Asset]) -> None:
+        self.by_name = {asset.name: asset for asset in assets}
+        self.by_fingerprint = {asset.fingerprinted: asset for asset in assets}
+
+    @classmethod
+    def build(cls, static_dir: Path) -> AssetManifest:
+        names = [*BUNDLED_ASSETS, *VENDOR_ASSETS]
+        return cls(
+            [build_asset(name, (static_dir / name).read_bytes()) for name in names if (static_dir / name).is_file()]
+        )
+
+    def to_json(self) -> dict[str, str]:
+        return {name: asset.fingerprinted for name, asset in sorted(self.by_name.items())}
+
+
+def _manifest() -> AssetManifest | None:
+    return current_app.extensions.get("assets")
+
+
+def asset_url(name: str) -> str:
+    manifest = _manifest()
+    asset = manifest.by_name.get(name) if manifest is not None else None
+    if asset is not None:
+        return url_for("serve_asset", filename=asset.fingerprinted)
+    if name in VENDOR_ASSETS and not Path(current_app.static_folder or "", name).is_file():
+        return VENDOR_ASSETS[name]
+    return url_for("static", filename=name)
+
+
+def serve_asset(filename: str) -> Response:
+    manifest = _manifest()
+    asset = manifest.by_fingerprint.get(filename) if manifest is not None else None
+    if asset is None:
+        abort(404)
+    body, encoding = asset.variant(request.accept_encodings)
+    response = Response(body, content_type=asset.content_type)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    # The name changes whenever the content does, so browsers never need to revalidate.
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(f"{filename}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+
+def write_assets(manifest: AssetManifest, out_dir: Path) -> int:
+    written = 0
+    for asset in manifest.by_name.values():
+        target = out_dir / asset.fingerprinted
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(asset.body)
+        target.with_name(f"{target.name}.gz").write_bytes(asset.gzip)
+        written += 2
+        if asset.brotli is not None:
+            target.with_name(f"{target.name}.br").write_bytes(asset.brotli)
+            written += 1
+    (out_dir / "manifest.json").write_text(json.dumps(manifest.to_json(), indent=2) + "\n", encoding="utf-8")
+    return written
+
+
+@click.command("vendor-assets")
+@with_appcontext
+def vendor_assets_command() -> None:
+    static_dir = Path(current_app.static_folder or "")
+    for name, url in VENDOR_ASSETS.items():
+        with urllib.request.urlopen(url, timeout=30) as upstream:
+            body = upstream.read()
+        target = static_dir / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(body)
+        click.echo(f"{name}: {len(body)} bytes from {url}")
+
+
+@click.command("build-assets")
+@click.option(
+    "--out",
+    "out_dir",
+    default="static/dist",
+    show_default=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory for fingerprinted files, .gz/.br variants and manifest.json.",
+)
+@with_appcontext
+def build_assets_command(out_dir: Path) -> None:
+    manifest = AssetManifest.build(Path(current_app.static_folder or ""))
+    written = write_assets(manifest, out_dir)
+    for _, asset in sorted(manifest.by_name.items()):
+        brotli_size = len(asset.brotli) if asset.brotli is not None else "-"
+        click.echo(f"{asset.fingerprinted}: {len(asset.body)} raw, {len(asset.gzip)} gz, {brotli_size} br")
+    click.echo(f"Wrote {written} files and manifest.json to {out_dir}.")
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    app.cli.add_command(vendor_assets_command)
+    app.cli.add_command(build_assets_command)
+    app.add_template_global(asset_url)
+    if not app.config.get("ASSET_FINGERPRINTING", True):
+        return
+    # Built once per process: a handful of small files, hashed and compressed up front so every
+    # request just picks the variant that matches Accept-Encoding.
+    app.extensions["assets"] = AssetManifest.build(Path(app.static_folder or ""))
+    app.add_url_rule("/assets/<path:filename>", "serve_asset", serve_asset)
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any, ClassVar, Iterable, Iterator
+from urllib.parse import quote, urlsplit
+
+EVENT_STREAM_CONTENT_TYPE = "application/vnd.amazon.eventstream"
+
+_PRELUDE = struct.Struct(">III")
+_CRC = struct.Struct(">I")
+_U16 = struct.Struct(">H")
+_PRELUDE_LENGTH = 12
+_MIN_MESSAGE_LENGTH = _PRELUDE_LENGTH + _CRC.size
+
+_HEADER_BOOL_TRUE = 0
+_HEADER_BOOL_FALSE = 1
+_HEADER_BYTES = 6
+_HEADER_STRING = 7
+_HEADER_UUID = 9
+_FIXED_HEADERS = {
+    2: struct.Struct(">b"),
+    3: struct.Struct(">h"),
+    4: struct.Struct(">i"),
+    5: struct.Struct(">q"),
+    8: struct.Struct(">q"),
+}
+
+
+class EventStreamError(RuntimeError):
+    pass
+
+
+class BedrockStreamError(RuntimeError):
+    pass
+
+
+def _decode_headers(view: memoryview, offset: int, end: int) -> dict[str, Any]:
+    headers: dict[str, Any] = {}
+    while offset < end:
+        name_length = view[offset]
+        offset += 1
+        name = str(view[offset : offset + name_length], "utf-8")
+        offset += name_length
+        kind = view[offset]
+        offset += 1
+        value: Any
+        if kind == _HEADER_STRING or kind == _HEADER_BYTES:
+            (length,) = _U16.unpack_from(view, offset)
+            offset += _U16.size
+            raw = view[offset : offset + length]
+            value = str(raw, "utf-8") if kind == _HEADER_STRING else raw.tobytes()
+            offset += length
+        elif kind == _HEADER_BOOL_TRUE or kind == _HEADER_BOOL_FALSE:
+            value = kind == _HEADER_BOOL_TRUE
+        elif kind == _HEADER_UUID:
+            value = view[offset : offset + 16].hex()
+            offset += 16
+        elif kind in _FIXED_HEADERS:
+            fixed = _FIXED_HEADERS[kind]
+            (value,) = fixed.unpack_from(view, offset)
+            offset += fixed.size
+        else:
+            raise EventStreamError(f"unknown header type {kind} for {name!r}")
+        headers[name] = value
+    if offset != end:
+        raise EventStreamError("header block overruns its declared length")
+    return headers
+
+
+# Incremental decoder for the AWS binary event-stream framing. Network reads are appended to
+# one bytearray that is compacted lazily; frames are parsed through a memoryview so only the
+# UTF-8 payload text is materialized. Header blocks repeat across a stream (a handful of event
+# types), so they are decoded once per distinct block.
+class EventStreamDecoder:
+    _HEADER_CACHE_SIZE = 64
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._start = 0
+        self._header_cache: dict[bytes, dict[str, Any]] = {}
+        self.frames_decoded = 0
+        self.bytes_decoded = 0
+
+    def feed(self, data: bytes | bytearray | memoryview) -> None:
+        if self._start:
+            del self._buffer[: self._start]
+            self._start = 0
+        self._buffer += data
+
+    def messages(self) -> list[tuple[dict[str, Any], str]]:
+        # Returned header dicts are shared between frames and must be treated as read-only.
+        buffer = self._buffer
+        available = len(buffer)
+        start = self._start
+        decoded: list[tuple[dict[str, Any], str]] = []
+        if available - start < _PRELUDE_LENGTH:
+            return decoded
+
+        header_cache = self._header_cache
+        with memoryview(buffer) as view:
+            while available - start >= _PRELUDE_LENGTH:
+                total_length, headers_length, prelude_crc = _PRELUDE.unpack_from(view, start)
+                if total_length < _MIN_MESSAGE_LENGTH + headers_length:
+                    raise EventStreamError(f"invalid frame length {total_length}")
+                end = start + total_length
+                if end > available:
+                    break
+
+                running_crc = zlib.crc32(view[start : start + 8])
+                if running_crc != prelude_crc:
+                    raise EventStreamError("prelude checksum mismatch")
+                (message_crc,) = _CRC.unpack_from(view, end - _CRC.size)
+                if zlib.crc32(view[start + 8 : end - _CRC.size], running_crc) != message_crc:
+                    raise EventStreamError("message checksum mismatch")
+
+                headers_start = start + _PRELUDE_LENGTH
+                headers_end = headers_start + headers_length
+                header_key = view[headers_start:headers_end].tobytes()
+                headers = header_cache.get(header_key)
+                if headers is None:
+                    headers = _decode_headers(view, headers_start, headers_end)
+                    if len(header_cache) >= self._HEADER_CACHE_SIZE:
+                        header_cache.clear()
+                    header_cache[header_key] = headers
+
+                decoded.append((headers, str(view[headers_end : end - _CRC.size], "utf-8")))
+                self.bytes_decoded += total_length
+                start = end
+
+        self._start = start
+        self.frames_decoded += len(decoded)
+        return decoded
+
+    def finish(self) -> None:
+        if len(self._buffer) - self._start:
+            raise EventStreamError(f"stream ended inside a frame ({len(self._buffer) - self._start} bytes left)")
+
+
+def encode_event_frame(headers: dict[str, str], payload: bytes) -> bytes:
+    header_block = bytearray()
+    for name, value in headers.items():
+        encoded_name = name.encode("utf-8")
+        encoded_value = value.encode("utf-8")
+        header_block.append(len(encoded_name))
+        header_block += encoded_name
+        header_block.append(_HEADER_STRING)
+        header_block += _U16.pack(len(encoded_value))
+        header_block += encoded_value
+
+    total_length = _MIN_MESSAGE_LENGTH + len(header_block) + len(payload)
+    prelude = struct.pack(">II", total_length, len(header_block))
+    message = bytearray(prelude)
+    message += _CRC.pack(zlib.crc32(prelude))
+    message += header_block
+    message += payload
+    message += _CRC.pack(zlib.crc32(message))
+    return bytes(message)
+
+
+def encode_converse_event(event_type: str, payload: dict[str, Any]) -> bytes:
+    return encode_event_frame(
+        {":event-type": event_type, ":content-type": "application/json", ":message-type": "event"},
+        json.dumps(payload, separators=(",", ":")).encode("utf-8"),
+    )
+
+
+def converse_events(
+    messages: Iterable[tuple[dict[str, Any], str]],
+    model_id: str,
+    temperature: float,
+) -> Iterator[dict[str, Any]]:
+    # Maps ConverseStream frames onto the event dicts the mock client emits. Tool input arrives
+    # as JSON fragments, so a tool call is surfaced as one toolUse delta when its block stops.
+    tool_blocks: dict[int, dict[str, Any]] = {}
+    for headers, payload_text in messages:
+        message_type = headers.get(":message-type", "event")
+        if message_type != "event":
+            error_type = headers.get(":exception-type") or headers.get(":error-code") or message_type
+            detail = headers.get(":error-message") or payload_text
+            raise BedrockStreamError(f"{error_type}: {detail}")
+
+        event_type = str(headers.get(":event-type", "unknown"))
+        payload = json.loads(payload_text) if payload_text else {}
+        payload.pop("p", None)
+
+        if event_type == "messageStart":
+            yield {"type": "messageStart", "message": payload}
+        elif event_type == "contentBlockStart":
+            start = payload.get("start", {})
+            if "toolUse" in start:
+                tool_blocks[int(payload.get("contentBlockIndex", 0))] = {**start["toolUse"], "input": ""}
+                continue
+            yield {"type": "contentBlockStart", **payload}
+        elif event_type == "contentBlockDelta":
+            index = int(payload.get("contentBlockIndex", 0))
+            delta = payload.get("delta", {})
+            if index in tool_blocks and "toolUse" in delta:
+                tool_blocks[index]["input"] += str(delta["toolUse"].get("input", ""))
+                continue
+            yield {"type": "contentBlockDelta", **payload}
+        elif event_type == "contentBlockStop":
+            index = int(payload.get("contentBlockIndex", 0))
+            tool = tool_blocks.pop(index, None)
+            if tool is not None:
+                raw_input = tool["input"]
+                tool["input"] = json.loads(raw_input) if raw_input else {}
+                yield {"type": "contentBlockDelta", "contentBlockIndex": index, "delta": {"toolUse": tool}}
+            yield {"type": "contentBlockStop", **payload}
+        elif event_type == "messageStop":
+            yield {"type": "messageStop", **payload}
+        elif event_type == "metadata":
+            yield {
+                "type": "metadata",
+                "metadata": {**payload, "modelId": model_id, "temperature": temperature},
+            }
+        else:
+            yield {"type": event_type, **payload}
+
+
+def converse_messages(history: Iterable[dict[str, str]]) -> list[dict[str, Any]]:
+    # Converse rejects empty turns (left behind by cancelled or failed streams) and two turns in
+    # a row from the same role, so empty turns are dropped and neighbours are merged.
+    turns: list[dict[str, Any]] = []
+    for message in history:
+        text = message["content"]
+        if not text.strip():
+            continue
+        if turns and turns[-1]["role"] == message["role"]:
+            turns[-1]["content"][0]["text"] += f"\n\n{text}"
+        else:
+            turns.append({"role": message["role"], "content": [{"text": text}]})
+    return turns
+
+
+@dataclass(frozen=True, slots=True)
+class AwsCredentials:
+    access_key: str
+    secret_key: str
+    session_token: str | None = None
+
+    @classmethod
+    def from_env(cls) -> AwsCredentials | None:
+        access_key = os.environ.get("AWS_ACCESS_KEY_ID")
+        secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
+        if not access_key or not secret_key:
+            return None
+        return cls(access_key, secret_key, os.environ.get("AWS_SESSION_TOKEN") or None)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_v4(
+    method: str,
+    host: str,
+    path: str,
+    body: bytes,
+    region: str,
+    credentials: AwsCredentials,
+    service: str = "bedrock",
+    now: datetime | None = None,
+) -> dict[str, str]:
+    amz_date = (now or datetime.now(UTC)).strftime("%Y%m%dT%H%M%SZ")
+    day = amz_date[:8]
+    headers = {"host": host, "x-amz-date": amz_date}
+    if credentials.session_token:
+        headers["x-amz-security-token"] = credentials.session_token
+
+    signed_headers = ";".join(sorted(headers))
+    canonical_request = "\n".join(
+        [
+            method,
+            # Non-S3 services sign the already-escaped path escaped once more.
+            quote(path, safe="/-_.~"),
+            "",
+            "".join(f"{name}:{headers[name]}\n" for name in sorted(headers)),
+            signed_headers,
+            hashlib.sha256(body).hexdigest(),
+        ]
+    )
+    scope = f"{day}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()]
+    )
+    key = _hmac(f"AWS4{credentials.secret_key}".encode("utf-8"), day)
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={credentials.access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+# Keep-alive HTTP connections shared by every stream of one app. Connections go back to the
+# pool only after their response was read to the end and the server did not ask to close.
+class ConnectionPool:
+    def __init__(self, endpoint: str, max_idle: int = 8, timeout_s: float = 60.0) -> None:
+        parts = urlsplit(endpoint)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise ValueError(f"invalid provider endpoint {endpoint!r}")
+        self.scheme = parts.scheme
+        self.hostname = parts.hostname
+        self.port = parts.port
+        self.host_header = parts.netloc
+        self.max_idle = max_idle
+        self.timeout_s = timeout_s
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def acquire(self, fresh: bool = False) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle and not fresh:
+                self.reused += 1
+                return self._idle.pop(), True
+            self.created += 1
+        connection_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return connection_cls(self.hostname, self.port, timeout=self.timeout_s), False
+
+    def release(self, connection: http.client.HTTPConnection, reusable: bool) -> None:
+        if reusable:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(connection)
+                    return
+        with self._lock:
+            self.discarded += 1
+        connection.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
+
+
+@dataclass(slots=True)
+class BedrockStreamClient:
+    provider_name: ClassVar[str] = "bedrock"
+
+    pool: ConnectionPool
+    region: str
+    credentials: AwsCredentials | None = None
+    read_size: int = 16384
+
+    def converse_stream(
+        self,
+        messages: list[dict[str, str]],
+        model_id: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> Iterator[dict]:
+        body = json.dumps(
+            {
+                "messages": converse_messages(messages),
+                "inferenceConfig": {"maxTokens": max_tokens, "temperature": temperature},
+            }
+        ).encode("utf-8")
+        path = f"/model/{quote(model_id, safe='')}/converse-stream"
+        connection, response = self._open(path, body)
+        reusable = False
+        try:
+            if response.status != 200:
+                detail = response.read(2048).decode("utf-8", "replace")
+                raise BedrockStreamError(f"HTTP {response.status}: {detail}")
+            yield from converse_events(self._messages(response), model_id, temperature)
+            reusable = not response.will_close
+        finally:
+            self.pool.release(connection, reusable)
+
+    def _headers(self, path: str, body: bytes) -> dict[str, str]:
+        headers = {"Content-Type": "application/json", "Accept": EVENT_STREAM_CONTENT_TYPE}
+        if self.credentials is not None:
+            headers.update(
+                sign_v4("POST", self.pool.host_header, path, body, self.region, self.credentials)
+            )
+        return headers
+
+    def _open(self, path: str, body: bytes) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        connection, reused = self.pool.acquire()
+        try:
+            return self._send(connection, path, body)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if not reused:
+                raise
+        # An idle keep-alive socket the server already closed: retry once, on a new connection
+        # rather than the next idle one, which is likely just as stale.
+        connection, _ = self.pool.acquire(fresh=True)
+        return self._send(connection, path, body)
+
+    def _send(
+        self,
+        connection: http.client.HTTPConnection,
+        path: str,
+        body: bytes,
+    ) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        try:
+            connection.request("POST", path, body=body, headers=self._headers(path, body))
+            return connection, connection.getresponse()
+        except BaseException:
+            self.pool.release(connection, reusable=False)
+            raise
+
+    def _messages(self, response: http.client.HTTPResponse) -> Iterator[tuple[dict[str, Any], str]]:
+        decoder = EventStreamDecoder()
+        while True:
+            # read1 returns whatever one socket read (or one chunk) holds, so frames are decoded
+            # as they arrive instead of after a full buffer's worth.
+            data = response.read1(self.read_size)
+            if not data:
+                break
+            decoder.feed(data)
+            yield from decoder.messages()
+        decoder.finish()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+# Short-lived cache for rendered fragments that are cheap to key but expensive to build.
+# Entries expire after `ttl_s`; keys should embed a version so writes never need to reach it.
+class FragmentCache:
+    def __init__(self, ttl_s: float, max_entries: int) -> None:
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: str) -> None:
+        if self.ttl_s <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, match_prefix: Hashable) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if isinstance(key, tuple) and key[0] == match_prefix]:
+                del self._entries[key]
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import click
+from flask.cli import with_appcontext
+
+from chat_hateoas import db
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def page_stats() -> dict[str, int]:
+    conn = db.get_db()
+    return {
+        "page_size": int(conn.execute("PRAGMA page_size").fetchone()[0]),
+        "page_count": int(conn.execute("PRAGMA page_count").fetchone()[0]),
+        "freelist_count": int(conn.execute("PRAGMA freelist_count").fetchone()[0]),
+    }
+
+
+def incremental_vacuum(max_pages: int = 0, convert: bool = False) -> dict[str, Any]:
+    conn = db.get_db()
+    before = page_stats()
+    mode = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+    converted = False
+    if mode != AUTO_VACUUM_INCREMENTAL:
+        if not convert:
+            raise click.ClickException(
+                "database is not in auto_vacuum=INCREMENTAL mode; rerun with --convert "
+                "to rebuild it once with a full VACUUM"
+            )
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        converted = True
+    else:
+        # sqlite3.Cursor.execute steps this pragma once (one page); executescript runs it to completion.
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+    after = page_stats()
+    return {
+        "converted": converted,
+        "pages_before": before["page_count"],
+        "pages_after": after["page_count"],
+        "pages_reclaimed": before["page_count"] - after["page_count"],
+        "freelist_after": after["freelist_count"],
+        "page_size": after["page_size"],
+    }
+
+
+def analyze(full: bool = False) -> None:
+    conn = db.get_db()
+    if full:
+        conn.execute("ANALYZE")
+    else:
+        conn.execute("PRAGMA optimize")
+    conn.commit()
+
+
+def wal_checkpoint(mode: str = "TRUNCATE") -> dict[str, Any]:
+    conn = db.get_db()
+    journal_mode = str(conn.execute("PRAGMA journal_mode").fetchone()[0])
+    busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    return {
+        "journal_mode": journal_mode,
+        "busy": int(busy),
+        "log_frames": int(log_frames),
+        "checkpointed_frames": int(checkpointed),
+    }
+
+
+def integrity_check(quick: bool = False) -> list[str]:
+    pragma = "quick_check" if quick else "integrity_check"
+    conn = db.get_db()
+    problems = [str(row[0]) for row in conn.execute(f"PRAGMA {pragma}").fetchall() if row[0] != "ok"]
+    problems.extend(
+        f"foreign key violation in {row[0]} rowid {row[1]} -> {row[2]}"
+        for row in conn.execute("PRAGMA foreign_key_check").fetchall()
+    )
+    return problems
+
+
+def purge_conversations(
+    older_than_days: int,
+    batch_size: int = 200,
+    pause_ms: int = 0,
+) -> dict[str, int]:
+    conn = db.get_db()
+    cutoff = (datetime.now(UTC) - timedelta(days=older_than_days)).isoformat(timespec="seconds")
+    deleted = 0
+    batches = 0
+    while True:
+        with conn:
+            cur = conn.execute(
+                """
+                DELETE FROM conversations
+                WHERE id IN (
+                  SELECT id FROM conversations
+                  WHERE updated_at < ?
+                  ORDER BY updated_at ASC
+                  LIMIT ?
+                )
+                """,
+                (cutoff, batch_size),
+            )
+        if cur.rowcount <= 0:
+            break
+        deleted += cur.rowcount
+        batches += 1
+        if cur.rowcount < batch_size:
+            break
+        if pause_ms > 0:
+            time.sleep(pause_ms / 1000.0)
+    return {"deleted": deleted, "batches": batches}
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.monotonic() - start) * 1000)
+
+
+@click.command("vacuum")
+@click.option(
+    "--max-pages",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="0 frees every free page.",
+)
+@click.option("--convert", is_flag=True, help="Switch a legacy database to incremental auto_vacuum.")
+@with_appcontext
+def vacuum_command(max_pages: int, convert: bool) -> None:
+    start = time.monotonic()
+    result = incremental_vacuum(max_pages=max_pages, convert=convert)
+    verb = "Converted to incremental auto_vacuum" if result["converted"] else "Incremental vacuum done"
+    click.echo(
+        f"{verb} in {_elapsed_ms(start)} ms: {result['pages_reclaimed']} pages reclaimed "
+        f"({result['pages_reclaimed'] * result['page_size']} bytes), "
+        f"{result['pages_after']} pages, {result['freelist_after']} still free."
+    )
+
+
+@click.command("analyze")
+@click.option("--full", is_flag=True, help="Run a full ANALYZE instead of PRAGMA optimize.")
+@with_appcontext
+def analyze_command(full: bool) -> None:
+    start = time.monotonic()
+    analyze(full=full)
+    label = "ANALYZE" if full else "PRAGMA optimize"
+    click.echo(f"{label} done in {_elapsed_ms(start)} ms.")
+
+
+@click.command("wal-checkpoint")
+@click.option(
+    "--mode",
+    default="TRUNCATE",
+    show_default=True,
+    type=click.Choice(["PASSIVE", "FULL", "RESTART", "TRUNCATE"], case_sensitive=False),
+)
+@with_appcontext
+def wal_checkpoint_command(mode: str) -> None:
+    start = time.monotonic()
+    result = wal_checkpoint(mode.upper())
+    if result["journal_mode"] != "wal":
+        click.echo(f"Journal mode is {result['journal_mode']}; nothing to checkpoint.")
+        return
+    click.echo(
+        f"WAL checkpoint ({mode.upper()}) done in {_elapsed_ms(start)} ms: "
+        f"{result['checkpointed_frames']}/{result['log_frames']} frames checkpointed, busy={result['busy']}."
+    )
+
+
+@click.command("integrity-check")
+@click.option("--quick", is_flag=True, help="Run PRAGMA quick_check instead of integrity_check.")
+@with_appcontext
+def integrity_check_command(quick: bool) -> None:
+    start = time.monotonic()
+    problems = integrity_check(quick=quick)
+    stats = page_stats()
+    if problems:
+        for problem in problems:
+            click.echo(problem, err=True)
+        raise click.ClickException(f"{len(problems)} integrity problems found in {_elapsed_ms(start)} ms")
+    click.echo(
+        f"Integrity ok in {_elapsed_ms(start)} ms: {stats['page_count']} pages, "
+        f"{stats['freelist_count']} free."
+    )
+
+
+@click.command("purge-conversations")
+@click.option("--older-than-days", required=True, type=click.IntRange(min=1))
+@click.option("--batch-size", default=200, show_default=True, type=click.IntRange(min=1))
+@click.option("--pause-ms", default=50, show_default=True, type=click.IntRange(min=0))
+@click.option("--vacuum", "run_vacuum", is_flag=True, help="Run an incremental vacuum afterwards.")
+@with_appcontext
+def purge_conversations_command(
+    older_than_days: int,
+    batch_size: int,
+    pause_ms: int,
+    run_vacuum: bool,
+) -> None:
+    start = time.monotonic()
+    result = purge_conversations(older_than_days, batch_size=batch_size, pause_ms=pause_ms)
+    stats = page_stats()
+    click.echo(
+        f"Purged {result['deleted']} conversations in {result['batches']} batches "
+        f"in {_elapsed_ms(start)} ms; {stats['freelist_count']} free pages."
+    )
+    if run_vacuum:
+        vacuum_start = time.monotonic()
+        vacuum = incremental_vacuum()
+        click.echo(
+            f"Incremental vacuum done in {_elapsed_ms(vacuum_start)} ms: "
+            f"{vacuum['pages_reclaimed']} pages reclaimed."
+        )
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    app.cli.add_command(vacuum_command)
+    app.cli.add_command(analyze_command)
+    app.cli.add_command(wal_checkpoint_command)
+    app.cli.add_command(integrity_check_command)
+    app.cli.add_command(purge_conversations_command)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+from flask import current_app, url_for
+
+from chat_hateoas import db
+from chat_hateoas.records import Message
+from chat_hateoas.services.render_pool import render_assistant
+from chat_hateoas.services.transform import RENDERER_VERSION, render_user_html
+
+STORAGE_EAGER = "eager"
+STORAGE_LAZY = "lazy"
+
+CacheKey = tuple[int, int, int]
+
+_TOOL_STATUS_HTML = '<div class="tool-status '
+
+
+class RenderCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[CacheKey, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> str | None:
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key: CacheKey, html: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: CacheKey) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def _cache() -> RenderCache:
+    cache = current_app.extensions.get("render_cache")
+    if cache is None:
+        cache = RenderCache(int(current_app.config.get("RENDER_CACHE_SIZE", 2048)))
+        current_app.extensions["render_cache"] = cache
+    return cache
+
+
+def _cache_key(message: Message) -> CacheKey:
+    # messages.id has no AUTOINCREMENT, so a deleted message's id can come back for a new one;
+    # the text hash keeps a reused id from serving the old message's HTML.
+    return (message.id, RENDERER_VERSION, hash(source_text(message)))
+
+
+def is_lazy() -> bool:
+    return current_app.config.get("MESSAGE_HTML_STORAGE", STORAGE_EAGER) == STORAGE_LAZY
+
+
+def html_for_storage(rendered_html: str) -> str:
+    return "" if is_lazy() else rendered_html
+
+
+def source_text(message: Message) -> str:
+    return message.raw_text if message.render_text is None else message.render_text
+
+
+def render_message_html(role: str, raw_text: str, message_id: int) -> str:
+    if role == "user":
+        return render_user_html(raw_text)
+    return render_assistant(raw_text, message_id, action_url=url_for("web.fake_action"))
+
+
+def _keeps_stored_html(message: Message) -> bool:
+    stored = message.rendered_html
+    if not stored:
+        return False
+    if message.renderer_version == RENDERER_VERSION:
+        return True
+    # Rows written before render_text existed kept their tool-status markers only in the stored
+    # HTML; re-rendering them from raw_text would drop those blocks, so they keep the old HTML.
+    return message.render_text is None and message.role == "assistant" and _TOOL_STATUS_HTML in stored
+
+
+def _resolve_html(message: Message) -> str:
+    stored = message.rendered_html
+    if _keeps_stored_html(message):
+        return stored
+    if message.status == "streaming":
+        return stored
+
+    key = _cache_key(message)
+    cache = _cache()
+    html = cache.get(key)
+    if html is None:
+        html = render_message_html(message.role, source_text(message), message.id)
+        cache.put(key, html)
+    return html
+
+
+def hydrate_message(message: Message) -> Message:
+    html = _resolve_html(message)
+    # Records are immutable, so the common case (stored HTML is current) needs no copy at all.
+    if html is message.rendered_html:
+        return message
+    return message._replace(rendered_html=html)
+
+
+def hydrate_messages(messages: Iterable[Message]) -> list[Message]:
+    return [hydrate_message(message) for message in messages]
+
+
+def iter_hydrated_messages(messages: Iterable[Message]) -> Iterator[Message]:
+    for message in messages:
+        yield hydrate_message(message)
+
+
+def warm_hot_conversations(conversation_limit: int) -> int:
+    rendered = 0
+    cache = _cache()
+    for conversation in db.list_conversations(limit=conversation_limit):
+        for message in db.list_messages(conversation.id):
+            if message.status == "streaming" or _cache_key(message) in cache:
+                continue
+            if _keeps_stored_html(message):
+                continue
+            _resolve_html(message)
+            rendered += 1
+    return rendered
+
+
+def _warm_loop(app, interval_s: float, conversation_limit: int) -> None:  # type: ignore[no-untyped-def]
+    while True:
+        try:
+            with app.test_request_context():
+                warm_hot_conversations(conversation_limit)
+        except Exception:
+            app.logger.exception("render cache warm-up failed")
+        time.sleep(interval_s)
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    interval_s = float(app.config.get("RENDER_WARM_INTERVAL_S", 0))
+    if interval_s <= 0:
+        return
+
+    started_pid: list[int] = []
+
+    @app.before_request
+    def _start_render_warmer() -> None:
+        # Started per process on first request so pre-forked workers each get their own thread.
+        if started_pid and started_pid[0] == os.getpid():
+            return
+        started_pid[:] = [os.getpid()]
+        threading.Thread(
+            target=_warm_loop,
+            args=(app, interval_s, int(app.config.get("RENDER_WARM_CONVERSATIONS", 5))),
+            name="render-cache-warmer",
+            daemon=True,
+        ).start()
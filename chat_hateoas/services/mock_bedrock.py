@@ -4,8 +4,8 @@ import json
 import random
 from dataclasses import dataclass
 from itertools import count
-from typing import Iterator
-
+from json.encoder import encode_basestring_ascii
+from typing import Any, ClassVar, Iterable, Iterator, TextIO
 
 LEAD_SENTENCES = [
     "Here is a practical answer you can use immediately.",
@@ -65,8 +65,30 @@ TOOL_DEFINITIONS = [
 ]
 
 
+# Tool transcript lines never vary per response, so they are serialized once.
+_TOOL_TEXT_LINES = {
+    tool["name"]: (
+        json.dumps({"toolUse": {"toolName": tool["name"], "input": tool["input"]}}),
+        json.dumps({"toolResult": {"toolName": tool["name"], "status": tool["result"]["status"]}}),
+    )
+    for tool in TOOL_DEFINITIONS
+}
+
+
+@dataclass(slots=True)
+class MockResponse:
+    seed: int | None
+    text: str
+    chunks: list[str]
+    chunk_starts: list[int]
+    tool_schedule: dict[int, list[dict]]
+    stop_reason: str
+
+
 @dataclass(slots=True)
 class MockBedrockClient:
+    provider_name: ClassVar[str] = "mock-bedrock"
+
     seed: int | None = None
 
     def converse_stream(
@@ -76,8 +98,10 @@ class MockBedrockClient:
         max_tokens: int,
         temperature: float,
     ) -> Iterator[dict]:
-        rng = random.Random(self.seed)
+        response = self.plan_response(random.Random(self.seed))
+        yield from response_events(response, messages, model_id, max_tokens, temperature)
 
+    def plan_response(self, rng: random.Random) -> MockResponse:
         response_text, tool_plan = self._build_response_text(rng)
         tool_anchors = self._pick_tool_anchor_positions(
             text=response_text,
@@ -95,42 +119,14 @@ class MockBedrockClient:
             chunk_count=len(chunks),
             rng=rng,
         )
-
-        yield {"type": "messageStart", "message": {"role": "assistant"}}
-        yield {"type": "contentBlockStart", "contentBlockIndex": 0, "start": {"text": ""}}
-
-        for idx, chunk in enumerate(chunks):
-            for scheduled in tool_schedule.get(idx, []):
-                yield {
-                    "type": "contentBlockDelta",
-                    "contentBlockIndex": 0,
-                    "delta": scheduled,
-                }
-            yield {
-                "type": "contentBlockDelta",
-                "contentBlockIndex": 0,
-                "delta": {"text": chunk},
-            }
-
-        yield {"type": "contentBlockStop", "contentBlockIndex": 0}
-        yield {
-            "type": "messageStop",
-            "stopReason": rng.choice(["end_turn", "max_tokens"]),
-        }
-
-        input_tokens = max(20, sum(len(message.get("content", "")) for message in messages) // 4)
-        output_tokens = max(24, len(response_text) // 4)
-        yield {
-            "type": "metadata",
-            "metadata": {
-                "modelId": model_id,
-                "usage": {
-                    "inputTokens": min(input_tokens, max_tokens),
-                    "outputTokens": min(output_tokens, max_tokens),
-                },
-                "temperature": temperature,
-            },
-        }
+        return MockResponse(
+            seed=self.seed,
+            text=response_text,
+            chunks=chunks,
+            chunk_starts=chunk_starts,
+            tool_schedule=tool_schedule,
+            stop_reason=rng.choice(["end_turn", "max_tokens"]),
+        )
 
     def _build_response_text(self, rng: random.Random) -> tuple[str, list[dict]]:
         band = rng.choice(["short", "medium", "long"])
@@ -190,26 +186,7 @@ class MockBedrockClient:
         text_parts.append("")
         text_parts.append("#### Tool usage observed")
         for tool in chosen_tools:
-            text_parts.append(
-                json.dumps(
-                    {
-                        "toolUse": {
-                            "toolName": tool["name"],
-                            "input": tool["input"],
-                        }
-                    }
-                )
-            )
-            text_parts.append(
-                json.dumps(
-                    {
-                        "toolResult": {
-                            "toolName": tool["name"],
-                            "status": tool["result"]["status"],
-                        }
-                    }
-                )
-            )
+            text_parts.extend(_TOOL_TEXT_LINES[tool["name"]])
 
         if rng.random() < 0.9:
             button_label, action_id = rng.choice(BUTTON_ACTIONS)
@@ -267,18 +244,20 @@ class MockBedrockClient:
         chunks: list[str] = []
         chunk_starts: list[int] = []
         cursor = 0
-        breaks = sorted({point for point in forced_breaks if 0 < point < len(text)})
+        text_length = len(text)
+        breaks = sorted({point for point in forced_breaks if 0 < point < text_length})
+        break_count = len(breaks)
         break_idx = 0
+        randint = rng.randint
 
-        while cursor < len(text):
-            max_size = rng.randint(20, 72)
-            limit = min(len(text), cursor + max_size)
+        while cursor < text_length:
+            limit = min(text_length, cursor + randint(20, 72))
 
-            while break_idx < len(breaks) and breaks[break_idx] <= cursor:
+            while break_idx < break_count and breaks[break_idx] <= cursor:
                 break_idx += 1
 
             cut = limit
-            if break_idx < len(breaks):
+            if break_idx < break_count:
                 next_break = breaks[break_idx]
                 if cursor < next_break <= limit and (next_break - cursor) >= 12:
                     cut = next_break
@@ -312,9 +291,113 @@ class MockBedrockClient:
         used: set[int] = set()
         for index in range(tool_count):
             target = int(((index + 1) / (tool_count + 1)) * len(text))
-            ordered = sorted(candidates, key=lambda pos: abs(pos - target))
-            chosen = next((pos for pos in ordered if pos not in used), ordered[0])
+            # min() keeps the first of equally distant candidates, matching a stable sort.
+            unused = [pos for pos in candidates if pos not in used] or candidates
+            chosen = min(unused, key=lambda pos: abs(pos - target))
             anchors.append(chosen)
             used.add(chosen)
 
         return sorted(anchors)
+
+
+def _stream_start_events() -> tuple[dict, ...]:
+    return (
+        {"type": "messageStart", "message": {"role": "assistant"}},
+        {"type": "contentBlockStart", "contentBlockIndex": 0, "start": {"text": ""}},
+    )
+
+
+def _stream_end_events(
+    response: MockResponse,
+    messages: list[dict[str, str]],
+    model_id: str,
+    max_tokens: int,
+    temperature: float,
+) -> tuple[dict, ...]:
+    input_tokens = max(20, sum(len(message.get("content", "")) for message in messages) // 4)
+    output_tokens = max(24, len(response.text) // 4)
+    return (
+        {"type": "contentBlockStop", "contentBlockIndex": 0},
+        {"type": "messageStop", "stopReason": response.stop_reason},
+        {
+            "type": "metadata",
+            "metadata": {
+                "modelId": model_id,
+                "usage": {
+                    "inputTokens": min(input_tokens, max_tokens),
+                    "outputTokens": min(output_tokens, max_tokens),
+                },
+                "temperature": temperature,
+            },
+        },
+    )
+
+
+def response_events(
+    response: MockResponse,
+    messages: list[dict[str, str]],
+    model_id: str,
+    max_tokens: int,
+    temperature: float,
+) -> Iterator[dict]:
+    yield from _stream_start_events()
+
+    for idx, chunk in enumerate(response.chunks):
+        for scheduled in response.tool_schedule.get(idx, []):
+            yield {
+                "type": "contentBlockDelta",
+                "contentBlockIndex": 0,
+                "delta": scheduled,
+            }
+        yield {
+            "type": "contentBlockDelta",
+            "contentBlockIndex": 0,
+            "delta": {"text": chunk},
+        }
+
+    yield from _stream_end_events(response, messages, model_id, max_tokens, temperature)
+
+
+def generate_batch(count: int, seed: int = 0) -> Iterator[MockResponse]:
+    # Response i is exactly what MockBedrockClient(seed=seed + i).converse_stream() would stream.
+    client = MockBedrockClient()
+    for response_seed in range(seed, seed + count):
+        client.seed = response_seed
+        yield client.plan_response(random.Random(response_seed))
+
+
+def write_replay_ndjson(
+    out: TextIO,
+    count: int,
+    seed: int = 0,
+    messages: list[dict[str, str]] | None = None,
+    model_id: str = "anthropic.claude-3-sonnet-mock",
+    max_tokens: int = 1024,
+    temperature: float = 0.7,
+) -> int:
+    history = messages or []
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    start = ",".join(encode(event) for event in _stream_start_events())
+    text_delta = '{"type":"contentBlockDelta","contentBlockIndex":0,"delta":{"text":'
+    tool_delta = '{"type":"contentBlockDelta","contentBlockIndex":0,"delta":'
+    written = 0
+    for response in generate_batch(count, seed):
+        # Same records as response_events(), but only the variable parts go through the encoder.
+        parts = [f'{{"seed":{response.seed},"events":[{start}']
+        for idx, chunk in enumerate(response.chunks):
+            for scheduled in response.tool_schedule.get(idx, ()):
+                parts.append(f",{tool_delta}{encode(scheduled)}}}")
+            parts.append(f",{text_delta}{encode_basestring_ascii(chunk)}}}}}")
+        for event in _stream_end_events(response, history, model_id, max_tokens, temperature):
+            parts.append(f",{encode(event)}")
+        parts.append("]}\n")
+        out.write("".join(parts))
+        written += 1
+    return written
+
+
+def iter_replay_ndjson(lines: Iterable[str]) -> Iterator[tuple[int, list[dict[str, Any]]]]:
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            yield int(record["seed"]), record["events"]
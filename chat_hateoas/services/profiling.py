@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import hmac
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import nullcontext
+from pathlib import Path
+from types import CodeType, FrameType, TracebackType
+from typing import Any, Callable, ContextManager, Iterable, Iterator
+
+from flask import has_request_context, request
+
+ENVIRON_KEY = "chat_hateoas.profile"
+# Admin trigger: a request carrying `X-Profile: <PROFILE_TOKEN>` is always profiled.
+PROFILE_HEADER_ENVIRON = "HTTP_X_PROFILE"
+FORMAT_COLLAPSED = "collapsed"
+FORMAT_SPEEDSCOPE = "speedscope"
+WRITTEN_HISTORY = 32
+
+_labels: dict[CodeType, str] = {}
+
+
+def _frame_label(code: CodeType) -> str:
+    label = _labels.get(code)
+    if label is None:
+        path = Path(code.co_filename)
+        short = "/".join(path.parts[-2:])
+        # `;` separates frames in the collapsed format.
+        label = f"{code.co_qualname} ({short}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+def _stack(frame: FrameType | None) -> tuple[str, ...]:
+    labels: list[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def _sample(
+    targets: list[tuple[RequestProfile, list[int]]],
+) -> list[tuple[RequestProfile, int, tuple[str, ...]]]:
+    # Frame references must not outlive this call: a frame kept alive here would make the
+    # sampler thread the one that finalizes a request's generators, outside its Flask context.
+    frames = sys._current_frames()
+    stacks = []
+    for profile, idents in targets:
+        for ident in idents:
+            frame = frames.get(ident)
+            if frame is not None:
+                stacks.append((profile, ident, _stack(frame)))
+    return stacks
+
+
+class RequestProfile:
+    def __init__(self, profiler: SamplingProfiler, label: str) -> None:
+        self.profiler = profiler
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.started_at = time.time()
+        self.samples: dict[int, Counter[tuple[str, ...]]] = {}
+        self.thread_names: dict[int, str] = {}
+        self._holds = 0
+
+    def hold(self) -> None:
+        with self.profiler._cond:
+            self._holds += 1
+
+    def release(self) -> None:
+        with self.profiler._cond:
+            self._holds -= 1
+            if self._holds > 0:
+                return
+        self.profiler._finish(self)
+
+
+class _Handoff:
+    # Taken in the request thread (so the profile cannot finish first) and entered by the
+    # thread that continues the work, e.g. a stream producer.
+    def __init__(self, profile: RequestProfile) -> None:
+        self.profile = profile
+        profile.hold()
+
+    def __enter__(self) -> None:
+        self.profile.profiler.track(self.profile)
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.profile.profiler.untrack(self.profile)
+        self.profile.release()
+
+
+def handoff() -> ContextManager[None]:
+    profile = request.environ.get(ENVIRON_KEY) if has_request_context() else None
+    if profile is None:
+        return nullcontext()
+    return _Handoff(profile)
+
+
+# One background thread samples every active profile's threads from sys._current_frames();
+# it only runs while at least one profiled request is in flight.
+class SamplingProfiler:
+    def __init__(self, out_dir: Path, interval_s: float, output_format: str) -> None:
+        self.out_dir = out_dir
+        self.interval_s = interval_s
+        self.output_format = output_format
+        # Most recent output paths only, so a long sampling run does not grow it without bound.
+        self.written: deque[Path] = deque(maxlen=WRITTEN_HISTORY)
+        self._active: dict[str, RequestProfile] = {}
+        self._tracked: dict[str, set[int]] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def start(self, label: str) -> RequestProfile:
+        profile = RequestProfile(self, label)
+        profile.hold()
+        with self._cond:
+            self._active[profile.id] = profile
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        self.track(profile)
+        return profile
+
+    def track(self, profile: RequestProfile) -> None:
+        ident = threading.get_ident()
+        with self._cond:
+            profile.samples.setdefault(ident, Counter())
+            profile.thread_names[ident] = threading.current_thread().name
+            self._tracked.setdefault(profile.id, set()).add(ident)
+
+    def untrack(self, profile: RequestProfile) -> None:
+        with self._cond:
+            self._tracked.get(profile.id, set()).discard(threading.get_ident())
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._active:
+                    self._thread = None
+                    return
+                targets = [(self._active[key], list(idents)) for key, idents in self._tracked.items()]
+            # Stacks are walked outside the lock; the counters are only touched under it, so
+            # _finish can snapshot them while other profiles keep sampling.
+            stacks = _sample(targets)
+            with self._cond:
+                for profile, ident, stack in stacks:
+                    profile.samples[ident][stack] += 1
+            time.sleep(self.interval_s)
+
+    def _finish(self, profile: RequestProfile) -> None:
+        with self._cond:
+            self._active.pop(profile.id, None)
+            self._tracked.pop(profile.id, None)
+            samples = {ident: Counter(stacks) for ident, stacks in profile.samples.items()}
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(profile.started_at))
+        slug = "".join(ch if ch.isalnum() else "-" for ch in profile.label).strip("-")[:60]
+        if self.output_format == FORMAT_SPEEDSCOPE:
+            path = self.out_dir / f"{stamp}-{slug}-{profile.id}.speedscope.json"
+            path.write_text(json.dumps(self._speedscope(profile, samples)), encoding="utf-8")
+        else:
+            path = self.out_dir / f"{stamp}-{slug}-{profile.id}.collapsed"
+            path.write_text(self._collapsed(profile, samples), encoding="utf-8")
+        self.written.append(path)
+
+    def _collapsed(self, profile: RequestProfile, samples: dict[int, Counter[tuple[str, ...]]]) -> str:
+        lines = []
+        for ident, stacks in samples.items():
+            root = profile.thread_names[ident].replace(";", ":").replace(" ", "_")
+            for stack, count in stacks.most_common():
+                lines.append(f"{';'.join((root, *stack))} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def _speedscope(
+        self,
+        profile: RequestProfile,
+        samples: dict[int, Counter[tuple[str, ...]]],
+    ) -> dict[str, Any]:
+        frame_index: dict[str, int] = {}
+        profiles = []
+        weight = self.interval_s * 1000
+        for ident, stacks in samples.items():
+            indexed: list[list[int]] = []
+            weights: list[float] = []
+            for stack, count in stacks.items():
+                indexed.append([frame_index.setdefault(label, len(frame_index)) for label in stack])
+                weights.append(count * weight)
+            profiles.append(
+                {
+                    "type": "sampled",
+                    "name": profile.thread_names[ident],
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": indexed,
+                    "weights": weights,
+                }
+            )
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": profile.label,
+            "shared": {"frames": [{"name": label} for label in frame_index]},
+            "profiles": profiles,
+        }
+
+
+class _ProfiledBody:
+    def __init__(self, body: Iterable[bytes], profile: RequestProfile) -> None:
+        self.body = body
+        self.profile = profile
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.body)
+
+    def close(self) -> None:
+        # Streamed bodies (SSE, the streamed index) are iterated after the view returns, so
+        # the profile stays open until the server closes the response.
+        try:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self.profile.profiler.untrack(self.profile)
+            self.profile.release()
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        wsgi_app: Callable[..., Any],
+        profiler: SamplingProfiler,
+        sample_rate: float,
+        token: str,
+    ) -> None:
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.token = token
+
+    def _selected(self, environ: dict[str, Any]) -> bool:
+        requested = environ.get(PROFILE_HEADER_ENVIRON)
+        # compare_digest rejects non-ASCII str, which a client controls through the header.
+        if requested and self.token and hmac.compare_digest(
+            requested.encode("utf-8", "surrogatepass"),
+            self.token.encode("utf-8", "surrogatepass"),
+        ):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ: dict[str, Any], start_response: Callable[..., Any]) -> Any:
+        if not self._selected(environ):
+            return self.wsgi_app(environ, start_response)
+
+        profile = self.profiler.start(f"{environ.get('REQUEST_METHOD', '')} {environ.get('PATH_INFO', '')}")
+        environ[ENVIRON_KEY] = profile
+
+        def profiled_start_response(status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> Any:
+            headers.append(("X-Profile-Id", profile.id))
+            return start_response(status, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, profiled_start_response)
+        except BaseException:
+            self.profiler.untrack(profile)
+            profile.release()
+            raise
+        return _ProfiledBody(body, profile)
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    sample_rate = float(app.config.get("PROFILE_SAMPLE_RATE", 0))
+    token = str(app.config.get("PROFILE_TOKEN") or "")
+    if sample_rate <= 0 and not token:
+        # Disabled means not installed: no per-request cost at all.
+        return
+    profiler = SamplingProfiler(
+        out_dir=Path(app.config.get("PROFILE_DIR") or Path(app.instance_path) / "profiles"),
+        interval_s=max(1, int(app.config.get("PROFILE_INTERVAL_MS", 5))) / 1000.0,
+        output_format=str(app.config.get("PROFILE_FORMAT", FORMAT_COLLAPSED)),
+    )
+    app.extensions["profiler"] = profiler
+    app.wsgi_app = ProfilingMiddleware(app.wsgi_app, profiler, sample_rate, token)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Iterator, Protocol
+
+from flask import current_app
+
+PROVIDER_MOCK = "mock"
+PROVIDER_BEDROCK = "bedrock"
+
+
+class StreamProvider(Protocol):
+    provider_name: str
+
+    def converse_stream(
+        self,
+        messages: list[dict[str, str]],
+        model_id: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> Iterator[dict]: ...
+
+
+def provider_kind() -> str:
+    return str(current_app.config.get("PROVIDER", PROVIDER_MOCK))
+
+
+def bedrock_pool():  # type: ignore[no-untyped-def]
+    from chat_hateoas.services.bedrock_stream import ConnectionPool
+
+    pool = current_app.extensions.get("bedrock_pool")
+    if pool is None:
+        endpoint = str(current_app.config.get("BEDROCK_ENDPOINT") or "")
+        region = str(current_app.config.get("BEDROCK_REGION", "us-east-1"))
+        pool = ConnectionPool(
+            endpoint or f"https://bedrock-runtime.{region}.amazonaws.com",
+            max_idle=int(current_app.config.get("BEDROCK_POOL_SIZE", 8)),
+            timeout_s=float(current_app.config.get("BEDROCK_TIMEOUT_S", 60)),
+        )
+        current_app.extensions["bedrock_pool"] = pool
+    return pool
+
+
+def get_provider(seed: int) -> StreamProvider:
+    kind = provider_kind()
+    if kind == PROVIDER_MOCK:
+        from chat_hateoas.services.mock_bedrock import MockBedrockClient
+
+        return MockBedrockClient(seed=seed)
+    if kind == PROVIDER_BEDROCK:
+        from chat_hateoas.services.bedrock_stream import AwsCredentials, BedrockStreamClient
+
+        return BedrockStreamClient(
+            pool=bedrock_pool(),
+            region=str(current_app.config.get("BEDROCK_REGION", "us-east-1")),
+            credentials=AwsCredentials.from_env(),
+        )
+    raise ValueError(f"unknown PROVIDER {kind!r}")
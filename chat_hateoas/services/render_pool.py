@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+from chat_hateoas.services.transform import RENDERER_VERSION, render_assistant_html
+
+
+def render_key(raw_text: str, message_id: int, action_url: str) -> bytes:
+    digest = hashlib.blake2b(f"{RENDERER_VERSION}\0{message_id}\0{action_url}\0".encode(), digest_size=16)
+    digest.update(raw_text.encode("utf-8", "surrogatepass"))
+    return digest.digest()
+
+
+# Renders at or above `min_chars` run in worker processes, so a very long answer re-rendered on
+# every streamed delta no longer holds this worker's GIL while other streams wait for it. The
+# request thread just blocks on the future; smaller messages keep the in-thread path.
+class RenderPool:
+    def __init__(self, min_chars: int, workers: int, memo_size: int) -> None:
+        self.min_chars = min_chars
+        self.workers = workers
+        self.memo_size = memo_size
+        self.rendered_inline = 0
+        self.rendered_offloaded = 0
+        self.memo_hits = 0
+        self.pool_failures = 0
+        self._memo: OrderedDict[bytes, str] = OrderedDict()
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the parent has stream, sampler and warmer threads running.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def render(self, raw_text: str, message_id: int, action_url: str) -> str:
+        if self.workers <= 0 or len(raw_text) < self.min_chars:
+            with self._lock:
+                self.rendered_inline += 1
+            return render_assistant_html(raw_text, message_id, action_url=action_url)
+
+        key = render_key(raw_text, message_id, action_url)
+        with self._lock:
+            html = self._memo.get(key)
+            if html is not None:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return html
+
+        try:
+            html = self._pool().submit(render_assistant_html, raw_text, message_id, action_url).result()
+        except BrokenProcessPool:
+            current_app.logger.exception("render pool failed; rendering message %s inline", message_id)
+            with self._lock:
+                self.pool_failures += 1
+                self._executor = None
+            html = render_assistant_html(raw_text, message_id, action_url=action_url)
+
+        with self._lock:
+            self.rendered_offloaded += 1
+            if self.memo_size > 0:
+                self._memo[key] = html
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        return html
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "min_chars": self.min_chars,
+                "workers": self.workers,
+                "rendered_inline": self.rendered_inline,
+                "rendered_offloaded": self.rendered_offloaded,
+                "memo_hits": self.memo_hits,
+                "memo_entries": len(self._memo),
+                "pool_failures": self.pool_failures,
+            }
+
+
+def _render_pool() -> RenderPool | None:
+    return current_app.extensions.get("render_pool")
+
+
+def render_assistant(raw_text: str, message_id: int, action_url: str) -> str:
+    pool = _render_pool()
+    if pool is None:
+        return render_assistant_html(raw_text, message_id, action_url=action_url)
+    return pool.render(raw_text, message_id, action_url)
+
+
+def init_app(app) -> None:  # type: ignore[no-untyped-def]
+    workers = int(app.config.get("RENDER_POOL_WORKERS", 2))
+    if workers <= 0:
+        return
+    app.extensions["render_pool"] = RenderPool(
+        min_chars=int(app.config.get("RENDER_OFFLOAD_MIN_CHARS", 20_000)),
+        workers=workers,
+        memo_size=int(app.config.get("RENDER_MEMO_SIZE", 64)),
+    )
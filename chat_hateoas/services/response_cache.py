@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from chat_hateoas.services.providers import StreamProvider
+
+REPLAY_PROVIDER_NAME = "response-cache"
+
+
+def response_cache_key(
+    provider: str,
+    history: list[dict[str, str]],
+    model_id: str,
+    max_tokens: int,
+    temperature: float,
+) -> str:
+    material = json.dumps(
+        [provider, [[turn["role"], turn["content"]] for turn in history], model_id, max_tokens, temperature],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class CachedResponse:
+    # Stored serialized so every replay gets fresh dicts and the entry size is exact.
+    payload: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.payload)
+
+    def events(self) -> list[dict[str, Any]]:
+        return json.loads(self.payload)
+
+
+# LRU of completed provider event sequences, bounded by entry count, total payload bytes and
+# per-entry TTL.
+class ResponseCache:
+    def __init__(self, max_entries: int, max_bytes: int, ttl_s: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._bytes = 0
+        self._entries: OrderedDict[str, tuple[float, CachedResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += entry[1].size
+            return entry[1]
+
+    def put(self, key: str, response: CachedResponse) -> None:
+        if self.max_entries <= 0 or response.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_s, response)
+            self._bytes += response.size
+            self.stores += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, response = self._entries.pop(key)
+        self._bytes -= response.size
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+class ReplayProvider:
+    provider_name = REPLAY_PROVIDER_NAME
+
+    def __init__(self, cached: CachedResponse) -> None:
+        self.cached = cached
+
+    def converse_stream(
+        self,
+        messages: list[dict[str, str]],
+        model_id: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> Iterator[dict]:
+        yield from self.cached.events()
+
+
+class RecordingProvider:
+    def __init__(self, inner: StreamProvider, cache: ResponseCache, key: str) -> None:
+        self.inner = inner
+        self.cache = cache
+        self.key = key
+        self.provider_name = inner.provider_name
+
+    def converse_stream(
+        self,
+        messages: list[dict[str, str]],
+        model_id: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> Iterator[dict]:
+        recorded: list[dict] = []
+        for event in self.inner.converse_stream(messages, model_id, max_tokens, temperature):
+            recorded.append(event)
+            yield event
+        # Only streams that ran to completion are stored; cancelled or failed ones never get here.
+        self.cache.put(self.key, CachedResponse(json.dumps(recorded, separators=(",", ":")).encode("utf-8")))
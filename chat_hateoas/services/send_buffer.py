@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field, fields
+from typing import Iterator
+
+POLICY_COALESCE = "coalesce"
+POLICY_DISCONNECT = "disconnect"
+
+COALESCED_EVENT = "ui_delta"
+ESSENTIAL_EVENTS = {"ui_delta", "ui_done", "action_done"}
+
+
+def sse_event(event_name: str, data: str) -> str:
+    lines = data.splitlines() or [""]
+    payload = [f"event: {event_name}"]
+    payload.extend(f"data: {line}" for line in lines)
+    payload.append("")
+    return "\n".join(payload) + "\n"
+
+
+def sse_event_name(frame: str) -> str:
+    if frame.startswith("event: "):
+        return frame[len("event: ") : frame.find("\n")]
+    return ""
+
+
+@dataclass(slots=True)
+class StreamMetrics:
+    events_sent: int = 0
+    heartbeats_sent: int = 0
+    streams_cancelled: int = 0
+    deltas_coalesced: int = 0
+    events_dropped: int = 0
+    slow_disconnects: int = 0
+    max_buffer_depth: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **deltas: int) -> None:
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def observe_depth(self, depth: int) -> None:
+        with self._lock:
+            if depth > self.max_buffer_depth:
+                self.max_buffer_depth = depth
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {item.name: getattr(self, item.name) for item in fields(self) if item.name != "_lock"}
+
+
+# Bounded per-stream queue between the generation thread and the SSE response. When it is
+# full, a queued ui_delta is superseded by the next one (each carries the full rendered
+# message) and non-essential frames (raw Bedrock and debug events) are shed.
+class SendBuffer:
+    def __init__(
+        self,
+        max_events: int,
+        policy: str,
+        metrics: StreamMetrics,
+        grace_s: float = 0.0,
+    ) -> None:
+        self.max_events = max(1, max_events)
+        self.policy = policy
+        self.grace_s = grace_s
+        self.metrics = metrics
+        self.disconnected = False
+        self.cancelled = threading.Event()
+        self._frames: deque[tuple[str, str, str]] = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, frame: str, channel: str = "") -> bool:
+        # `channel` scopes coalescing when several messages share one buffer (multiplexed tabs).
+        name = sse_event_name(frame)
+        with self._cond:
+            if self.disconnected:
+                return False
+
+            if len(self._frames) >= self.max_events and self.grace_s > 0:
+                # Brief backpressure on the producer first; only a reader that stays behind is slow.
+                self._cond.wait_for(
+                    lambda: len(self._frames) < self.max_events or self.disconnected,
+                    timeout=self.grace_s,
+                )
+                if self.disconnected:
+                    return False
+
+            if len(self._frames) >= self.max_events:
+                if self.policy == POLICY_DISCONNECT:
+                    self.disconnected = True
+                    self._frames.clear()
+                    self.metrics.add(slow_disconnects=1)
+                    self._cond.notify_all()
+                    return False
+                if name == COALESCED_EVENT:
+                    superseded = [
+                        item for item in self._frames if item[0] == COALESCED_EVENT and item[1] == channel
+                    ]
+                    for item in superseded:
+                        self._frames.remove(item)
+                    self.metrics.add(deltas_coalesced=len(superseded))
+                if len(self._frames) >= self.max_events:
+                    if name not in ESSENTIAL_EVENTS:
+                        self.metrics.add(events_dropped=1)
+                        return True
+                    for index, (queued_name, _, _) in enumerate(self._frames):
+                        if queued_name not in ESSENTIAL_EVENTS:
+                            del self._frames[index]
+                            self.metrics.add(events_dropped=1)
+                            break
+
+            self._frames.append((name, channel, frame))
+            self.metrics.observe_depth(len(self._frames))
+            self._cond.notify_all()
+            return True
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def disconnect(self) -> None:
+        with self._cond:
+            self.disconnected = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+    def next_frame(self, timeout: float | None = None) -> str | None:
+        with self._cond:
+            if not self._frames and not self._closed and not self.disconnected:
+                self._cond.wait(timeout)
+            if self._frames and not self.disconnected:
+                _, _, frame = self._frames.popleft()
+                self.metrics.add(events_sent=1)
+                self._cond.notify_all()
+                return frame
+            if self._closed or self.disconnected:
+                raise StopIteration
+            return None
+
+    def drain(self, heartbeat_s: float | None = None) -> Iterator[str]:
+        try:
+            while True:
+                try:
+                    frame = self.next_frame(timeout=heartbeat_s)
+                except StopIteration:
+                    return
+                if frame is None:
+                    # SSE comment: keeps proxies from idling out and surfaces dead sockets on write.
+                    self.metrics.add(heartbeats_sent=1)
+                    yield ": keepalive\n\n"
+                    continue
+                yield frame
+        finally:
+            with self._cond:
+                # The reader left while the producer was still running and not because of the
+                # slow-client policy: nobody is listening, so ask the producer to stop.
+                if not self._closed and not self.disconnected:
+                    self.cancelled.set()
+            self.disconnect()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import threading
+
+from chat_hateoas.services.send_buffer import SendBuffer
+
+MAX_TAB_ID_LENGTH = 64
+
+
+def valid_tab_id(tab_id: str | None) -> bool:
+    return bool(tab_id) and len(tab_id) <= MAX_TAB_ID_LENGTH and tab_id.isascii() and tab_id.isalnum()
+
+
+# One SendBuffer per open tab connection. Every message the tab subscribes to is produced into
+# that buffer (on its own channel), so the browser holds a single EventSource however many
+# assistant messages are streaming.
+class TabStreams:
+    def __init__(self, max_open: int) -> None:
+        self.max_open = max_open
+        self.connections_total = 0
+        self.rejected_total = 0
+        self.messages_multiplexed = 0
+        self._buffers: dict[str, SendBuffer] = {}
+        self._lock = threading.Lock()
+
+    def connect(self, tab_id: str, buffer: SendBuffer) -> bool:
+        with self._lock:
+            previous = self._buffers.get(tab_id)
+            if previous is None and len(self._buffers) >= self.max_open:
+                self.rejected_total += 1
+                return False
+            self._buffers[tab_id] = buffer
+            self.connections_total += 1
+        if previous is not None:
+            # A reconnect supersedes the old connection; producers bound to it stop with it.
+            previous.cancelled.set()
+            previous.disconnect()
+        return True
+
+    def disconnect(self, tab_id: str, buffer: SendBuffer) -> None:
+        with self._lock:
+            if self._buffers.get(tab_id) is buffer:
+                del self._buffers[tab_id]
+
+    def get(self, tab_id: str) -> SendBuffer | None:
+        with self._lock:
+            buffer = self._buffers.get(tab_id)
+        if buffer is None or buffer.disconnected:
+            return None
+        return buffer
+
+    def subscribed(self) -> None:
+        with self._lock:
+            self.messages_multiplexed += 1
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "open": len(self._buffers),
+                "max_open": self.max_open,
+                "connections_total": self.connections_total,
+                "rejected_total": self.rejected_total,
+                "messages_multiplexed": self.messages_multiplexed,
+            }
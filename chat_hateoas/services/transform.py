@@ -3,12 +3,19 @@ from __future__ import annotations
 import json
 import re
 from dataclasses import dataclass
+from functools import partial
 from html import escape
+from typing import Callable, Iterator
 from urllib.parse import urlparse
 
 BUTTON_PATTERN = re.compile(r"\[\[button:([^|\]]+)\|([A-Za-z0-9_./:-]+)\]\]")
-TOKEN_PATTERN = re.compile(r"\[\[(button:[^]]+|tool_status:[^]]+)\]\]")
+CONTROL_TOKEN_START_PATTERN = re.compile(r"\[\[(button:|tool_status:)")
 TOOL_KEYS = {"toolUse", "toolResult"}
+# Bump whenever the HTML produced for the same raw_text changes so stored/cached HTML is re-rendered.
+RENDERER_VERSION = 2
+# Longer assistant messages are shown as escaped plain text instead of being parsed; every
+# streamed delta re-renders the whole message, so this also bounds per-delta work.
+MARKDOWN_MAX_CHARS = 100_000
 
 
 @dataclass(slots=True)
@@ -30,74 +37,165 @@ class ToolStatusSegment:
     label: str
 
 
-INLINE_CODE_PATTERN = re.compile(r"`([^`\n]+)`")
-LINK_PATTERN = re.compile(r"\[([^\]]+)\]\((https?://[^\s)]+)\)")
-BOLD_PATTERN = re.compile(r"\*\*(.+?)\*\*")
-ITALIC_PATTERN = re.compile(r"(?<!\*)\*(?!\*)(.+?)(?<!\*)\*(?!\*)")
 HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*)$")
 LIST_PATTERN = re.compile(r"^\s*[-*]\s+(.*)$")
+LONE_STAR_PATTERN = re.compile(r"(?<!\*)\*(?!\*)")
+URL_END_PATTERN = re.compile(r"[\s)\x00]")
+# Marks an already-rendered span while later inline passes run. render_markdown_html replaces
+# input NULs first (browsers never render them anyway), so message text cannot forge one.
+_STASH = "\x00"
 
+_Span = tuple[int, int, Callable[[Callable[[int, int], str]], str]]
+
+
+class _Finder:
+    # Next occurrence at or after `pos`. The inline scanners only ask for growing positions, so
+    # a found index is reused until the scan passes it and each character is searched once;
+    # re-searching from every failed opener is what made the old regexes quadratic.
+    __slots__ = ("_find", "_pos", "_found")
+
+    def __init__(self, text: str, needle: str | re.Pattern[str]) -> None:
+        if isinstance(needle, str):
+            self._find: Callable[[int], int] = partial(text.find, needle)
+        else:
+            self._find = lambda pos: match.start() if (match := needle.search(text, pos)) else -1
+        self._pos = 0
+        self._found: int | None = None
+
+    def at(self, pos: int) -> int:
+        found = self._found
+        if found is None or pos < self._pos or -1 < found < pos:
+            found = self._found = self._find(pos)
+            self._pos = pos
+        return found
+
+
+def _code_spans(text: str) -> Iterator[_Span]:
+    # `code`: no backticks or newlines inside, at least one character.
+    start = text.find("`")
+    while start != -1:
+        end = text.find("`", start + 1)
+        if end == -1:
+            return
+        if end > start + 1 and "\n" not in text[start + 1 : end]:
+            yield start, end + 1, lambda expand, a=start + 1, b=end: f"<code>{expand(a, b)}</code>"
+            start = text.find("`", end + 1)
+        else:
+            start = end
+
+
+def _link_spans(text: str) -> Iterator[_Span]:
+    # [label](http(s)://url): the label runs to the first `]`, the url to whitespace or `)`.
+    closes = _Finder(text, "]")
+    url_ends = _Finder(text, URL_END_PATTERN)
+    start = text.find("[")
+    while start != -1:
+        close = closes.at(start + 1)
+        if close == -1:
+            return
+        url_start = close + 2
+        scheme = "https://" if text.startswith("https://", url_start) else "http://"
+        if close > start + 1 and text.startswith("(", close + 1) and text.startswith(scheme, url_start):
+            url_end = url_ends.at(url_start + len(scheme))
+            if url_end > url_start + len(scheme) and text[url_end] == ")":
+                url = text[url_start:url_end]
+                if _is_safe_http_url(url):
+                    yield start, url_end + 1, lambda expand, a=start + 1, b=close, url=url: (
+                        f"<a href=\"{escape(url, quote=True)}\" target=\"_blank\" rel=\"noopener noreferrer\">"
+                        f"{expand(a, b)}</a>"
+                    )
+                else:
+                    yield start, url_end + 1, lambda expand, a=start, b=url_end + 1: expand(a, b)
+                start = text.find("[", url_end + 1)
+                continue
+        start = text.find("[", start + 1)
+
+
+def _bold_spans(text: str) -> Iterator[_Span]:
+    # **bold**: the nearest closing `**` on the same line, at least one character inside.
+    closes = _Finder(text, "**")
+    newlines = _Finder(text, "\n")
+    start = text.find("**")
+    while start != -1:
+        end = closes.at(start + 3)
+        if end == -1:
+            return
+        newline = newlines.at(start + 2)
+        if newline == -1 or newline >= end:
+            yield start, end + 2, lambda expand, a=start + 2, b=end: f"<strong>{expand(a, b)}</strong>"
+            start = text.find("**", end + 2)
+        else:
+            start = text.find("**", start + 1)
+
+
+def _italic_spans(text: str) -> Iterator[_Span]:
+    # *italic*: single stars (not part of `**`) on the same line, at least one character inside.
+    stars = _Finder(text, LONE_STAR_PATTERN)
+    newlines = _Finder(text, "\n")
+    start = stars.at(0)
+    while start != -1:
+        end = stars.at(start + 2)
+        if end == -1:
+            return
+        newline = newlines.at(start + 1)
+        if newline == -1 or newline >= end:
+            yield start, end + 1, lambda expand, a=start + 1, b=end: f"<em>{expand(a, b)}</em>"
+            start = stars.at(end + 1)
+        else:
+            start = end
 
-def _tokenize_pattern(
-    text: str,
-    pattern: re.Pattern[str],
-    render_match,
-    stash,
-) -> str:
-    def _replace(match: re.Match[str]) -> str:
-        return stash(render_match(match))
 
-    return pattern.sub(_replace, text)
+def _stash_spans(text: str, tokens: list[str], spans: Iterator[_Span]) -> tuple[str, list[str]]:
+    # Replaces each span with one marker and its rendered HTML. Markers already inside a span
+    # (e.g. code inside bold) are expanded into that span's HTML, in order.
+    pieces: list[str] = []
+    stashed: list[str] = []
+    cursor = 0
+    consumed = 0
+
+    def expand(start: int, end: int) -> str:
+        nonlocal consumed
+        parts = escape(text[start:end]).split(_STASH)
+        for index in range(1, len(parts)):
+            parts[index] = tokens[consumed] + parts[index]
+            consumed += 1
+        return "".join(parts)
+
+    for start, end, render in spans:
+        between = text.count(_STASH, cursor, start)
+        stashed.extend(tokens[consumed : consumed + between])
+        consumed += between
+        pieces.append(text[cursor:start])
+        pieces.append(_STASH)
+        stashed.append(render(expand))
+        cursor = end
+
+    if not pieces:
+        return text, tokens
+    pieces.append(text[cursor:])
+    stashed.extend(tokens[consumed:])
+    return "".join(pieces), stashed
 
 
 def _is_safe_http_url(candidate: str) -> bool:
-    parsed = urlparse(candidate)
+    try:
+        parsed = urlparse(candidate)
+    except ValueError:  # e.g. an unbalanced "[" in the host
+        return False
     return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
 
 
 def _render_inline_markdown(text: str) -> str:
+    # Same passes and precedence as before (code, links, bold, italic), but each one is a
+    # single forward scan, so pathological input costs linear time.
     tokens: list[str] = []
+    for spans in (_code_spans, _link_spans, _bold_spans, _italic_spans):
+        text, tokens = _stash_spans(text, tokens, spans(text))
 
-    def stash(html: str) -> str:
-        token = f"@@MDTOK{len(tokens)}@@"
-        tokens.append(html)
-        return token
-
-    transformed = text
-    transformed = _tokenize_pattern(
-        transformed,
-        INLINE_CODE_PATTERN,
-        lambda m: f"<code>{escape(m.group(1))}</code>",
-        stash,
-    )
-    transformed = _tokenize_pattern(
-        transformed,
-        LINK_PATTERN,
-        lambda m: (
-            f"<a href=\"{escape(m.group(2), quote=True)}\" target=\"_blank\" rel=\"noopener noreferrer\">"
-            f"{escape(m.group(1))}</a>"
-            if _is_safe_http_url(m.group(2))
-            else escape(m.group(0))
-        ),
-        stash,
-    )
-    transformed = _tokenize_pattern(
-        transformed,
-        BOLD_PATTERN,
-        lambda m: f"<strong>{escape(m.group(1))}</strong>",
-        stash,
-    )
-    transformed = _tokenize_pattern(
-        transformed,
-        ITALIC_PATTERN,
-        lambda m: f"<em>{escape(m.group(1))}</em>",
-        stash,
-    )
-
-    escaped_body = escape(transformed)
-    for idx, html in enumerate(tokens):
-        escaped_body = escaped_body.replace(f"@@MDTOK{idx}@@", html)
-    return escaped_body
+    parts = escape(text).split(_STASH)
+    for index in range(1, len(parts)):
+        parts[index] = tokens[index - 1] + parts[index]
+    return "".join(parts)
 
 
 def _flush_paragraph(output: list[str], paragraph_lines: list[str]) -> None:
@@ -110,7 +208,7 @@ def _flush_paragraph(output: list[str], paragraph_lines: list[str]) -> None:
 
 
 def render_markdown_html(raw_text: str) -> str:
-    lines = raw_text.splitlines()
+    lines = raw_text.replace(_STASH, "\ufffd").splitlines()
     output: list[str] = []
     paragraph_lines: list[str] = []
     in_list = False
@@ -242,11 +340,27 @@ def _parse_control_token(token: str) -> ButtonSegment | ToolStatusSegment | None
     return None
 
 
+def _control_tokens(raw_text: str) -> Iterator[tuple[int, int, str]]:
+    # [[button:...]] / [[tool_status:...]]: the body runs to the first `]`, which must start `]]`.
+    closes = _Finder(raw_text, "]")
+    opener = CONTROL_TOKEN_START_PATTERN.search(raw_text)
+    while opener is not None:
+        start, body_start = opener.start(), opener.end()
+        close = closes.at(body_start)
+        if close == -1:
+            return
+        if close > body_start and raw_text.startswith("]]", close):
+            yield start, close + 2, raw_text[start + 2 : close]
+            opener = CONTROL_TOKEN_START_PATTERN.search(raw_text, close + 2)
+        else:
+            opener = CONTROL_TOKEN_START_PATTERN.search(raw_text, start + 1)
+
+
 def parse_segments(raw_text: str) -> list[Segment | ButtonSegment | ToolStatusSegment]:
     segments: list[Segment | ButtonSegment | ToolStatusSegment] = []
     cursor = 0
-    for match in TOKEN_PATTERN.finditer(raw_text):
-        before = raw_text[cursor : match.start()]
+    for start, end, token in _control_tokens(raw_text):
+        before = raw_text[cursor:start]
         before_segments = _parse_text_tool_lines(before)
         for item in before_segments:
             if item.kind == "text":
@@ -254,13 +368,13 @@ def parse_segments(raw_text: str) -> list[Segment | ButtonSegment | ToolStatusSe
             else:
                 segments.append(item)
 
-        parsed_token = _parse_control_token(match.group(1))
+        parsed_token = _parse_control_token(token)
         if parsed_token is not None:
             segments.append(parsed_token)
         else:
-            _append_text(segments, match.group(0))
+            _append_text(segments, raw_text[start:end])
 
-        cursor = match.end()
+        cursor = end
 
     tail = raw_text[cursor:]
     for item in _parse_text_tool_lines(tail):
@@ -277,6 +391,10 @@ def render_assistant_html(
     message_id: int,
     action_url: str = "/actions/fake",
 ) -> str:
+    raw_text = raw_text.replace(_STASH, "\ufffd")
+    if len(raw_text) > MARKDOWN_MAX_CHARS:
+        return f"<p class=\"plain-text\">{render_user_html(raw_text)}</p>"
+
     output: list[str] = []
     saw_action = False
 
@@ -0,0 +1,208 @@
+document.addEventListener("alpine:init", () => {
+  Alpine.data("chatThread", () => ({
+    pending: false,
+    shouldStickToBottom: true,
+    debugPanelEnabled: false,
+    messageObserver: null,
+    init() {
+      const threshold = 120;
+      const getList = () => this.$refs.messages;
+      const debugDefault = document.body.dataset.debugSse === "1";
+
+      this.persistDebugPanel = () => {
+        window.localStorage.setItem("chat_debug_sse", this.debugPanelEnabled ? "1" : "0");
+      };
+
+      const storedDebug = window.localStorage.getItem("chat_debug_sse");
+      if (storedDebug === "1" || storedDebug === "0") {
+        this.debugPanelEnabled = storedDebug === "1";
+      } else {
+        this.debugPanelEnabled = debugDefault;
+      }
+
+      const isNearBottom = () => {
+        const list = getList();
+        if (!list) return true;
+        return list.scrollHeight - list.scrollTop - list.clientHeight < threshold;
+      };
+
+      const scrollBottom = () => {
+        const list = getList();
+        if (!list) return;
+        if (this.shouldStickToBottom || list.dataset.forceScroll === "1") {
+          list.scrollTop = list.scrollHeight;
+          list.dataset.forceScroll = "0";
+        }
+      };
+
+      const bindScrollTracking = () => {
+        const list = getList();
+        if (!list || list.dataset.scrollBound === "1") return;
+        list.dataset.scrollBound = "1";
+        list.addEventListener("scroll", () => {
+          this.shouldStickToBottom = isNearBottom();
+        });
+      };
+
+      const bindMutationObserver = () => {
+        const list = getList();
+        if (!list) return;
+
+        if (this.messageObserver) {
+          this.messageObserver.disconnect();
+        }
+
+        this.messageObserver = new MutationObserver(() => {
+          if (this.shouldStickToBottom) {
+            list.dataset.forceScroll = "1";
+            this.$nextTick(scrollBottom);
+          }
+        });
+
+        this.messageObserver.observe(list, {
+          childList: true,
+          subtree: true,
+          characterData: true,
+        });
+      };
+
+      this.handleAfterSwap = (event) => {
+        const target = event.detail && event.detail.target;
+        if (!target) return;
+
+        if (target.id === "messages" || String(target.id || "").startsWith("stream-target-")) {
+          const list = getList();
+          if (list && this.shouldStickToBottom) {
+            list.dataset.forceScroll = "1";
+          }
+          bindScrollTracking();
+          bindMutationObserver();
+          this.$nextTick(scrollBottom);
+        }
+      };
+
+      this.handleSSEMessage = (event) => {
+        const elt = event.detail && event.detail.elt;
+        if (!elt) return;
+        if (elt.id !== "stream-mux" && !String(elt.id || "").startsWith("stream-target-")) return;
+
+        const list = getList();
+        if (list && this.shouldStickToBottom) {
+          list.dataset.forceScroll = "1";
+          this.$nextTick(scrollBottom);
+        }
+      };
+
+      this.handleBeforeRequest = (event) => {
+        if (event.target && event.target.id === "composer-form") {
+          this.pending = true;
+          this.shouldStickToBottom = true;
+        }
+      };
+
+      this.handleAfterRequest = (event) => {
+        if (event.target && event.target.id === "composer-form") {
+          this.pending = false;
+          const input = document.getElementById("composer-input");
+          if (input) input.value = "";
+        }
+      };
+
+      this.$nextTick(() => {
+        const list = getList();
+        if (list) {
+          list.dataset.forceScroll = "1";
+        }
+        bindScrollTracking();
+        bindMutationObserver();
+        scrollBottom();
+      });
+
+      window.__chatThreadActive = this;
+      if (!window.__chatThreadHandlersBound) {
+        window.__chatThreadHandlersBound = true;
+
+        document.body.addEventListener("htmx:afterSwap", (event) => {
+          const active = window.__chatThreadActive;
+          if (active && active.handleAfterSwap) active.handleAfterSwap(event);
+        });
+
+        document.body.addEventListener("htmx:sseMessage", (event) => {
+          const active = window.__chatThreadActive;
+          if (active && active.handleSSEMessage) active.handleSSEMessage(event);
+        });
+
+        document.body.addEventListener("htmx:beforeRequest", (event) => {
+          const active = window.__chatThreadActive;
+          if (active && active.handleBeforeRequest) active.handleBeforeRequest(event);
+        });
+
+        document.body.addEventListener("htmx:afterRequest", (event) => {
+          const active = window.__chatThreadActive;
+          if (active && active.handleAfterRequest) active.handleAfterRequest(event);
+        });
+      }
+    },
+  }));
+});
+
+(() => {
+  const ttlMs = Number(document.body.dataset.prefetchTtlS || 0) * 1000;
+  const prefetchedAt = new Map();
+  // Opt-in via localStorage "chat_debug_timings" = "1"; keeps only the latest switches.
+  const switchTimings = window.localStorage.getItem("chat_debug_timings") === "1" ? [] : null;
+  if (switchTimings) window.__chatSwitchTimings = switchTimings;
+  let hoverTimer = null;
+  let switchStart = null;
+
+  const prefetch = (link) => {
+    const url = link && link.getAttribute("hx-get");
+    if (!url || ttlMs <= 0 || link.closest(".conversation-row.active")) return;
+    const last = prefetchedAt.get(url);
+    if (last && performance.now() - last < ttlMs) return;
+    prefetchedAt.set(url, performance.now());
+    // Same URL and HX-Request header as the htmx click, so the browser cache answers it.
+    fetch(url, {
+      headers: { "HX-Request": "true" },
+      credentials: "same-origin",
+      priority: "low",
+    }).catch(() => prefetchedAt.delete(url));
+  };
+
+  const prefetchNeighbours = () => {
+    const rows = Array.from(document.querySelectorAll(".conversation-row"));
+    const active = rows.findIndex((row) => row.classList.contains("active"));
+    if (active < 0) return;
+    [rows[active - 1], rows[active + 1]].forEach((row) => {
+      if (row) prefetch(row.querySelector(".conversation-link"));
+    });
+  };
+  const whenIdle = window.requestIdleCallback || ((callback) => setTimeout(callback, 200));
+
+  const linkFrom = (event) => event.target.closest && event.target.closest(".conversation-link");
+  document.addEventListener("mouseover", (event) => {
+    const link = linkFrom(event);
+    if (!link) return;
+    clearTimeout(hoverTimer);
+    hoverTimer = setTimeout(() => prefetch(link), 65);
+  });
+  document.addEventListener("focusin", (event) => prefetch(linkFrom(event)));
+
+  document.body.addEventListener("htmx:beforeRequest", (event) => {
+    if (event.target.classList && event.target.classList.contains("conversation-link")) {
+      switchStart = performance.now();
+    }
+  });
+  document.body.addEventListener("htmx:afterSettle", (event) => {
+    if (switchStart === null || !event.detail || event.detail.target.id !== "thread-panel") return;
+    const elapsed = performance.now() - switchStart;
+    switchStart = null;
+    if (switchTimings) {
+      switchTimings.push(elapsed);
+      if (switchTimings.length > 50) switchTimings.shift();
+    }
+    whenIdle(prefetchNeighbours);
+  });
+
+  whenIdle(prefetchNeighbours);
+})();
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import time
+from typing import Callable
+
 import pytest
 
-from chat_hateoas import create_app
+from chat_hateoas import create_app, db
 
 
 @pytest.fixture()
@@ -19,6 +22,7 @@ def app(tmp_path):
             "STREAM_DELAY_MIN_MS": 0,
             "STREAM_DELAY_MAX_MS": 0,
             "TOOL_CALL_DELAY_MS": 0,
+            "ACTION_DELAY_MS": 0,
             "DEBUG_SSE_STREAM": False,
         }
     )
@@ -28,3 +32,45 @@ def app(tmp_path):
 @pytest.fixture()
 def client(app):
     return app.test_client()
+
+
+@pytest.fixture()
+def streaming_assistant(app) -> Callable[..., int]:
+    def create(title: str = "Streaming", prompt: str = "hello") -> int:
+        with app.app_context():
+            conversation_id = db.create_conversation(title)
+            db.create_message(conversation_id, "user", prompt, prompt)
+            return db.create_message(conversation_id, "assistant", "", "", status="streaming")
+
+    return create
+
+
+def _frames(response):  # type: ignore[no-untyped-def]
+    for chunk in response.response:
+        yield chunk.decode() if isinstance(chunk, bytes) else chunk
+
+
+@pytest.fixture()
+def read_slowly() -> Callable[..., list[str]]:
+    def read(response, delay_s: float) -> list[str]:  # type: ignore[no-untyped-def]
+        frames: list[str] = []
+        for frame in _frames(response):
+            frames.append(frame)
+            time.sleep(delay_s)
+        response.close()
+        return frames
+
+    return read
+
+
+@pytest.fixture()
+def read_until_done() -> Callable[..., list[str]]:
+    def read(response, count: int) -> list[str]:  # type: ignore[no-untyped-def]
+        frames: list[str] = []
+        for frame in _frames(response):
+            frames.append(frame)
+            if sum(frame.startswith("event: ui_done") for frame in frames) == count:
+                break
+        return frames
+
+    return read
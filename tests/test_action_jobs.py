@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chat_hateoas import db
+
+
+def _wait_for_job(app, job_id: int, timeout_s: float = 5.0):  # type: ignore[no-untyped-def]
+    deadline = time.monotonic() + timeout_s
+    with app.app_context():
+        while True:
+            job = db.get_action_job(job_id)
+            if job.status in ("done", "error") or time.monotonic() > deadline:
+                return job
+            time.sleep(0.01)
+
+
+def _job_id(html: str) -> int:
+    start = html.index('id="action-job-') + len('id="action-job-')
+    return int(html[start : html.index('"', start)])
+
+
+def test_fake_action_answers_pending_then_polls_to_the_result(client, app) -> None:
+    app.config["ACTION_DELAY_MS"] = 100
+    app.config["ACTION_POLL_MS"] = 250
+
+    response = client.post("/actions/fake", data={"action_id": "summarize", "message_id": 3})
+    pending = response.get_data(as_text=True)
+    job_id = _job_id(pending)
+
+    assert response.status_code == 202
+    assert f'hx-get="/actions/jobs/{job_id}?attempt=1"' in pending
+    assert 'hx-trigger="load delay:250ms"' in pending and 'hx-swap="outerHTML"' in pending
+    assert "spinner-dot" in pending
+
+    assert _wait_for_job(app, job_id).status == "done"
+    finished = client.get(f"/actions/jobs/{job_id}").get_data(as_text=True)
+    assert "Generated summary placeholder returned." in finished
+    assert "hx-get" not in finished and "hx-swap-oob" not in finished
+    assert client.get("/actions/jobs/9999").status_code == 404
+
+
+def test_finished_action_is_pushed_to_the_tab_stream(client, app) -> None:
+    app.config["STREAM_HEARTBEAT_S"] = 0.2
+    app.config["ACTION_DELAY_MS"] = 50
+
+    tab = client.get("/streams/tabs/tab7", buffered=False)
+    frames = iter(tab.response)
+    pending = client.post(
+        "/actions/fake",
+        data={"action_id": "cite_sources", "message_id": 4},
+        headers={"X-Chat-Tab": "tab7"},
+    ).get_data(as_text=True)
+    job_id = _job_id(pending)
+
+    for chunk in frames:
+        frame = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if frame.startswith("event: action_done"):
+            break
+    tab.close()
+
+    assert f'id="action-job-{job_id}"' in frame and 'hx-swap-oob="true"' in frame
+    assert "Mock citations" in frame
+    assert client.get("/streams/metrics").get_json()["actions"]["pushed"] == 1
+    assert "action_done" in client.get("/").get_data(as_text=True)
+
+
+def test_unfinished_jobs_are_resumed_by_the_next_queue(app) -> None:
+    with app.app_context():
+        queued_id = db.create_action_job(5, "retry")
+        stale_id = db.create_action_job(5, "summarize")
+        live_id = db.create_action_job(5, "summarize")
+        assert db.start_action_job(stale_id, lease_s=-1)
+        assert db.start_action_job(live_id, lease_s=300)
+        assert not db.start_action_job(live_id, lease_s=300)
+
+    # The first request starts this process's queue, which picks the durable rows back up.
+    app.test_client().get("/streams/metrics")
+
+    assert _wait_for_job(app, queued_id).result == "Retry queued in mock mode."
+    assert _wait_for_job(app, stale_id).status == "done"
+    with app.app_context():
+        assert db.get_action_job(live_id).status == "running"
+
+
+def test_orphaned_job_is_swept_up_by_a_running_queue(client, app) -> None:
+    app.config["ACTION_SWEEP_INTERVAL_S"] = 0.05
+    client.get("/streams/metrics")
+    with app.app_context():
+        # Claimed by a process that died after the live queue started: only a sweep can retry it.
+        job_id = db.create_action_job(6, "summarize")
+        assert db.start_action_job(job_id, lease_s=-1, owner="dead-process")
+
+    time.sleep(0.1)
+    client.get("/streams/metrics")
+
+    assert _wait_for_job(app, job_id).status == "done"
+    assert client.get("/streams/metrics").get_json()["actions"]["recovered"] == 1
+
+
+def test_stale_runner_cannot_overwrite_a_reclaimed_job(app) -> None:
+    with app.app_context():
+        job_id = db.create_action_job(7, "retry")
+        assert db.start_action_job(job_id, lease_s=-1, owner="stalled")
+        assert db.start_action_job(job_id, lease_s=300, owner="reclaimer")
+
+        assert not db.finish_action_job(job_id, "error", "Action failed.", owner="stalled")
+        assert db.finish_action_job(job_id, "done", "Retry queued in mock mode.", owner="reclaimer")
+        assert db.get_action_job(job_id).result == "Retry queued in mock mode."
+
+
+def test_polling_backs_off_and_then_stops(client, app) -> None:
+    app.config.update(ACTION_POLL_MS=100, ACTION_POLL_MAX_MS=300, ACTION_POLL_MAX_ATTEMPTS=3)
+    client.get("/streams/metrics")
+    with app.app_context():
+        job_id = db.create_action_job(8, "summarize")
+
+    delays = []
+    for attempt in range(3):
+        html = client.get(f"/actions/jobs/{job_id}?attempt={attempt}").get_data(as_text=True)
+        assert f'hx-get="/actions/jobs/{job_id}?attempt={attempt + 1}"' in html
+        delays.append(html[html.index("load delay:") : html.index("ms", html.index("load delay:"))])
+    assert delays == ["load delay:100", "load delay:200", "load delay:300"]
+
+    stopped = client.get(f"/actions/jobs/{job_id}?attempt=3").get_data(as_text=True)
+    assert "load delay" not in stopped
+    assert "Check again" in stopped and f'hx-get="/actions/jobs/{job_id}"' in stopped
+
+
+def test_many_concurrent_actions_complete_in_parallel(app) -> None:
+    app.config["ACTION_DELAY_MS"] = 50
+    app.config["ACTION_WORKERS"] = 8
+    actions = 160
+
+    def post(index: int) -> int:
+        response = app.test_client().post("/actions/fake", data={"action_id": "retry", "message_id": index})
+        assert response.status_code == 202
+        return _job_id(response.get_data(as_text=True))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        job_ids = list(pool.map(post, range(actions)))
+    jobs = [_wait_for_job(app, job_id, timeout_s=30) for job_id in job_ids]
+
+    assert all(job.status == "done" for job in jobs)
+    assert len({job.id for job in jobs}) == actions
+    with app.test_request_context():
+        snapshot = app.extensions["action_queue"].snapshot()
+    assert snapshot["completed"] == actions and snapshot["workers"] == 8
+    # The workers overlap the 50ms actions instead of running them one after another.
+    assert 1 < snapshot["max_running"] <= 8 and snapshot["running"] == 0
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+
+from chat_hateoas import db
+from chat_hateoas.services.admission import AdmissionController, stream_limits, tab_stream_limit
+
+
+def _controller(app) -> AdmissionController:
+    from chat_hateoas.routes.stream import _admission
+
+    with app.app_context():
+        return _admission()
+
+
+def test_controller_admits_fifo_and_rejects_past_queue_bound() -> None:
+    controller = AdmissionController(max_active=1, max_queued=1)
+    first = controller.enqueue()
+    second = controller.enqueue()
+
+    assert first is not None and first.admitted
+    assert second is not None and controller.position(second) == 1
+    assert controller.enqueue() is None
+    assert controller.wait(second, timeout=0.01) is False
+
+    threading.Timer(0.05, controller.release, args=(first,)).start()
+    assert controller.wait(second, timeout=2) is True
+
+    snapshot = controller.snapshot()
+    assert snapshot["active"] == 1
+    assert snapshot["queue_depth"] == 0
+    assert snapshot["rejected_total"] == 1
+    assert snapshot["wait_ms_max"] >= 40
+
+
+def test_worker_reservation_caps_stream_capacity() -> None:
+    config = {
+        "STREAM_MAX_CONCURRENT": 8,
+        "STREAM_QUEUE_MAX": 16,
+        "WORKER_THREADS": 6,
+        "STREAM_RESERVED_WORKERS": 2,
+    }
+
+    # Four stream workers: two for open tab connections, two for per-message streams.
+    assert tab_stream_limit(config) == 2
+    assert stream_limits(config) == (2, 0)
+    assert tab_stream_limit({**config, "STREAM_MAX_TABS": 1}) == 1
+    assert stream_limits({**config, "STREAM_MAX_TABS": 1}) == (3, 0)
+
+
+def test_queued_client_gets_position_events_then_times_out(client, app, streaming_assistant) -> None:
+    app.config.update(STREAM_MAX_CONCURRENT=1, STREAM_QUEUE_MAX=1, STREAM_QUEUE_TIMEOUT_S=0.3)
+    controller = _controller(app)
+    held = controller.enqueue()
+    assistant_id = streaming_assistant()
+
+    body = client.get(f"/responses/{assistant_id}/stream", buffered=True).get_data(as_text=True)
+
+    assert "event: queued" in body
+    assert 'data-queue-position="1"' in body
+    assert "event: ui_done" not in body
+    metrics = client.get("/streams/metrics").get_json()["admission"]
+    assert metrics["timeouts_total"] == 1
+    assert metrics["queue_depth"] == 0
+    with app.app_context():
+        row = db.fetch_one("SELECT status, stream_owner FROM messages WHERE id = ?", (assistant_id,))
+        assert row["status"] == "streaming"
+        assert row["stream_owner"] is None
+
+    controller.release(held)
+    body = client.get(f"/responses/{assistant_id}/stream", buffered=True).get_data(as_text=True)
+    assert "event: queued" not in body
+    assert "event: ui_done" in body
+    assert client.get("/streams/metrics").get_json()["admission"]["active"] == 0
+
+
+def test_full_queue_is_rejected_with_503(client, app, streaming_assistant) -> None:
+    app.config.update(STREAM_MAX_CONCURRENT=1, STREAM_QUEUE_MAX=0)
+    _controller(app).enqueue()
+    assistant_id = streaming_assistant()
+
+    response = client.get(f"/responses/{assistant_id}/stream")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    with app.app_context():
+        assert db.fetch_one("SELECT stream_owner FROM messages WHERE id = ?", (assistant_id,))[0] is None
+
+
+def test_failed_stream_setup_hands_back_the_slot_and_the_claim(client, app, streaming_assistant) -> None:
+    app.config.update(
+        {"PROVIDER": "bogus", "STREAM_MAX_CONCURRENT": 2, "STREAM_QUEUE_MAX": 0, "PROPAGATE_EXCEPTIONS": False}
+    )
+    assistant_ids = [streaming_assistant() for _ in range(3)]
+
+    for assistant_id in assistant_ids:
+        assert client.get(f"/responses/{assistant_id}/stream").status_code == 500
+
+    assert client.get("/streams/metrics").get_json()["admission"]["active"] == 0
+    with app.app_context():
+        assert db.fetch_one("SELECT stream_owner FROM messages WHERE id = ?", (assistant_ids[0],))[0] is None
+    app.config["PROVIDER"] = "mock"
+    response = client.get(f"/responses/{assistant_ids[0]}/stream", buffered=True)
+    assert response.status_code == 200 and "event: ui_done" in response.get_data(as_text=True)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from chat_hateoas import db
+
+
+def _complete_assistant(app, latency_ms: int) -> int:
+    with app.app_context():
+        conversation_id = db.create_conversation("Analytics")
+        message_id = db.create_message(conversation_id, "assistant", "done", "done")
+        db.save_assistant_metadata(
+            message_id=message_id,
+            provider="mock-bedrock",
+            model_id="mock-model",
+            stop_reason="end_turn",
+            input_tokens=10,
+            output_tokens=30,
+            latency_ms=latency_ms,
+            tool_events=[],
+            raw_event_count=4,
+        )
+    return message_id
+
+
+def test_usage_rollup_is_incremental_and_idempotent_on_resave(client, app) -> None:
+    first = _complete_assistant(app, latency_ms=100)
+    _complete_assistant(app, latency_ms=300)
+    with app.app_context():
+        db.save_assistant_metadata(first, "mock-bedrock", "mock-model", "end_turn", 10, 30, 100, [], 4)
+
+    response = client.get("/analytics/usage")
+    (item,) = response.get_json()["items"]
+
+    assert response.status_code == 200
+    assert item["model_id"] == "mock-model"
+    assert item["messages"] == 2
+    assert item["input_tokens"] == 20
+    assert item["output_tokens"] == 60
+    assert item["avg_latency_ms"] == 200.0
+
+
+def test_feedback_rollup_moves_counts_when_vote_changes(client, app) -> None:
+    message_id = _complete_assistant(app, latency_ms=50)
+    other_id = _complete_assistant(app, latency_ms=50)
+
+    client.post(f"/messages/{message_id}/feedback", data={"vote": "up"})
+    client.post(f"/messages/{message_id}/feedback", data={"vote": "up"})
+    client.post(f"/messages/{message_id}/feedback", data={"vote": "down"})
+    client.post(f"/messages/{other_id}/feedback", data={"vote": "up"})
+
+    (item,) = client.get("/analytics/feedback?days=1").get_json()["items"]
+    assert item["up"] == 1
+    assert item["down"] == 1
+    assert item["up_rate"] == 0.5
+
+
+def test_rebuild_rollups_matches_incremental_counts(client, app) -> None:
+    message_id = _complete_assistant(app, latency_ms=120)
+    client.post(f"/messages/{message_id}/feedback", data={"vote": "down"})
+    before_usage = client.get("/analytics/usage").get_json()
+    before_feedback = client.get("/analytics/feedback").get_json()
+
+    result = app.test_cli_runner().invoke(args=["rebuild-rollups"])
+
+    assert result.exit_code == 0
+    assert client.get("/analytics/usage").get_json() == before_usage
+    assert client.get("/analytics/feedback").get_json() == before_feedback
+
+
+def test_analytics_rejects_non_positive_days(client) -> None:
+    assert client.get("/analytics/usage?days=0").status_code == 400
+
+
+def test_rollups_match_a_rebuild_after_deletes_and_early_votes(client, app) -> None:
+    kept = _complete_assistant(app, latency_ms=100)
+    deleted = _complete_assistant(app, latency_ms=300)
+    client.post(f"/messages/{kept}/feedback", data={"vote": "up"})
+    client.post(f"/messages/{deleted}/feedback", data={"vote": "down"})
+    with app.app_context():
+        conversation_id = db.create_conversation("Early vote")
+        early = db.create_message(conversation_id, "assistant", "x", "x")
+        db.upsert_feedback(early, "up")
+        db.save_assistant_metadata(early, "mock-bedrock", "mock-model", "end_turn", 1, 1, 10, [], 1)
+        db.delete_conversation(db.get_message(deleted)["conversation_id"])
+    usage = client.get("/analytics/usage").get_json()
+    feedback = client.get("/analytics/feedback").get_json()
+
+    (item,) = feedback["items"]
+    assert item["model_id"] == "mock-model" and item["up"] == 2 and item["down"] == 0
+    assert usage["items"][0]["messages"] == 2
+    assert app.test_cli_runner().invoke(args=["rebuild-rollups"]).exit_code == 0
+    assert client.get("/analytics/usage").get_json() == usage
+    assert client.get("/analytics/feedback").get_json() == feedback
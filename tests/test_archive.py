@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from chat_hateoas import create_app, db
+from chat_hateoas.services.archive import export_ndjson, import_ndjson
+
+
+def _seed(app) -> int:
+    with app.app_context():
+        conversation_id = db.create_conversation("Archive Me")
+        db.create_message(conversation_id, "user", "hello", "hello")
+        assistant_id = db.create_message(conversation_id, "assistant", "hi **there**", "<p>hi</p>")
+        db.update_message(
+            assistant_id,
+            "hi **there**",
+            "<p>hi</p>",
+            "complete",
+            render_text="hi **there**\n[[tool_status:tool-1|done|Tool completed: calc (ok)]]\n",
+        )
+        db.save_assistant_metadata(
+            assistant_id,
+            "mock-bedrock",
+            "mock-model",
+            "end_turn",
+            5,
+            7,
+            42,
+            [
+                {"toolUse": {"toolUseId": "tool-1", "name": "calc"}, "offsetMs": 10},
+                {"toolResult": {"toolUseId": "tool-1", "status": "ok"}, "offsetMs": 25},
+            ],
+            9,
+        )
+        db.upsert_feedback(assistant_id, "up")
+    return conversation_id
+
+
+def test_export_writes_one_json_record_per_line(app) -> None:
+    _seed(app)
+    out = io.StringIO()
+
+    with app.app_context():
+        counts = export_ndjson(out)
+
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert counts == {"conversation": 1, "message": 2}
+    assert [record["type"] for record in records] == ["archive", "conversation", "message", "message"]
+    assert records[3]["feedback"]["vote"] == "up"
+    assert records[3]["metadata"]["latency_ms"] == 42
+    (tool_call,) = records[3]["metadata"]["tool_calls"]
+    assert tool_call["tool_use_id"] == "tool-1" and tool_call["duration_ms"] == 15
+
+
+def test_import_round_trips_into_a_non_empty_database(app, tmp_path) -> None:
+    _seed(app)
+    out = io.StringIO()
+    with app.app_context():
+        export_ndjson(out)
+
+    target = create_app({"TESTING": True, "DATABASE": str(tmp_path / "target.sqlite")})
+    with target.app_context():
+        existing_id = db.create_conversation("Already here")
+        db.create_message(existing_id, "user", "keep me", "keep me")
+
+        counts = import_ndjson(out.getvalue().splitlines(), chunk_size=1)
+
+        assert counts == {"conversation": 1, "message": 2}
+        titles = [row["title"] for row in db.list_conversations()]
+        assert sorted(titles) == ["Already here", "Archive Me"]
+        imported = next(row for row in db.list_conversations() if row["title"] == "Archive Me")
+        messages = db.list_messages(int(imported["id"]))
+        assert [message["raw_text"] for message in messages] == ["hello", "hi **there**"]
+        assert [message["render_text"] is None for message in messages] == [True, False]
+        assert messages[1]["feedback_vote"] == "up"
+        (tool_event,) = db.list_tool_events(int(messages[1]["id"]))
+        assert tool_event["duration_ms"] == 15
+        (usage,) = db.list_usage_rollups()
+        assert usage["message_count"] == 1
+
+
+def test_failed_import_still_counts_the_committed_chunks_in_rollups(app, tmp_path) -> None:
+    _seed(app)
+    out = io.StringIO()
+    with app.app_context():
+        export_ndjson(out)
+    lines = out.getvalue().splitlines()
+
+    target = create_app({"TESTING": True, "DATABASE": str(tmp_path / "target.sqlite")})
+    with target.app_context():
+        with pytest.raises(json.JSONDecodeError):
+            import_ndjson([*lines, "{not json"], chunk_size=1)
+
+        (usage,) = db.list_usage_rollups()
+        assert usage["message_count"] == 1
+        (imported,) = db.list_conversations()
+        db.delete_conversation(int(imported["id"]))
+        assert db.list_usage_rollups() == []
+
+
+def test_export_and_import_cli_commands(app, tmp_path) -> None:
+    _seed(app)
+    archive_path = tmp_path / "backup.ndjson"
+    runner = app.test_cli_runner()
+
+    exported = runner.invoke(args=["export-ndjson", str(archive_path)])
+    imported = runner.invoke(args=["import-ndjson", str(archive_path), "--chunk-size", "50"])
+
+    assert exported.exit_code == 0
+    assert imported.exit_code == 0
+    assert "Imported 1 conversations and 2 messages" in imported.output
+    with app.app_context():
+        assert db.conversation_count() == 2
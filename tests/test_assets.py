@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import gzip
+import re
+
+from chat_hateoas.services.assets import IMMUTABLE_CACHE_CONTROL, AssetManifest, fingerprint
+
+
+def test_pages_reference_fingerprinted_assets_without_inline_script(client) -> None:
+    body = client.get("/").get_data(as_text=True)
+
+    assert re.search(r'href="/assets/app\.[0-9a-f]{12}\.css"', body)
+    assert re.search(r'src="/assets/app\.[0-9a-f]{12}\.js"', body)
+    # Not vendored in this checkout, so the pinned CDN copy is used.
+    assert 'src="https://unpkg.com/htmx.org@1.9.12/dist/htmx.min.js"' in body
+    assert "<script>" not in body
+    assert 'data-prefetch-ttl-s="10"' in body
+
+
+def test_assets_are_immutable_and_precompressed(client) -> None:
+    body = client.get("/").get_data(as_text=True)
+    url = re.search(r'src="(/assets/app\.[0-9a-f]{12}\.js)"', body).group(1)
+
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    plain = client.get(url)
+
+    assert compressed.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Encoding" not in plain.headers
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert plain.headers["Content-Type"].startswith("text/javascript")
+    assert client.get(url, headers={"If-None-Match": plain.headers["ETag"]}).status_code == 304
+    assert client.get("/assets/app.000000000000.js").status_code == 404
+
+
+def test_vendored_copies_replace_the_cdn_and_build_writes_variants(app, tmp_path) -> None:
+    static_dir = tmp_path / "static"
+    (static_dir / "vendor").mkdir(parents=True)
+    (static_dir / "app.css").write_text("body { color: red; }\n" * 50)
+    (static_dir / "vendor" / "htmx.min.js").write_text("var htmx = {};\n")
+
+    manifest = AssetManifest.build(static_dir)
+    assert sorted(manifest.by_name) == ["app.css", "vendor/htmx.min.js"]
+    assert manifest.by_name["vendor/htmx.min.js"].fingerprinted == fingerprint(
+        "vendor/htmx.min.js", b"var htmx = {};\n"
+    )
+
+    app.static_folder = str(static_dir)
+    out_dir = tmp_path / "dist"
+    result = app.test_cli_runner().invoke(args=["build-assets", "--out", str(out_dir)])
+
+    assert result.exit_code == 0, result.output
+    css = manifest.by_name["app.css"].fingerprinted
+    assert (out_dir / css).read_bytes() == (static_dir / "app.css").read_bytes()
+    assert gzip.decompress((out_dir / f"{css}.gz").read_bytes()) == (static_dir / "app.css").read_bytes()
+    assert '"vendor/htmx.min.js"' in (out_dir / "manifest.json").read_text()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import time
+
+from chat_hateoas import db
+from chat_hateoas.services.send_buffer import SendBuffer, StreamMetrics
+
+
+def test_buffer_keeps_only_latest_delta_and_sheds_debug_frames() -> None:
+    metrics = StreamMetrics()
+    buffer = SendBuffer(max_events=3, policy="coalesce", metrics=metrics)
+
+    for index in range(5):
+        buffer.put(f"event: ui_delta\ndata: render {index}\n\n")
+        buffer.put(f"event: debug_event\ndata: {index}\n\n")
+    buffer.put("event: ui_done\ndata: done\n\n")
+    buffer.close()
+
+    frames = list(buffer.drain())
+    assert [frame for frame in frames if frame.startswith("event: ui_delta")] == [
+        "event: ui_delta\ndata: render 4\n\n"
+    ]
+    assert frames[-1] == "event: ui_done\ndata: done\n\n"
+    assert len(frames) <= 3
+    assert metrics.deltas_coalesced > 0
+    assert metrics.events_dropped >= 3
+
+
+def test_grace_period_applies_backpressure_before_shedding() -> None:
+    import threading
+
+    metrics = StreamMetrics()
+    buffer = SendBuffer(max_events=1, policy="disconnect", metrics=metrics, grace_s=2.0)
+    buffer.put("event: ui_delta\ndata: first\n\n")
+    threading.Timer(0.05, buffer.next_frame).start()
+
+    assert buffer.put("event: ui_delta\ndata: second\n\n") is True
+    assert metrics.slow_disconnects == 0
+
+
+def test_slow_consumer_gets_coalesced_stream_and_final_render(app, streaming_assistant, read_slowly) -> None:
+    app.config.update(
+        STREAM_SEND_BUFFER_EVENTS=4,
+        STREAM_SLOW_CLIENT_POLICY="coalesce",
+        STREAM_SLOW_CLIENT_GRACE_MS=0,
+    )
+    client = app.test_client()
+    assistant_id = streaming_assistant()
+
+    response = client.get(f"/responses/{assistant_id}/stream", buffered=False)
+    time.sleep(0.2)
+    frames = read_slowly(response, delay_s=0.01)
+
+    assert frames[-1].startswith("event: ui_done")
+    assert len(frames) <= 6
+    metrics = client.get("/streams/metrics").get_json()
+    assert metrics["deltas_coalesced"] > 0
+    assert metrics["max_buffer_depth"] <= 5
+    with app.app_context():
+        assert db.get_message(assistant_id)["status"] == "complete"
+
+
+def test_disconnect_policy_drops_slow_client_but_generation_completes(app, streaming_assistant, read_slowly) -> None:
+    app.config.update(
+        STREAM_SEND_BUFFER_EVENTS=2,
+        STREAM_SLOW_CLIENT_POLICY="disconnect",
+        STREAM_SLOW_CLIENT_GRACE_MS=0,
+    )
+    client = app.test_client()
+    assistant_id = streaming_assistant()
+
+    response = client.get(f"/responses/{assistant_id}/stream", buffered=False)
+    time.sleep(0.2)
+    frames = read_slowly(response, delay_s=0)
+
+    assert not any(frame.startswith("event: ui_done") for frame in frames)
+    assert client.get("/streams/metrics").get_json()["slow_disconnects"] == 1
+    deadline = time.monotonic() + 5
+    with app.app_context():
+        while db.get_message(assistant_id)["status"] == "streaming" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert db.get_message(assistant_id)["status"] == "complete"
+
+
+def test_heartbeat_comments_fill_tool_call_pauses(app, streaming_assistant) -> None:
+    app.config.update(TOOL_CALL_DELAY_MS=300, STREAM_HEARTBEAT_S=0.05)
+    client = app.test_client()
+    assistant_id = streaming_assistant()
+
+    body = client.get(f"/responses/{assistant_id}/stream", buffered=True).get_data(as_text=True)
+
+    assert ": keepalive\n\n" in body
+    assert "event: ui_done" in body
+    assert client.get("/streams/metrics").get_json()["heartbeats_sent"] > 0
+
+
+def test_abandoned_stream_stops_generation_and_marks_message(app, streaming_assistant) -> None:
+    app.config.update(TOOL_CALL_DELAY_MS=10_000, STREAM_HEARTBEAT_S=0.05)
+    client = app.test_client()
+    assistant_id = streaming_assistant()
+
+    response = client.get(f"/responses/{assistant_id}/stream", buffered=False)
+    stream = iter(response.response)
+    first = next(stream)
+    assert b"event:" in first if isinstance(first, bytes) else "event:" in first
+    abandoned_at = time.monotonic()
+    response.close()
+
+    with app.app_context():
+        while db.get_message(assistant_id)["status"] == "streaming" and time.monotonic() - abandoned_at < 5:
+            time.sleep(0.02)
+        row = db.fetch_one("SELECT status, stream_owner FROM messages WHERE id = ?", (assistant_id,))
+    assert row["status"] == "error"
+    assert row["stream_owner"] is None
+    assert time.monotonic() - abandoned_at < 2
+    metrics = client.get("/streams/metrics").get_json()
+    assert metrics["streams_cancelled"] == 1
+    assert metrics["admission"]["active"] == 0
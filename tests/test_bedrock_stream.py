@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import http.client
+import json
+import threading
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chat_hateoas import db
+from chat_hateoas.services.bedrock_stream import (
+    AwsCredentials,
+    BedrockStreamClient,
+    BedrockStreamError,
+    ConnectionPool,
+    EventStreamDecoder,
+    EventStreamError,
+    encode_converse_event,
+    encode_event_frame,
+    sign_v4,
+)
+
+RECORDED_FRAMES = [
+    encode_converse_event("messageStart", {"role": "assistant"}),
+    encode_converse_event("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "Hello "}, "p": "abc"}),
+    encode_converse_event("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": "from **Bedrock**."}}),
+    encode_converse_event("contentBlockStop", {"contentBlockIndex": 0}),
+    encode_converse_event(
+        "contentBlockStart",
+        {"contentBlockIndex": 1, "start": {"toolUse": {"toolUseId": "t-1", "name": "web_search"}}},
+    ),
+    encode_converse_event("contentBlockDelta", {"contentBlockIndex": 1, "delta": {"toolUse": {"input": '{"query":'}}}),
+    encode_converse_event("contentBlockDelta", {"contentBlockIndex": 1, "delta": {"toolUse": {"input": '"sse"}'}}}),
+    encode_converse_event("contentBlockStop", {"contentBlockIndex": 1}),
+    encode_converse_event("messageStop", {"stopReason": "end_turn"}),
+    encode_converse_event(
+        "metadata",
+        {"usage": {"inputTokens": 11, "outputTokens": 7, "totalTokens": 18}, "metrics": {"latencyMs": 42}},
+    ),
+]
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    frames: list[bytes] = RECORDED_FRAMES
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.bodies.append(json.loads(body))  # type: ignore[attr-defined]
+        self.server.paths.append(self.path)  # type: ignore[attr-defined]
+        self.server.peers.add(self.client_address)  # type: ignore[attr-defined]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Odd-sized chunks so frames straddle chunk boundaries.
+        stream = b"".join(self.frames)
+        for offset in range(0, len(stream), 37):
+            piece = stream[offset : offset + 37]
+            self.wfile.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args) -> None:  # type: ignore[no-untyped-def]
+        return
+
+
+@pytest.fixture()
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ReplayHandler)
+    server.paths = []  # type: ignore[attr-defined]
+    server.bodies = []  # type: ignore[attr-defined]
+    server.peers = set()  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_decoder_handles_byte_at_a_time_feeds_and_rejects_corruption() -> None:
+    stream = b"".join(RECORDED_FRAMES)
+    decoder = EventStreamDecoder()
+    decoded = []
+    for index in range(len(stream)):
+        decoder.feed(stream[index : index + 1])
+        decoded.extend(decoder.messages())
+    decoder.finish()
+
+    assert len(decoded) == len(RECORDED_FRAMES)
+    headers, payload = decoded[1]
+    assert headers[":event-type"] == "contentBlockDelta"
+    assert json.loads(payload)["delta"] == {"text": "Hello "}
+
+    corrupted = bytearray(encode_event_frame({":event-type": "x"}, b"{}"))
+    corrupted[-5] ^= 0xFF
+    bad = EventStreamDecoder()
+    bad.feed(corrupted)
+    with pytest.raises(EventStreamError):
+        list(bad.messages())
+
+
+def test_client_replays_frames_and_reuses_pooled_connection(stub_server) -> None:
+    pool = ConnectionPool(f"http://127.0.0.1:{stub_server.server_address[1]}")
+    client = BedrockStreamClient(pool=pool, region="us-east-1")
+
+    runs = [
+        list(client.converse_stream([{"role": "user", "content": "hi"}], "vendor.model-v1:0", 256, 0.2))
+        for _ in range(2)
+    ]
+
+    assert runs[0] == runs[1]
+    events = runs[0]
+    assert [event["type"] for event in events] == [
+        "messageStart",
+        "contentBlockDelta",
+        "contentBlockDelta",
+        "contentBlockStop",
+        "contentBlockDelta",
+        "contentBlockStop",
+        "messageStop",
+        "metadata",
+    ]
+    assert events[1]["delta"] == {"text": "Hello "}
+    assert events[4]["delta"]["toolUse"] == {"toolUseId": "t-1", "name": "web_search", "input": {"query": "sse"}}
+    assert events[-1]["metadata"]["usage"]["outputTokens"] == 7
+    assert events[-1]["metadata"]["modelId"] == "vendor.model-v1:0"
+    assert stub_server.paths[0] == "/model/vendor.model-v1%3A0/converse-stream"
+    assert pool.snapshot() == {"idle": 1, "created": 1, "reused": 1, "discarded": 0}
+    assert len(stub_server.peers) == 1
+    pool.close()
+
+
+def test_history_drops_empty_turns_and_merges_same_role_neighbours(stub_server) -> None:
+    pool = ConnectionPool(f"http://127.0.0.1:{stub_server.server_address[1]}")
+    client = BedrockStreamClient(pool=pool, region="us-east-1")
+    history = [
+        {"role": "user", "content": "first"},
+        {"role": "assistant", "content": ""},
+        {"role": "user", "content": "second"},
+        {"role": "assistant", "content": "answer"},
+        {"role": "assistant", "content": "  "},
+        {"role": "user", "content": "third"},
+    ]
+
+    list(client.converse_stream(history, "m", 64, 0.2))
+
+    assert stub_server.bodies[0]["messages"] == [
+        {"role": "user", "content": [{"text": "first\n\nsecond"}]},
+        {"role": "assistant", "content": [{"text": "answer"}]},
+        {"role": "user", "content": [{"text": "third"}]},
+    ]
+    pool.close()
+
+
+def test_exception_frames_raise_and_discard_the_connection(stub_server, monkeypatch) -> None:
+    error_frame = encode_event_frame(
+        {":message-type": "exception", ":exception-type": "throttlingException"},
+        b'{"message":"slow down"}',
+    )
+    monkeypatch.setattr(_ReplayHandler, "frames", RECORDED_FRAMES[:1] + [error_frame])
+    pool = ConnectionPool(f"http://127.0.0.1:{stub_server.server_address[1]}")
+    client = BedrockStreamClient(pool=pool, region="us-east-1")
+
+    with pytest.raises(BedrockStreamError, match="throttlingException"):
+        list(client.converse_stream([{"role": "user", "content": "hi"}], "m", 256, 0.2))
+    assert pool.snapshot()["discarded"] == 1
+
+
+def test_sign_v4_matches_reference_vector() -> None:
+    headers = sign_v4(
+        "GET",
+        "example.amazonaws.com",
+        "/",
+        b"",
+        "us-east-1",
+        AwsCredentials("AKIDEXAMPLE", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY"),
+        service="service",
+        now=datetime(2015, 8, 30, 12, 36, tzinfo=UTC),
+    )
+
+    assert headers["Authorization"] == (
+        "AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/20150830/us-east-1/service/aws4_request, "
+        "SignedHeaders=host;x-amz-date, "
+        "Signature=5fa00fa31553b73ebf1942676e86291e8372ff2a2260956d9b8aae1d763fbf31"
+    )
+
+
+def test_stream_route_uses_configured_bedrock_provider(client, app, stub_server) -> None:
+    app.config["PROVIDER"] = "bedrock"
+    app.config["BEDROCK_ENDPOINT"] = f"http://127.0.0.1:{stub_server.server_address[1]}"
+    with app.app_context():
+        conversation_id = db.create_conversation("Bedrock")
+        db.create_message(conversation_id, "user", "hi", "hi")
+        assistant_id = db.create_message(conversation_id, "assistant", "", "", status="streaming")
+
+    body = client.get(f"/responses/{assistant_id}/stream").get_data(as_text=True)
+
+    assert "event: ui_done" in body
+    assert "Running web_search" in body
+    with app.app_context():
+        message = db.get_message(assistant_id)
+        metadata = db.fetch_one("SELECT * FROM assistant_metadata WHERE message_id = ?", (assistant_id,))
+        assert message["raw_text"] == "Hello from **Bedrock**."
+        assert metadata["provider"] == "bedrock"
+        assert metadata["output_tokens"] == 7
+    assert client.get("/streams/metrics").get_json()["provider_pool"]["created"] == 1
+
+
+class _StaleConnection:
+    def request(self, *args, **kwargs) -> None:  # type: ignore[no-untyped-def]
+        raise http.client.RemoteDisconnected("closed by peer")
+
+    def close(self) -> None:
+        return
+
+
+def test_stale_pooled_connection_is_retried_once_on_a_fresh_connection(stub_server) -> None:
+    pool = ConnectionPool(f"http://127.0.0.1:{stub_server.server_address[1]}")
+    stale = [_StaleConnection() for _ in range(3)]
+    for connection in stale:
+        pool.release(connection, reusable=True)  # type: ignore[arg-type]
+    client = BedrockStreamClient(pool=pool, region="us-east-1")
+
+    events = list(client.converse_stream([{"role": "user", "content": "hi"}], "m", 64, 0.2))
+
+    assert events[-1]["type"] == "metadata"
+    assert pool.snapshot() == {"idle": 3, "created": 1, "reused": 1, "discarded": 1}
+    pool.close()
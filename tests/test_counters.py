@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from chat_hateoas import db
+
+
+def _true_count() -> int:
+    return int(db.fetch_one("SELECT COUNT(*) AS count FROM conversations")["count"])
+
+
+def test_counter_tracks_creates_deletes_and_bulk_purges(app) -> None:
+    with app.app_context():
+        ids = [db.create_conversation(f"Chat {index}") for index in range(4)]
+        db.delete_conversation(ids[0])
+        assert db.conversation_count() == _true_count() == 3
+
+        db.execute(
+            "UPDATE conversations SET updated_at = ? WHERE id IN (?, ?)",
+            ("2000-01-01T00:00:00+00:00", ids[1], ids[2]),
+        )
+
+    result = app.test_cli_runner().invoke(
+        args=["purge-conversations", "--older-than-days", "30", "--pause-ms", "0"]
+    )
+    assert result.exit_code == 0
+    with app.app_context():
+        assert db.conversation_count() == _true_count() == 1
+
+
+def test_counter_is_seeded_for_databases_created_before_it(app) -> None:
+    with app.app_context():
+        for index in range(3):
+            db.create_conversation(f"Legacy {index}")
+        conn = db.get_db()
+        conn.executescript(
+            """
+            DROP TRIGGER trg_conversations_count_insert;
+            DROP TRIGGER trg_conversations_count_delete;
+            DROP TABLE counters;
+            PRAGMA user_version = 0;
+            """
+        )
+
+        db.init_db()
+        assert db.conversation_count() == 3
+        db.create_conversation("After upgrade")
+        assert db.conversation_count() == 4
+
+
+def test_new_conversation_titles_follow_the_counter(client, app) -> None:
+    client.get("/")
+    client.post("/conversations")
+
+    with app.app_context():
+        titles = [str(row["title"]) for row in db.list_conversations()]
+    assert sorted(titles) == ["Conversation 1", "Conversation 2"]
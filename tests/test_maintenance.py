@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from chat_hateoas import db
+
+
+def _seed_old_conversations(app, count: int, updated_at: str) -> None:
+    with app.app_context():
+        for index in range(count):
+            conversation_id = db.create_conversation(f"Old {index}")
+            db.create_message(conversation_id, "user", "x" * 4000, "x" * 4000)
+            db.execute(
+                "UPDATE conversations SET updated_at = ? WHERE id = ?",
+                (updated_at, conversation_id),
+            )
+
+
+def test_purge_deletes_old_conversations_in_batches_and_vacuum_reclaims_pages(app) -> None:
+    _seed_old_conversations(app, 5, "2000-01-01T00:00:00+00:00")
+    with app.app_context():
+        recent_id = db.create_conversation("Recent")
+
+    runner = app.test_cli_runner()
+    purged = runner.invoke(
+        args=["purge-conversations", "--older-than-days", "30", "--batch-size", "2", "--pause-ms", "0"]
+    )
+
+    assert purged.exit_code == 0
+    assert "Purged 5 conversations in 3 batches" in purged.output
+
+    with app.app_context():
+        assert [int(row["id"]) for row in db.list_conversations()] == [recent_id]
+        assert db.fetch_one("SELECT COUNT(*) AS count FROM messages")["count"] == 0
+
+    vacuumed = runner.invoke(args=["vacuum"])
+    assert vacuumed.exit_code == 0
+    assert "0 still free" in vacuumed.output
+    assert ": 0 pages reclaimed" not in vacuumed.output
+
+
+def test_analyze_checkpoint_and_integrity_commands_report(app) -> None:
+    runner = app.test_cli_runner()
+
+    analyzed = runner.invoke(args=["analyze", "--full"])
+    checkpoint = runner.invoke(args=["wal-checkpoint"])
+    integrity = runner.invoke(args=["integrity-check"])
+
+    assert analyzed.exit_code == 0
+    assert "ANALYZE done" in analyzed.output
+    assert checkpoint.exit_code == 0
+    assert integrity.exit_code == 0
+    assert "Integrity ok" in integrity.output
+
+
+def test_vacuum_requires_convert_for_legacy_databases(app) -> None:
+    with app.app_context():
+        conn = db.get_db()
+        conn.execute("PRAGMA auto_vacuum = NONE")
+        conn.execute("VACUUM")
+
+    runner = app.test_cli_runner()
+    refused = runner.invoke(args=["vacuum"])
+    converted = runner.invoke(args=["vacuum", "--convert"])
+
+    assert refused.exit_code != 0
+    assert "--convert" in refused.output
+    assert converted.exit_code == 0
+    assert "Converted to incremental auto_vacuum" in converted.output
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import random
+import time
+from html.parser import HTMLParser
+
+import pytest
+
+from chat_hateoas.services.transform import (
+    MARKDOWN_MAX_CHARS,
+    render_assistant_html,
+    render_markdown_html,
+)
+
+FUZZ_PIECES = [
+    "*", "**", "`", "[", "]", "(", ")", "http://e.x", "https://a.b/c", "http://[", " ", "\n", "\n\n",
+    "a", "#", "- ", "```\n", "[[button:Go|go]]", "[[tool_status:t1|running|Run]]", "[[button:", "]]",
+    "<script>", "&", '"', "\x00", "@@MDTOK0@@", '{"toolUse": 1}\n',
+]
+
+# Each of these made one of the old regexes rescan the rest of the message from every opener.
+PATHOLOGICAL = {
+    "open_brackets": "[",
+    "unclosed_link_labels": "[a ",
+    "unclosed_link_urls": "[a](http://",
+    "unclosed_control_tokens": "[[button:x",
+    "unclosed_tool_status": "[[tool_status:a|",
+    "code_spans": "`a` ",
+    "bold_spans": "**a** ",
+    "italic_openers": "*a**",
+    "stars": "*",
+}
+
+BALANCED_TAGS = {"p", "strong", "em", "code", "a", "ul", "li", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "div"}
+
+
+class _TagBalance(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.open: list[str] = []
+        self.errors: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs) -> None:  # type: ignore[no-untyped-def]
+        if tag in BALANCED_TAGS:
+            self.open.append(tag)
+        elif tag not in {"br", "button", "details", "summary"}:
+            self.errors.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in BALANCED_TAGS:
+            if not self.open or self.open.pop() != tag:
+                self.errors.append(f"/{tag}")
+
+
+def test_fuzzed_markdown_renders_balanced_escaped_html() -> None:
+    rng = random.Random(48)
+    for _ in range(3000):
+        raw = "".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, 40)))
+        html = render_assistant_html(raw, message_id=1)
+
+        assert "\x00" not in html and "<script" not in html
+        parser = _TagBalance()
+        parser.feed(html)
+        parser.close()
+        assert parser.errors == [] and parser.open == [], raw
+
+
+def test_nested_spans_and_marker_lookalikes_render_correctly() -> None:
+    assert render_markdown_html("**a `c` b**") == "<p><strong>a <code>c</code> b</strong></p>"
+    assert render_markdown_html("*a **b** c*") == "<p><em>a <strong>b</strong> c</em></p>"
+    assert render_markdown_html("x @@MDTOK0@@ `z`") == "<p>x @@MDTOK0@@ <code>z</code></p>"
+    assert render_markdown_html("[a](http://[x)") == "<p>[a](http://[x)</p>"
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_input_renders_in_linear_time(name: str) -> None:
+    unit = PATHOLOGICAL[name]
+    raw = unit * (MARKDOWN_MAX_CHARS // len(unit))
+
+    best = min(_render_seconds(raw) for _ in range(2))
+
+    # Linear scans take well under 0.1s here; the old regexes needed 5-60s for these inputs.
+    assert best < 1.5, f"{name}: {best:.2f}s"
+
+
+def test_messages_over_the_budget_fall_back_to_escaped_text() -> None:
+    raw = "**bold** <b>\n" + "x" * MARKDOWN_MAX_CHARS
+
+    html = render_assistant_html(raw, message_id=1)
+
+    assert html.startswith('<p class="plain-text">**bold** &lt;b&gt;<br>')
+    assert "<strong>" not in html
+
+
+def _render_seconds(raw: str) -> float:
+    started = time.perf_counter()
+    render_assistant_html(raw, message_id=1)
+    return time.perf_counter() - started
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import pytest
+
+from chat_hateoas import create_app, db
+from chat_hateoas.services import message_html
+from chat_hateoas.services.transform import RENDERER_VERSION
+
+
+@pytest.fixture()
+def lazy_app(tmp_path):
+    return create_app(
+        {
+            "TESTING": True,
+            "DATABASE": str(tmp_path / "lazy.sqlite"),
+            "MESSAGE_HTML_STORAGE": "lazy",
+            "RENDER_CACHE_SIZE": 2,
+            "STREAM_DELAY_MIN_MS": 0,
+            "STREAM_DELAY_MAX_MS": 0,
+            "TOOL_CALL_DELAY_MS": 0,
+        }
+    )
+
+
+def test_lazy_mode_stores_only_raw_text_and_renders_on_read(lazy_app) -> None:
+    client = lazy_app.test_client()
+    client.get("/")
+    with lazy_app.app_context():
+        conversation_id = int(db.list_conversations()[0]["id"])
+
+    client.post(f"/conversations/{conversation_id}/messages", data={"message": "hi <b>there</b>"})
+    with lazy_app.app_context():
+        assistant_id = int(db.list_messages(conversation_id)[1]["id"])
+    streamed = client.get(f"/responses/{assistant_id}/stream", buffered=True).get_data(as_text=True)
+    done = streamed[streamed.index("event: ui_done") :]
+
+    with lazy_app.app_context():
+        stored = db.list_messages(conversation_id)
+        assert [row["rendered_html"] for row in stored] == ["", ""]
+        assert all(row["renderer_version"] == RENDERER_VERSION for row in stored)
+        # The model's history stays marker-free; the markers live in render_text.
+        assert "[[tool_status:" not in stored[1]["raw_text"]
+        assert "[[tool_status:" in stored[1]["render_text"]
+
+    body = client.get(f"/?conversation_id={conversation_id}").get_data(as_text=True)
+    assert "hi &lt;b&gt;there&lt;/b&gt;" in body
+    assert "<h3>Recommendation:" in body
+    # Same tool-status blocks as eager mode, both in the final stream frame and on reload.
+    assert "tool-status--done" in done
+    assert "tool-status--done" in body
+
+
+def test_render_cache_is_bounded_lru_keyed_by_renderer_version(lazy_app) -> None:
+    with lazy_app.test_request_context():
+        conversation_id = db.create_conversation("Cache")
+        for index in range(3):
+            db.create_message(conversation_id, "assistant", f"**{index}**", "")
+        rows = db.list_messages(conversation_id)
+
+        first = message_html.hydrate_messages(rows)
+        cache = lazy_app.extensions["render_cache"]
+        assert [item["rendered_html"] for item in first] == [f"<p><strong>{i}</strong></p>" for i in range(3)]
+        assert len(cache) == 2
+        assert message_html._cache_key(rows[0]) not in cache
+
+        message_html.hydrate_message(rows[2])
+        assert cache.hits == 1
+
+
+def test_stale_renderer_version_is_rerendered_in_eager_mode(app) -> None:
+    with app.test_request_context():
+        conversation_id = db.create_conversation("Stale")
+        message_id = db.create_message(
+            conversation_id,
+            "assistant",
+            "*new*",
+            "<p>old html</p>",
+            renderer_version=RENDERER_VERSION - 1,
+        )
+
+        hydrated = message_html.hydrate_message(db.get_message(message_id))
+        assert hydrated["rendered_html"] == "<p><em>new</em></p>"
+
+
+def test_stale_row_whose_raw_text_lost_its_tool_markers_keeps_its_html(app) -> None:
+    stored = '<p>hi</p><div class="tool-status tool-status--done" data-tool-id="t1">Tool completed: calc (ok)</div>'
+    with app.test_request_context():
+        conversation_id = db.create_conversation("Legacy")
+        message_id = db.create_message(
+            conversation_id,
+            "assistant",
+            "hi",
+            stored,
+            renderer_version=RENDERER_VERSION - 1,
+        )
+
+        hydrated = message_html.hydrate_message(db.get_message(message_id))
+        assert hydrated["rendered_html"] == stored
+
+
+def test_warm_hot_conversations_fills_cache(lazy_app) -> None:
+    with lazy_app.test_request_context():
+        conversation_id = db.create_conversation("Hot")
+        db.create_message(conversation_id, "user", "hello", "")
+
+        db.create_message(db.create_conversation("Cold"), "user", "later", "")
+
+        assert message_html.warm_hot_conversations(conversation_limit=1) == 1
+        assert message_html.warm_hot_conversations(conversation_limit=1) == 0
+        assert db.list_conversations(limit=1) == db.list_conversations()[:1]
+        # The warmer's LIMIT walks the updated_at index instead of reading every conversation.
+        plan = " ".join(
+            str(row[-1])
+            for row in db.get_db().execute(f"EXPLAIN QUERY PLAN {db._CONVERSATIONS_SQL} LIMIT 1")
+        )
+        assert "idx_conversations_updated" in plan and "TEMP B-TREE" not in plan
+
+
+def test_reused_message_id_does_not_serve_the_deleted_messages_html(lazy_app) -> None:
+    with lazy_app.test_request_context():
+        conversation_id = db.create_conversation("Doomed")
+        message_id = db.create_message(conversation_id, "assistant", "*old*", "")
+        assert message_html.hydrate_message(db.get_message(message_id))["rendered_html"] == "<p><em>old</em></p>"
+        db.delete_conversation(conversation_id)
+
+        replacement_id = db.create_message(db.create_conversation("Fresh"), "assistant", "**new**", "")
+
+        assert replacement_id == message_id
+        hydrated = message_html.hydrate_message(db.get_message(replacement_id))
+        assert hydrated["rendered_html"] == "<p><strong>new</strong></p>"
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import io
+import random
+
+from chat_hateoas.services.mock_bedrock import (
+    MockBedrockClient,
+    generate_batch,
+    iter_replay_ndjson,
+    write_replay_ndjson,
+)
+
+MESSAGES = [{"role": "user", "content": "How should I stream responses?"}]
+
+
+def test_chunking_consumes_the_rng_like_randint() -> None:
+    # Chunk sizes are one randint(20, 72) draw each, so seeded streams and replays stay stable,
+    # across seeds and with forced breaks shortening chunks.
+    client = MockBedrockClient()
+    text = "x" * 5000
+    for seed in range(200):
+        rng = random.Random(seed)
+        chunks, _ = client._chunk_text(text=text, rng=rng, forced_breaks=[])
+
+        reference = random.Random(seed)
+        expected_sizes: list[int] = []
+        remaining = len(text)
+        while remaining > 0:
+            size = min(remaining, reference.randint(20, 72))
+            expected_sizes.append(size)
+            remaining -= size
+
+        assert [len(chunk) for chunk in chunks] == expected_sizes
+        assert rng.getstate() == reference.getstate()
+
+        rng = random.Random(seed)
+        chunks, _ = client._chunk_text(text=text, rng=rng, forced_breaks=list(range(30, 5000, 37)))
+        reference = random.Random(seed)
+        for _ in chunks:
+            reference.randint(20, 72)
+        assert rng.getstate() == reference.getstate()
+
+
+def test_batch_matches_individual_streams() -> None:
+    responses = list(generate_batch(25, seed=100))
+
+    assert [response.seed for response in responses] == list(range(100, 125))
+    for response in responses:
+        events = list(MockBedrockClient(seed=response.seed).converse_stream(MESSAGES, "m", 1024, 0.7))
+        text = "".join(
+            event["delta"]["text"]
+            for event in events
+            if event["type"] == "contentBlockDelta" and "text" in event["delta"]
+        )
+        assert text == response.text == "".join(response.chunks)
+        assert events[-2]["stopReason"] == response.stop_reason
+
+
+def test_replay_file_round_trips_converse_stream_events() -> None:
+    out = io.StringIO()
+    written = write_replay_ndjson(out, 20, seed=7, messages=MESSAGES, model_id="m")
+
+    replayed = list(iter_replay_ndjson(io.StringIO(out.getvalue())))
+    assert written == len(replayed) == 20
+    for seed, events in replayed:
+        assert events == list(MockBedrockClient(seed=seed).converse_stream(MESSAGES, "m", 1024, 0.7))
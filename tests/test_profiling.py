@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from chat_hateoas import create_app, db
+from chat_hateoas.services.profiling import ProfilingMiddleware
+
+
+@pytest.fixture()
+def profiled_app(tmp_path):
+    return create_app(
+        {
+            "TESTING": True,
+            "DATABASE": str(tmp_path / "test.sqlite"),
+            "STREAM_DELAY_MIN_MS": 5,
+            "STREAM_DELAY_MAX_MS": 5,
+            "TOOL_CALL_DELAY_MS": 0,
+            "PROFILE_TOKEN": "secret",
+            "PROFILE_INTERVAL_MS": 1,
+            "PROFILE_DIR": str(tmp_path / "profiles"),
+        }
+    )
+
+
+def test_profiling_is_not_installed_by_default(app) -> None:
+    assert "profiler" not in app.extensions
+    assert not isinstance(app.wsgi_app, ProfilingMiddleware)
+
+
+def test_admin_header_profiles_the_request(profiled_app) -> None:
+    client = profiled_app.test_client()
+    profiler = profiled_app.extensions["profiler"]
+
+    with client.get("/", headers={"X-Profile": "wrong"}) as response:
+        assert "X-Profile-Id" not in response.headers
+    with client.get("/", headers={"X-Profile": "s\u00e9cret"}) as response:
+        assert response.status_code == 200 and "X-Profile-Id" not in response.headers
+    # Like a WSGI server, the profile is written once the response is closed.
+    with client.get("/", headers={"X-Profile": "secret"}) as response:
+        profile_id = response.headers["X-Profile-Id"]
+    [path] = profiler.written
+    assert path.parent == profiler.out_dir
+    assert profile_id in path.name and path.suffix == ".collapsed"
+    for line in path.read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+
+def test_stream_profile_covers_the_producer_thread(profiled_app) -> None:
+    profiled_app.config["PROFILE_FORMAT"] = "speedscope"
+    profiled_app.extensions["profiler"].output_format = "speedscope"
+    with profiled_app.app_context():
+        conversation_id = db.create_conversation("Profiled")
+        db.create_message(conversation_id, "user", "hello", "hello")
+        message_id = db.create_message(conversation_id, "assistant", "", "", status="streaming")
+
+    client = profiled_app.test_client()
+    with client.get(f"/responses/{message_id}/stream", headers={"X-Profile": "secret"}) as response:
+        body = response.get_data(as_text=True)
+    assert "event: ui_done" in body
+
+    [path] = profiled_app.extensions["profiler"].written
+    document = json.loads(path.read_text())
+    names = {profile["name"] for profile in document["profiles"]}
+    frames = [frame["name"] for frame in document["shared"]["frames"]]
+    assert f"stream-{message_id}" in names
+    assert any(name.startswith("_generate ") for name in frames)
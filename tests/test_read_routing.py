@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from chat_hateoas import db
+
+
+def test_get_routes_read_through_the_read_only_pool(client, app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Pooled")
+
+    for _ in range(3):
+        assert client.get(f"/conversations/{conversation_id}", headers={"HX-Request": "true"}).status_code == 200
+    assert client.get("/").status_code == 200
+
+    pool = app.extensions["db_read_pool"]
+    assert pool.snapshot()["created"] == 1
+    assert pool.snapshot()["reused"] == 3
+
+
+def test_read_only_connections_reject_writes(app) -> None:
+    with app.test_request_context():
+        with db.reading():
+            conn = db.get_read_db()
+            assert conn is not db.get_db()
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM conversations")
+            # Writers keep using the read/write connection inside a read-only block.
+            assert db.create_conversation("Still writable") > 0
+        assert "read_db" not in db.g
+        assert db.get_read_db() is db.get_db()
+
+
+def test_index_seeds_through_the_writer_inside_a_read_only_view(client, app) -> None:
+    body = client.get("/").get_data(as_text=True)
+
+    assert "Conversation 1" in body
+    with app.app_context():
+        assert db.get_db().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_analytics_reads_from_a_refreshed_snapshot(client, app, monkeypatch) -> None:
+    app.config["DB_SNAPSHOT_REFRESH_S"] = 60
+    with app.app_context():
+        db.execute(
+            "INSERT INTO usage_rollups (day, model_id, message_count, input_tokens, output_tokens,"
+            " latency_ms_total) VALUES ('2026-01-01', 'm', 1, 2, 3, 4)"
+        )
+
+    assert len(client.get("/analytics/usage").get_json()["items"]) == 1
+    with app.app_context():
+        db.execute("DELETE FROM usage_rollups")
+    # Within the refresh interval the snapshot still serves the earlier state.
+    assert len(client.get("/analytics/usage").get_json()["items"]) == 1
+
+    replica = app.extensions["db_snapshot"]
+    monkeypatch.setattr(replica, "refresh_s", 0)
+    assert client.get("/analytics/usage").get_json()["items"] == []
+    assert replica.snapshot()["refreshes"] == 2
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import pytest
+
+from chat_hateoas import db
+from chat_hateoas.records import Conversation, Message
+from chat_hateoas.services import message_html
+from chat_hateoas.services.transform import RENDERER_VERSION
+
+
+def test_message_records_are_immutable_and_row_compatible(app) -> None:
+    with app.test_request_context():
+        conversation_id = db.create_conversation("Records")
+        message_id = db.create_message(conversation_id, "user", "hi", "<p>hi</p>")
+
+        conversation = db.get_conversation(conversation_id)
+        message = db.get_message(message_id)
+
+        assert isinstance(conversation, Conversation)
+        assert isinstance(message, Message)
+        assert message.id == message["id"] == message[0] == message_id
+        assert dict(message)["rendered_html"] == "<p>hi</p>"
+        assert db.list_messages(conversation_id) == [message]
+        assert list(db.iter_conversations()) == [conversation]
+        with pytest.raises(AttributeError):
+            message.status = "error"  # type: ignore[misc]
+        with pytest.raises(KeyError):
+            message["missing"]
+
+
+def test_hydrate_reuses_current_records(app) -> None:
+    with app.test_request_context():
+        conversation_id = db.create_conversation("Hydrate")
+        message_id = db.create_message(
+            conversation_id, "assistant", "**x**", "<p><strong>x</strong></p>", renderer_version=RENDERER_VERSION
+        )
+        message = db.get_message(message_id)
+
+        assert message_html.hydrate_message(message) is message
+
+
+def test_history_turns_and_assistant_metadata(app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("History")
+        db.create_message(conversation_id, "user", "question", "")
+        assistant_id = db.create_message(conversation_id, "assistant", "answer", "")
+        db.save_assistant_metadata(assistant_id, "mock-bedrock", "m", "end_turn", 3, 5, 40, [], 9)
+
+        assert db.history_turns(conversation_id) == [("user", "question"), ("assistant", "answer")]
+        assert db.history_turns(conversation_id, up_to_message_id=assistant_id) == [("user", "question")]
+        assert db.list_history_for_conversation(conversation_id)[1] == {"role": "assistant", "content": "answer"}
+
+        metadata = db.get_assistant_metadata(assistant_id)
+        assert metadata is not None
+        assert (metadata.provider, metadata.output_tokens, metadata.raw_event_count) == ("mock-bedrock", 5, 9)
+        assert db.get_assistant_metadata(assistant_id + 1) is None
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from chat_hateoas import create_app
+from chat_hateoas.services import render_pool
+from chat_hateoas.services.transform import render_assistant_html
+
+
+def test_small_messages_render_in_thread(app) -> None:
+    with app.test_request_context():
+        html = render_pool.render_assistant("**hi**", 1, "/actions/fake")
+
+    pool = app.extensions["render_pool"]
+    assert html == render_assistant_html("**hi**", 1, action_url="/actions/fake")
+    assert pool.snapshot()["rendered_inline"] == 1
+    assert pool._executor is None
+
+
+def test_large_messages_are_offloaded_and_memoized(app, client) -> None:
+    pool = app.extensions["render_pool"]
+    pool.min_chars = 100
+    raw = "Some **bold** and `code` [[button:Go|go]]\n\n" * 10
+    try:
+        with app.test_request_context():
+            first = render_pool.render_assistant(raw, 7, "/actions/fake")
+            second = render_pool.render_assistant(raw, 7, "/actions/fake")
+            other_message = render_pool.render_assistant(raw, 8, "/actions/fake")
+    finally:
+        pool.shutdown()
+
+    assert first == second == render_assistant_html(raw, 7, action_url="/actions/fake")
+    assert "action-result-8" in other_message
+    stats = client.get("/streams/metrics").get_json()["render_pool"]
+    assert (stats["rendered_offloaded"], stats["memo_hits"], stats["memo_entries"]) == (2, 1, 2)
+
+
+def test_render_pool_can_be_disabled(tmp_path) -> None:
+    app = create_app({"TESTING": True, "DATABASE": str(tmp_path / "t.sqlite"), "RENDER_POOL_WORKERS": 0})
+    assert "render_pool" not in app.extensions
+    with app.test_request_context():
+        assert render_pool.render_assistant("x" * 50_000, 1, "/a") == render_assistant_html("x" * 50_000, 1, "/a")
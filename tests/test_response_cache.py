@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from chat_hateoas import db
+from chat_hateoas.services.response_cache import CachedResponse, ResponseCache, response_cache_key
+
+
+def test_cache_evicts_least_recent_and_respects_byte_and_ttl_bounds() -> None:
+    cache = ResponseCache(max_entries=2, max_bytes=10, ttl_s=60)
+    cache.put("a", CachedResponse(b"aaaa"))
+    cache.put("b", CachedResponse(b"bbbb"))
+    assert cache.get("a") is not None
+    cache.put("c", CachedResponse(b"cccc"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    cache.put("d", CachedResponse(b"ddddddd"))
+    assert cache.snapshot()["bytes"] <= 10
+    cache.put("huge", CachedResponse(b"x" * 11))
+    assert cache.get("huge") is None
+
+    expired = ResponseCache(max_entries=2, max_bytes=10, ttl_s=-1)
+    expired.put("a", CachedResponse(b"a"))
+    assert expired.get("a") is None
+    assert expired.snapshot()["entries"] == 0
+
+
+def test_key_covers_history_and_model_params() -> None:
+    history = [{"role": "user", "content": "summarize this"}]
+    key = response_cache_key("mock", history, "m", 512, 0.4)
+
+    assert key == response_cache_key("mock", [dict(history[0])], "m", 512, 0.4)
+    assert key != response_cache_key("mock", history, "m", 512, 0.5)
+    assert key != response_cache_key("mock", history, "m", 256, 0.4)
+    assert key != response_cache_key("bedrock", history, "m", 512, 0.4)
+    assert key != response_cache_key("mock", [{"role": "user", "content": "summarize that"}], "m", 512, 0.4)
+
+
+def test_identical_first_prompts_replay_through_sse(client, app, streaming_assistant) -> None:
+    app.config["RESPONSE_CACHE"] = True
+    first_id = streaming_assistant(prompt="summarize this")
+    second_id = streaming_assistant(prompt="summarize this")
+    other_id = streaming_assistant(prompt="something else")
+
+    first = client.get(f"/responses/{first_id}/stream").get_data(as_text=True)
+    second = client.get(f"/responses/{second_id}/stream").get_data(as_text=True)
+    client.get(f"/responses/{other_id}/stream").get_data()
+
+    assert "event: ui_done" in second
+    assert second.count("event: contentBlockDelta") == first.count("event: contentBlockDelta")
+    with app.app_context():
+        assert db.get_message(second_id)["raw_text"] == db.get_message(first_id)["raw_text"]
+        providers = {
+            row["message_id"]: row["provider"]
+            for row in db.fetch_all("SELECT message_id, provider FROM assistant_metadata")
+        }
+    assert providers == {first_id: "mock-bedrock", second_id: "response-cache", other_id: "mock-bedrock"}
+
+    stats = client.get("/streams/metrics").get_json()["response_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
+    assert stats["bytes_saved"] > 0
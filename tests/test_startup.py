@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from chat_hateoas import create_app, db
+
+
+def test_startup_profile_records_phases(app) -> None:
+    profile = app.extensions["startup_profile"]
+
+    assert [name for name, _ in profile.phases] == ["flask", "directories", "blueprints", "schema"]
+    assert "total" in profile.report()
+
+
+def test_schema_ddl_is_skipped_when_version_matches(app) -> None:
+    with app.app_context():
+        version = db.fetch_one("PRAGMA user_version")[0]
+        assert version != 0
+        db.get_db().execute("DROP INDEX idx_conversations_updated")
+
+    create_app({"TESTING": True, "DATABASE": app.config["DATABASE"]})
+
+    with app.app_context():
+        assert db.fetch_one("PRAGMA user_version")[0] == version
+        assert db.fetch_one("SELECT name FROM sqlite_master WHERE name = 'idx_conversations_updated'") is None
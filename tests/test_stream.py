@@ -63,3 +63,79 @@ def test_stream_for_completed_message_returns_done_only(client, app) -> None:
     assert response.status_code == 200
     assert "event: ui_done" in body
     assert "event: contentBlockDelta" not in body
+
+
+def test_concurrent_claims_allow_exactly_one_generator(app, streaming_assistant) -> None:
+    import threading
+
+    assistant_id = streaming_assistant()
+    barrier = threading.Barrier(8)
+    results: list[bool] = []
+
+    def contend(owner: str) -> None:
+        with app.app_context():
+            barrier.wait()
+            results.append(db.claim_stream(assistant_id, owner, lease_s=30))
+
+    threads = [threading.Thread(target=contend, args=(f"owner-{index}",)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+
+
+def test_stream_returns_409_while_another_request_holds_the_claim(client, app, streaming_assistant) -> None:
+    assistant_id = streaming_assistant()
+    with app.app_context():
+        assert db.claim_stream(assistant_id, "other-worker", lease_s=30)
+
+    response = client.get(f"/responses/{assistant_id}/stream", buffered=True)
+
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    with app.app_context():
+        assert db.get_message(assistant_id)["status"] == "streaming"
+
+
+def test_expired_claim_can_be_taken_over_and_is_released_on_completion(client, app, streaming_assistant) -> None:
+    assistant_id = streaming_assistant()
+    with app.app_context():
+        assert db.claim_stream(assistant_id, "crashed-worker", lease_s=-1)
+
+    response = client.get(f"/responses/{assistant_id}/stream", buffered=True)
+
+    assert response.status_code == 200
+    with app.app_context():
+        row = db.fetch_one("SELECT status, stream_owner FROM messages WHERE id = ?", (assistant_id,))
+        assert row["status"] == "complete"
+        assert row["stream_owner"] is None
+
+
+def test_stalled_owner_cannot_overwrite_the_new_owners_result(client, app) -> None:
+    app.config["STREAM_DELAY_MIN_MS"] = 20
+    app.config["STREAM_DELAY_MAX_MS"] = 20
+    with app.app_context():
+        conversation_id = db.create_conversation("Stalled")
+        db.create_message(conversation_id, "user", "hello", "hello")
+        assistant_id = db.create_message(conversation_id, "assistant", "", "", status="streaming")
+
+    stalled = client.get(f"/responses/{assistant_id}/stream", buffered=False)
+    frames = iter(stalled.response)
+    next(frames)
+    with app.app_context():
+        # The first runner's lease lapses without it noticing; another request takes over and finishes.
+        db.get_db().execute("UPDATE messages SET stream_lease_expires = 0 WHERE id = ?", (assistant_id,))
+        db.get_db().commit()
+        assert db.claim_stream(assistant_id, "new-owner", lease_s=30)
+        assert db.update_message(assistant_id, "new text", "<p>new text</p>", "complete", owner="new-owner")
+    body = "".join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in frames)
+    stalled.close()
+
+    assert "event: ui_done" not in body
+    with app.app_context():
+        message = db.get_message(assistant_id)
+        assert message["raw_text"] == "new text" and message["status"] == "complete"
+        assert db.get_assistant_metadata(assistant_id) is None
+        assert db.list_usage_rollups() == []
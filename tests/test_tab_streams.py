@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import time
+
+from chat_hateoas import db
+from chat_hateoas.services.send_buffer import SendBuffer, StreamMetrics
+
+
+def test_coalescing_is_scoped_to_the_frame_channel() -> None:
+    buffer = SendBuffer(max_events=2, policy="coalesce", metrics=StreamMetrics())
+
+    buffer.put("event: ui_delta\ndata: a1\n\n", channel="1")
+    buffer.put("event: ui_delta\ndata: b1\n\n", channel="2")
+    buffer.put("event: ui_delta\ndata: a2\n\n", channel="1")
+    buffer.close()
+
+    assert list(buffer.drain()) == ["event: ui_delta\ndata: b1\n\n", "event: ui_delta\ndata: a2\n\n"]
+
+
+def test_tab_stream_multiplexes_messages_by_stream_target(client, app, streaming_assistant, read_until_done) -> None:
+    app.config["STREAM_HEARTBEAT_S"] = 0.2
+    first_id = streaming_assistant("First")
+    second_id = streaming_assistant("Second")
+
+    tab = client.get("/streams/tabs/abc123", buffered=False)
+    for message_id in (first_id, second_id):
+        subscribed = client.post(f"/streams/tabs/abc123/messages/{message_id}")
+        assert subscribed.status_code == 204
+    frames = read_until_done(tab, 2)
+    tab.close()
+
+    body = "".join(frames)
+    assert f'hx-swap-oob="innerHTML:#stream-target-{first_id}"' in body
+    assert f'hx-swap-oob="innerHTML:#stream-target-{second_id}"' in body
+    assert "event: messageStart" not in body
+    assert f'id="message-{first_id}"' in body and f'id="message-{second_id}"' in body
+    with app.app_context():
+        assert db.get_message(first_id)["status"] == "complete"
+        assert db.get_message(second_id)["status"] == "complete"
+
+    tabs = client.get("/streams/metrics").get_json()["tabs"]
+    assert tabs == {
+        "open": 0,
+        "max_open": 32,
+        "connections_total": 1,
+        "rejected_total": 0,
+        "messages_multiplexed": 2,
+    }
+
+
+def test_closing_the_tab_cancels_its_generations(client, app, streaming_assistant) -> None:
+    app.config["STREAM_DELAY_MIN_MS"] = 50
+    app.config["STREAM_DELAY_MAX_MS"] = 50
+    message_id = streaming_assistant("Cancelled")
+
+    tab = client.get("/streams/tabs/tab1", buffered=False)
+    assert client.post(f"/streams/tabs/tab1/messages/{message_id}").status_code == 204
+    next(iter(tab.response))
+    tab.close()
+
+    deadline = time.monotonic() + 5
+    with app.app_context():
+        while db.get_message(message_id)["status"] == "streaming" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert db.get_message(message_id)["status"] == "error"
+    assert client.get("/streams/metrics").get_json()["streams_cancelled"] == 1
+
+
+def test_subscribe_without_a_live_tab_falls_back_to_a_per_message_stream(client, app, streaming_assistant) -> None:
+    message_id = streaming_assistant("Fallback")
+
+    response = client.post(f"/streams/tabs/unknown/messages/{message_id}")
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert f'sse-connect="/responses/{message_id}/stream"' in body
+    assert "hx-post" not in body
+
+
+def test_tab_connections_beyond_the_cap_are_refused(client, app, streaming_assistant) -> None:
+    app.config.update(STREAM_HEARTBEAT_S=0.2, STREAM_MAX_TABS=1)
+    message_id = streaming_assistant("Crowded")
+
+    first = client.get("/streams/tabs/tab1", buffered=False)
+    refused = client.get("/streams/tabs/tab2", buffered=False)
+    assert refused.status_code == 503
+    # The refused tab's messages stream on their own connection instead.
+    fallback = client.post(f"/streams/tabs/tab2/messages/{message_id}")
+    assert fallback.status_code == 200 and "sse-connect" in fallback.get_data(as_text=True)
+    # A reconnect of the open tab replaces its connection rather than taking another one.
+    reconnected = client.get("/streams/tabs/tab1", buffered=False)
+    assert reconnected.status_code == 200
+    first.close()
+    reconnected.close()
+
+    tabs = client.get("/streams/metrics").get_json()["tabs"]
+    assert tabs["open"] == 0 and tabs["max_open"] == 1 and tabs["rejected_total"] == 1
+    freed = client.get("/streams/tabs/tab2", buffered=False)
+    assert freed.status_code == 200
+    freed.close()
+
+
+def test_posted_message_subscribes_through_the_tab_header(client, app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Composer")
+
+    body = client.post(
+        f"/conversations/{conversation_id}/messages",
+        data={"message": "hi"},
+        headers={"X-Chat-Tab": "tab42"},
+    ).get_data(as_text=True)
+    assert "/streams/tabs/tab42/messages/" in body
+    assert "sse-connect" not in body
+
+    index = client.get(f"/?conversation_id={conversation_id}").get_data(as_text=True)
+    assert 'id="stream-mux"' in index and "X-Chat-Tab" in index
+
+    app.config["STREAM_MULTIPLEX"] = False
+    classic = client.post(
+        f"/conversations/{conversation_id}/messages",
+        data={"message": "again"},
+        headers={"X-Chat-Tab": "tab42"},
+    ).get_data(as_text=True)
+    assert "sse-connect" in classic
+    assert 'id="stream-mux"' not in client.get("/").get_data(as_text=True)
+
+
+def test_failed_tab_subscribe_hands_back_the_slot_and_the_claim(client, app, streaming_assistant, read_until_done) -> None:
+    app.config.update(
+        {"PROVIDER": "bogus", "STREAM_MAX_CONCURRENT": 2, "STREAM_QUEUE_MAX": 0, "PROPAGATE_EXCEPTIONS": False}
+    )
+    message_ids = [streaming_assistant(f"Broken {index}") for index in range(3)]
+    tab = client.get("/streams/tabs/tab9", buffered=False)
+
+    for message_id in message_ids:
+        assert client.post(f"/streams/tabs/tab9/messages/{message_id}").status_code == 500
+
+    assert client.get("/streams/metrics").get_json()["admission"]["active"] == 0
+    app.config["PROVIDER"] = "mock"
+    assert client.post(f"/streams/tabs/tab9/messages/{message_ids[0]}").status_code == 204
+    frames = read_until_done(tab, 1)
+    tab.close()
+    assert any(frame.startswith("event: ui_done") for frame in frames)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+
+from chat_hateoas import db
+
+
+def _streamed_assistant(client, app) -> int:
+    with app.app_context():
+        conversation_id = db.create_conversation("Tool Events")
+        db.create_message(
+            conversation_id=conversation_id,
+            role="user",
+            raw_text="Use some tools",
+            rendered_html="Use some tools",
+        )
+        assistant_id = db.create_message(
+            conversation_id=conversation_id,
+            role="assistant",
+            raw_text="",
+            rendered_html="",
+            status="streaming",
+        )
+    client.get(f"/responses/{assistant_id}/stream", buffered=True)
+    return assistant_id
+
+
+def test_stream_persists_paired_tool_events(client, app) -> None:
+    assistant_id = _streamed_assistant(client, app)
+
+    with app.app_context():
+        events = db.list_tool_events(assistant_id)
+        assert events
+        for event in events:
+            assert event["status"] == "ok"
+            assert event["used_at"] is not None
+            assert event["result_at"] is not None
+            assert event["duration_ms"] >= 0
+
+        (metadata,) = db.get_db().execute(
+            "SELECT tool_events_json FROM assistant_metadata WHERE message_id = ?", (assistant_id,)
+        ).fetchone()
+        # Timings live in tool_events only; the JSON column keeps the provider deltas as received.
+        assert "receivedAt" not in metadata and "offsetMs" not in metadata
+
+        stats = db.tool_duration_stats()
+        assert {item["tool_name"] for item in stats} == {event["tool_name"] for event in events}
+        assert sum(item["count"] for item in stats) == len(events)
+
+
+def test_tool_duration_stats_uses_nearest_rank_percentile(app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Stats")
+        message_id = db.create_message(conversation_id, "assistant", "x", "x")
+        tool_events = []
+        for index in range(20):
+            tool_use_id = f"tool-{index}"
+            tool_events.append({"toolUse": {"toolUseId": tool_use_id, "name": "calc"}, "offsetMs": 0})
+            tool_events.append(
+                {"toolResult": {"toolUseId": tool_use_id, "status": "ok"}, "offsetMs": (index + 1) * 10}
+            )
+        db.save_assistant_metadata(message_id, "mock-bedrock", "m", "end_turn", 1, 1, 1, tool_events, 1)
+
+        (stats,) = db.tool_duration_stats()
+        assert stats["tool_name"] == "calc"
+        assert stats["count"] == 20
+        assert stats["percentile_ms"] == 190
+        assert stats["max_ms"] == 200
+
+
+def test_backfill_migrates_legacy_json_rows(app) -> None:
+    legacy_events = [
+        {"toolUse": {"toolUseId": "tool-1", "name": "web_search"}},
+        {"toolResult": {"toolUseId": "tool-1", "name": "web_search", "status": "ok"}},
+    ]
+    with app.app_context():
+        conversation_id = db.create_conversation("Legacy")
+        message_ids = [db.create_message(conversation_id, "assistant", "x", "x") for _ in range(6)]
+        for message_id in message_ids:
+            payload = legacy_events if message_id != message_ids[-1] else [{"reasoning": "no tools here"}]
+            db.execute(
+                """
+                INSERT INTO assistant_metadata (
+                  message_id, provider, model_id, stop_reason, input_tokens,
+                  output_tokens, latency_ms, tool_events_json, raw_event_count
+                ) VALUES (?, 'mock-bedrock', 'm', 'end_turn', 1, 1, 1, ?, 1)
+                """,
+                (message_id, json.dumps(payload)),
+            )
+
+        assert db.backfill_tool_events(chunk_size=2) == 5
+        assert db.backfill_tool_events(chunk_size=2) == 0
+        assert db.list_tool_events(message_ids[-1]) == []
+        events = db.list_tool_events(message_ids[0])
+        assert len(events) == 1
+        assert events[0]["tool_name"] == "web_search"
+        assert events[0]["duration_ms"] is None
+
+
+def test_backfill_cli_reports_progress(app) -> None:
+    result = app.test_cli_runner().invoke(args=["backfill-tool-events", "--chunk-size", "10"])
+
+    assert result.exit_code == 0
+    assert "Backfilled tool events for 0 messages" in result.output
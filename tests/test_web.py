@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from urllib.parse import urlencode
+
 from chat_hateoas import db
 
 
@@ -80,3 +82,125 @@ def test_debug_sse_panel_toggle_is_rendered(client, app) -> None:
     assert "Raw SSE Stream" in body
     assert "id=\"debug-events\"" in body
     assert "Debug SSE" in body
+
+
+def test_icons_reference_single_inline_sprite(client, app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Icons")
+        db.create_message(
+            conversation_id=conversation_id,
+            role="user",
+            raw_text="hi",
+            rendered_html="hi",
+        )
+
+    page = client.get(f"/?conversation_id={conversation_id}").get_data(as_text=True)
+    assert page.count('class="icon-sprite"') == 1
+    assert page.count('<symbol id="icon-clock"') == 1
+    assert '<use href="#icon-user"></use>' in page
+
+    fragment = client.get(
+        f"/conversations/{conversation_id}",
+        headers={"HX-Request": "true"},
+    ).get_data(as_text=True)
+    assert "<symbol" not in fragment
+    assert '<use href="#icon-clock"></use>' in fragment
+
+
+def test_versioned_conversation_fragment_is_cacheable_and_served_from_cache(client, app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Prefetch")
+        conversation = db.get_conversation(conversation_id)
+        version = conversation["revision"]
+
+    sidebar = client.get("/").get_data(as_text=True)
+    assert f"/conversations/{conversation_id}?v=" in sidebar
+
+    url = f"/conversations/{conversation_id}?{urlencode({'v': version})}"
+    first = client.get(url, headers={"HX-Request": "true"})
+    second = client.get(url, headers={"HX-Request": "true"})
+    unversioned = client.get(f"/conversations/{conversation_id}", headers={"HX-Request": "true"})
+
+    assert first.headers["Cache-Control"] == "private, max-age=10"
+    assert "HX-Request" in first.headers["Vary"]
+    assert unversioned.headers["Cache-Control"] == "no-cache"
+    assert first.get_data(as_text=True) == second.get_data(as_text=True)
+    stats = client.get("/conversations/metrics").get_json()["thread_fragment_cache"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_thread_cache_is_keyed_by_conversation_version(client, app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Versioned")
+        before = db.get_conversation(conversation_id)
+
+    client.get(f"/conversations/{conversation_id}", headers={"HX-Request": "true"})
+    posted = client.post(f"/conversations/{conversation_id}/messages", data={"message": "hello there"})
+    with app.app_context():
+        after = db.get_conversation(conversation_id)
+        # Pin the timestamp so the post lands "within the same second" however slow the run is.
+        db.get_db().execute(
+            "UPDATE conversations SET updated_at = ? WHERE id = ?", (before.updated_at, conversation_id)
+        )
+        db.get_db().commit()
+        current = db.get_conversation(conversation_id)
+
+    body = client.get(
+        f"/conversations/{conversation_id}",
+        headers={"HX-Request": "true"},
+    ).get_data(as_text=True)
+    assert "hello there" in body
+    assert current.updated_at == before.updated_at and current.revision > after.revision > before.revision
+    assert f"v={after.revision}" in posted.get_data(as_text=True)
+
+
+def test_feedback_and_streaming_threads_bypass_stale_fragments(client, app) -> None:
+    with app.app_context():
+        conversation_id = db.create_conversation("Votes")
+        message_id = db.create_message(conversation_id, "assistant", "answer", "<p>answer</p>")
+        streaming_id = db.create_conversation("Streaming")
+        db.create_message(streaming_id, "assistant", "", "", status="streaming")
+
+    url = f"/conversations/{conversation_id}"
+    client.get(url, headers={"HX-Request": "true"})
+    client.post(f"/messages/{message_id}/feedback", data={"vote": "up"}, headers={"HX-Request": "true"})
+    body = client.get(url, headers={"HX-Request": "true"}).get_data(as_text=True)
+    assert 'class="vote active"' in body
+
+    with app.app_context():
+        revision = db.get_conversation(streaming_id).revision
+    client.get(f"/conversations/{streaming_id}", headers={"HX-Request": "true"})
+    streaming = client.get(f"/conversations/{streaming_id}?v={revision}", headers={"HX-Request": "true"})
+    assert streaming.headers["Cache-Control"] == "no-cache"
+    stats = client.get("/conversations/metrics").get_json()["thread_fragment_cache"]
+    assert stats["hits"] == 0
+    assert stats["misses"] == 4
+
+
+def test_streamed_index_matches_buffered_render(client, app) -> None:
+    # Tab ids are fresh per page load; keep them out of the byte-for-byte comparison.
+    app.config["STREAM_MULTIPLEX"] = False
+    with app.app_context():
+        first_id = db.create_conversation("First")
+        conversation_id = db.create_conversation("Streamed")
+        for index in range(40):
+            db.create_message(conversation_id, "user", f"row {index}", f"<p>row {index}</p>")
+
+    url = f"/?conversation_id={first_id}"
+    streamed = client.get(url, buffered=False)
+    chunks = [chunk.decode() for chunk in streamed.response]
+    streamed.close()
+
+    app.config["INDEX_STREAMING"] = False
+    buffered = client.get(url).get_data(as_text=True)
+
+    assert streamed.is_streamed
+    assert len(chunks) > 1
+    assert "</head>" in chunks[0]
+    assert "".join(chunks) == buffered
+
+    latest = client.get("/").get_data(as_text=True)
+    app.config["INDEX_STREAMING"] = True
+    assert client.get("/").get_data(as_text=True) == latest
+    assert "row 39" in latest